@@ -0,0 +1,986 @@
+"""
+Benchmarks for the to-do list's storage and hot paths.
+
+Each benchmark runs inside a throwaway directory, so the real todo_list.json
+and archive_list.json are never touched.
+
+    python benchmark.py storage --sizes 10000 100000 1000000
+    python benchmark.py alerts --size 100000
+    python benchmark.py scheduler --size 1000000
+    python benchmark.py memory --size 1000000
+    python benchmark.py search --size 1000000
+    python benchmark.py export --size 1000000
+    python benchmark.py lazy --size 1000000
+    python benchmark.py formats --sizes 10000 100000 1000000
+    python benchmark.py report --size 1000000
+    python benchmark.py backups --size 1000000
+    python benchmark.py import --size 1000000
+    python benchmark.py startup --size 10000 --check
+    python benchmark.py recurrence --size 1000000
+    python benchmark.py concurrency --processes 8 --ops 60
+    python benchmark.py shards --size 2000000 --workers 1 2 4 8
+    python benchmark.py analytics --size 100000 --archived 2000000
+    python benchmark.py suite --sizes 10000 100000 1000000 --output results.json
+
+The suite times every hot path (and its peak traced memory) for each size,
+writes the numbers to --output, and with --baseline fails when an operation
+got slower or bigger than the thresholds allow. --save-baseline stores the
+run as the new baseline.
+
+The startup benchmark has budgets (STARTUP_BUDGETS_MS, for 10000 tasks in
+JSON storage); with --check it exits non-zero when a command goes over.
+
+The concurrency benchmark is a stress test: several processes add and toggle
+tasks at once in each backend, and it fails when an update was lost.
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, "to-do-list.py")
+PRIORITIES = ["High", "Medium", "Low"]
+RECURRING = [None, None, None, "daily", "weekly", "monthly", "yearly"]
+WORDS = ["report", "email", "groceries", "workout", "read", "call", "invoice", "review",
+         "meeting", "laundry", "python", "budget", "dentist", "plan", "backup", "garden"]
+
+
+def load_todo_module():
+    """
+    Import to-do-list.py (its file name is not a valid module name) and
+    open the storage config.json in the current directory names.
+    """
+    spec = importlib.util.spec_from_file_location("todo", os.path.join(HERE, "to-do-list.py"))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so process pool workers can unpickle references to its functions
+    sys.modules[spec.name] = module
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(module)
+        module.open_storage()
+    return module
+
+
+def make_tasks(n, seed=42, completed_ratio=0.2):
+    """
+    Generate n realistic tasks: mixed priorities, categories, recurrence and
+    due dates spread over several years.
+    """
+    rng = random.Random(seed)
+    start = datetime.date(2025, 1, 1).toordinal()
+    tasks = []
+    for i in range(1, n + 1):
+        completed = rng.random() < completed_ratio
+        due = datetime.date.fromordinal(start + rng.randrange(0, 365 * 4))
+        tasks.append({
+            "id": i,
+            "title": " ".join(rng.sample(WORDS, rng.randint(1, 4))) + f" #{i}",
+            "completed": completed,
+            "due_date": due.strftime("%Y-%m-%d") if rng.random() < 0.9 else None,
+            "priority": rng.choice(PRIORITIES),
+            "recurring": rng.choice(RECURRING),
+            "categories": rng.sample(range(1, 6), rng.randint(0, 2)),
+            "completion_timestamp": f"{due.strftime('%Y-%m-%d')} 12:00:00" if completed else None,
+        })
+    return tasks
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+@contextlib.contextmanager
+def scratch_dir():
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(previous)
+
+
+def print_row(label, seconds):
+    print(f"  {label:<32} {seconds * 1000:>10.1f} ms")
+
+
+def bench_storage(todo, sizes):
+    """
+    Compare the JSON and SQLite backends on load, a single-task save and the
+    date/category/report queries.
+    """
+    day = "2026-06-15"
+    for n in sizes:
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(n)]
+        with scratch_dir():
+            todo.write_snapshot(tasks)
+            print(f"\n{n} tasks, {os.path.getsize(todo.TODO_FILE) / 1e6:.1f} MB JSON")
+            for name in ("json", "sqlite"):
+                todo.config["storage"] = name
+                backend = todo.STORAGE_BACKENDS[name]()
+                print(f" {name}:")
+                if name == "sqlite":
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        seconds, _ = timed(lambda: backend.conn)
+                    print_row("migrate", seconds)
+                seconds, loaded = timed(backend.load)
+                print_row("load", seconds)
+                loaded[0].completed = not loaded[0].completed
+                todo.record_change("update", loaded[0])
+                print_row("save (one change)", timed(backend.save, loaded)[0])
+                print_row("tasks_due_on", timed(backend.tasks_due_on, loaded, day)[0])
+                print_row("overdue_tasks", timed(backend.overdue_tasks, loaded)[0])
+                print_row("due_soon_tasks", timed(backend.due_soon_tasks, loaded, 7)[0])
+                print_row("tasks_due_between (1 month)",
+                          timed(backend.tasks_due_between, loaded, "2027-03-01", "2027-03-31")[0])
+                if name == "sqlite":
+                    print_row("select_categories", timed(backend.select_categories, [2, 4])[0])
+                print_row("build_stats", timed(backend.build_stats, loaded)[0])
+
+
+def legacy_startup_alerts(tasks, days_ahead):
+    """
+    The startup scans as they were before due dates were cached: one strptime
+    and one date.today() per task per check.
+    """
+    def parse(task):
+        return datetime.datetime.strptime(task["due_date"], "%Y-%m-%d").date()
+
+    overdue = [t for t in tasks if t.get("due_date") and datetime.date.today() > parse(t) and not t["completed"]]
+    soon = [t for t in tasks if not t["completed"] and t.get("due_date")
+            and 0 <= (parse(t) - datetime.date.today()).days <= days_ahead]
+    return overdue, soon
+
+
+def bench_alerts(todo, size):
+    """
+    Time the startup overdue alerts and reminders with cold and warm date caches.
+    """
+    dicts = make_tasks(size)
+    todo.config["storage"] = "json"
+    todo.storage = todo.JsonStorage()
+    print(f"\nStartup alerts over {size} tasks:")
+    print_row("per-task strptime (before)", timed(legacy_startup_alerts, dicts, 1)[0])
+
+    def alerts():
+        with contextlib.redirect_stdout(io.StringIO()):
+            todo.show_overdue_alerts(tasks)
+            todo.remind_tasks(tasks)
+
+    todo.date_ordinal_cache.clear()
+    seconds, tasks = timed(lambda: [todo.Task.from_dict(data) for data in dicts])
+    print_row("parse at load (cold cache)", seconds)
+    print_row("alerts (warm cache)", timed(alerts)[0])
+    print(f"  distinct dates parsed: {len(todo.date_ordinal_cache)}")
+
+
+def bench_scheduler(todo, size):
+    """
+    The reminder scheduler over size pending tasks: heap build and memory,
+    one incremental change, and firing a day's worth of reminders, against
+    rescanning every task for what is due.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(size, completed_ratio=0)]
+    today = todo.today_ordinal()
+    rng = random.Random(7)
+    for task in tasks:
+        task.due = today + rng.randrange(1, 365)
+    now = today * todo.SECONDS_PER_DAY
+    print(f"\nReminder scheduler, {size} pending tasks:")
+    scheduler = todo.ReminderScheduler([], [])
+    print_row("build heap", timed(scheduler.build, tasks, now)[0])
+    print(f"  {'heap entries':<32} {len(scheduler.heap):>10}")
+    tracemalloc.start()
+    scheduler.build(tasks, now)
+    print(f"  {'scheduler memory':<32} {tracemalloc.get_traced_memory()[0] / 1e6:>10.1f} MB")
+    tracemalloc.stop()
+
+    changes = 10000
+    start = time.perf_counter()
+    for task in rng.sample(tasks, changes):
+        before = task.copy()
+        task.due += 1
+        scheduler.on_change("update", task, before)
+    print_row(f"{changes} changes", time.perf_counter() - start)
+    seconds, fired = timed(scheduler.fire_due, (today + 2) * todo.SECONDS_PER_DAY)
+    print_row(f"fire {fired} reminders", seconds)
+    print_row("rescan for due tasks (before)",
+              timed(lambda: [t for t in tasks if not t.completed and t.due and t.due <= today + 2])[0])
+
+
+def legacy_report_counts(tasks):
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    completed = sum(t["completed"] for t in tasks)
+    overdue = sum(1 for t in tasks if not t["completed"] and t.get("due_date") and t["due_date"] < today)
+    return completed, overdue
+
+
+def bench_memory(todo, size):
+    """
+    Resident size of the task list as JSON dicts, Task objects and a
+    TaskTable, plus report-style scans over each.
+    """
+    text = json.dumps(make_tasks(size))
+    print(f"\nMemory for {size} tasks:")
+    tracemalloc.start()
+    dicts = json.loads(text)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in dicts]
+    scan_dicts = timed(legacy_report_counts, dicts)[0]
+    del dicts
+    gc.collect()
+    task_bytes = tracemalloc.get_traced_memory()[0]
+    table = todo.TaskTable.from_tasks(tasks)
+    today = todo.today_ordinal()
+    scan_tasks = timed(lambda: (sum(t.completed for t in tasks),
+                                sum(1 for t in tasks if not t.completed and t.due and t.due < today)))[0]
+    del tasks
+    gc.collect()
+    table_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    scan_table = timed(lambda: (table.count_completed(), len(table.overdue_indices())))[0]
+
+    print(f"  {'list of dicts':<32} {dict_bytes / 1e6:>10.1f} MB")
+    print(f"  {'list of Task':<32} {task_bytes / 1e6:>10.1f} MB  ({dict_bytes / task_bytes:.1f}x smaller)")
+    print(f"  {'TaskTable':<32} {table_bytes / 1e6:>10.1f} MB  ({dict_bytes / table_bytes:.1f}x smaller)")
+    print_row("report scan, dicts", scan_dicts)
+    print_row("report scan, Task", scan_tasks)
+    print_row("report scan, TaskTable", scan_table)
+
+
+def bench_search(todo, size):
+    """
+    Trigram index build/persist/load cost and per-query latency against a
+    linear scan of every title.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(size)]
+    queries = [f"#{size // 2}", f"#{size - 7}", "dentist", "xyzzy", "report email"]
+    print(f"\nSearch over {size} titles:")
+    seconds, index = timed(todo.TrigramIndex.build, tasks)
+    print_row("build index", seconds)
+    with scratch_dir():
+        todo.write_snapshot(tasks[:1])
+        print_row("persist index", timed(index.save)[0])
+        print_row("load index", timed(todo.TrigramIndex.load, tasks)[0])
+    for query in queries:
+        scan_seconds, expected = timed(lambda: [t for t in tasks if query.lower() in t.title.lower()])
+        index_seconds, found = timed(index.search, query)
+        assert [t.id for t in found] == [t.id for t in expected]
+        print(f"  {query!r:<24} {len(found):>8} hits   index {index_seconds * 1000:>8.3f} ms"
+              f"   scan {scan_seconds * 1000:>8.1f} ms")
+
+
+def bench_export(todo, size):
+    """
+    Streaming export throughput (MB/s of output) and peak traced memory for
+    each format, plain and gzip-compressed.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(size)]
+    print(f"\nExport of {size} tasks:")
+    with scratch_dir():
+        for fmt in ("csv", "json", "ndjson"):
+            for suffix in ("", ".gz"):
+                filename = f"export.{fmt}{suffix}"
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds, _ = timed(todo.export_tasks, tasks, fmt, filename)
+                    tracemalloc.start()
+                    todo.export_tasks(tasks, fmt, filename)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                megabytes = os.path.getsize(filename) / 1e6
+                print(f"  {filename:<20} {megabytes:>8.1f} MB {seconds * 1000:>9.1f} ms"
+                      f" {megabytes / seconds:>8.1f} MB/s   peak {peak / 1e6:>6.2f} MB")
+
+
+def bench_lazy(todo, size):
+    """
+    Full JSON load against the NDJSON file read through its offset index,
+    for the first 20 tasks, a random seek, a date range and the report.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(size)]
+    print(f"\nLazy reads over {size} tasks:")
+    with scratch_dir():
+        todo.write_snapshot(tasks)
+        print_row("json: full load", timed(todo.load_json_tasks)[0])
+        print_row("ndjson: write file + index", timed(todo.write_ndjson_tasks, tasks)[0])
+        backend = todo.NdjsonStorage()
+        print_row("ndjson: open index", timed(lambda: backend.task_file)[0])
+        print_row("ndjson: first 20 tasks", timed(lambda: list(backend.iter_tasks(0, 20)))[0])
+        print_row("ndjson: task #size/2", timed(backend.task_file.task, size // 2)[0])
+        print_row("ndjson: due in one week", timed(backend.tasks_due_between, None, "2026-06-01", "2026-06-07")[0])
+        print_row("ndjson: report statistics", timed(backend.build_stats, None)[0])
+        print_row("ndjson: full load", timed(backend.load)[0])
+        backend.reset()
+
+
+def bench_formats(todo, sizes):
+    """
+    File size and load times of the same tasks as JSON, NDJSON and a binary
+    snapshot: the full load each backend does, and the lazy reads (open,
+    first 20 tasks, one week due, report statistics) the two indexed formats
+    answer without it.
+    """
+    for n in sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            tasks = [todo.Task.from_dict(data) for data in make_tasks(n)]
+        print(f"\n{n} tasks:")
+        with scratch_dir():
+            todo.write_snapshot(tasks)
+            todo.write_ndjson_tasks(tasks)
+            print_row("binary: write", timed(todo.write_binary_tasks, tasks)[0])
+            for filename in (todo.TODO_FILE, todo.NDJSON_FILE, todo.BINARY_FILE):
+                print(f"  {filename + ' size':<32} {os.path.getsize(filename) / 1e6:>10.1f} MB")
+            print_row("json: full load", timed(todo.load_json_tasks)[0])
+            for name, backend in (("ndjson", todo.NdjsonStorage()), ("binary", todo.BinaryStorage())):
+                print_row(f"{name}: open", timed(lambda: backend.task_file)[0])
+                print_row(f"{name}: first 20 tasks", timed(lambda: list(backend.iter_tasks(0, 20)))[0])
+                print_row(f"{name}: due in one week",
+                          timed(backend.tasks_due_between, None, "2026-06-01", "2026-06-07")[0])
+                print_row(f"{name}: report statistics", timed(backend.build_stats, None)[0])
+                seconds, loaded = timed(backend.load)
+                print_row(f"{name}: full load", seconds)
+                backend.reset()
+                if [t.to_dict() for t in loaded] != [t.to_dict() for t in tasks]:
+                    print(f"  {name}: loaded tasks differ from the originals")
+
+
+def bench_backups(todo, size):
+    """
+    Bytes and time per backup generation when a snapshot is first backed up,
+    after one edited task and after an inserted one, and the time to read a
+    generation back.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(size)]
+    print(f"\nBackups of {size} tasks:")
+    with scratch_dir():
+        text = todo.snapshot_text(tasks)
+        print(f"  {'snapshot size':<32} {len(text) / 1e6:>10.1f} MB")
+        edits = [("first generation", lambda: None),
+                 ("one task edited", lambda: setattr(tasks[size // 2], "title", "edited")),
+                 ("one task inserted", lambda: tasks.insert(size // 3, todo.Task("inserted", id=size + 1)))]
+        for label, edit in edits:
+            edit()
+            text = todo.snapshot_text(tasks)
+            seconds, _ = timed(todo.backup_snapshot, text)
+            generation = todo.backup_generations()[-1]
+            stored = todo.read_backup_manifest(generation)["stored"]
+            print(f"  {label:<32} {seconds * 1000:>10.1f} ms {stored / 1024:>10.1f} KiB written")
+        seconds, (data, _) = timed(todo.read_backup, generation)
+        print_row("read newest generation", seconds)
+        if data != text.encode("utf-8"):
+            print("  restored snapshot differs from the original")
+
+
+def bench_report(todo, size):
+    """
+    Report statistics built with a full pass against loading the persisted
+    copy, and the cost of keeping them current per mutation.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(size)]
+    print(f"\nReport statistics over {size} tasks:")
+    with scratch_dir():
+        todo.write_snapshot(tasks)
+        seconds, stats = timed(todo.TaskStats.build, tasks, [])
+        print_row("build statistics", seconds)
+        print_row("persist statistics", timed(stats.save)[0])
+        print_row("load statistics", timed(todo.TaskStats.load)[0])
+        today = todo.today_ordinal()
+        print_row("overdue count, same day", timed(stats.overdue_count, today)[0])
+        print_row("overdue count, next day", timed(stats.overdue_count, today + 1)[0])
+
+        def toggle_all():
+            for task in tasks[:10000]:
+                before = task.copy()
+                task.completed = not task.completed
+                stats.on_change("update", task, before)
+        seconds = timed(toggle_all)[0]
+        print(f"  {'update per toggle':<32} {seconds / min(size, 10000) * 1e6:>10.2f} us")
+
+
+def bench_import(todo, size):
+    """
+    Bulk --import of CSV, JSON and NDJSON files into each storage backend,
+    one write per import.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(size)]
+    print(f"\nImport of {size} tasks:")
+    with scratch_dir():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for fmt in ("csv", "json", "ndjson"):
+                todo.export_tasks(tasks, fmt, f"import.{fmt}")
+        for name in ("json", "journal", "sqlite", "ndjson"):
+            for fmt in ("csv", "json", "ndjson"):
+                for filename in os.listdir("."):
+                    if not filename.startswith("import."):
+                        os.remove(filename)
+                todo.config["storage"] = name
+                todo.storage = todo.STORAGE_BACKENDS[name]()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds, count = timed(todo.import_tasks, [], f"import.{fmt}")
+                assert count == size
+                print_row(f"{name}: {fmt}", seconds)
+                if hasattr(todo.storage, "conn"):
+                    todo.storage.conn.close()
+
+
+# Wall-clock budgets in ms for a fresh process, including interpreter startup.
+# "import" is the total -X importtime of the modules loaded for --help.
+STARTUP_BUDGETS_MS = {
+    "import": 60,
+    # Mostly compiling the script, which Python does not cache for __main__ (about 110 ms here)
+    "--help": 175,
+    "--list --limit 20": 400,
+    "--report": 400,
+    "--search report": 400,
+    "--overdue": 400,
+}
+STARTUP_RUNS = 5
+
+
+def import_time_ms():
+    """
+    Total and per-module import time of the script as reported by
+    python -X importtime, for modules imported at top level.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", SCRIPT, "--help"],
+                            capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  "):
+            modules.append((int(cumulative) / 1000, name.strip()))
+    return sum(ms for ms, _ in modules), sorted(modules, reverse=True)
+
+
+def command_time_ms(command):
+    runs = []
+    for _ in range(STARTUP_RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SCRIPT] + command.split(), stdout=subprocess.DEVNULL, check=True)
+        runs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(runs)
+
+
+def bench_startup(todo, size, check):
+    """
+    Import time and per-command wall clock of fresh CLI processes, checked
+    against STARTUP_BUDGETS_MS.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(size, completed_ratio=0)]
+    print(f"\nStartup with {size} tasks (median of {STARTUP_RUNS} runs):")
+    over = []
+    with scratch_dir():
+        todo.config["storage"] = "json"
+        todo.write_snapshot(tasks)
+        total, modules = import_time_ms()
+        timings = {"import": total}
+        for command in STARTUP_BUDGETS_MS:
+            if command != "import":
+                timings[command] = command_time_ms(command)
+    for label, ms in timings.items():
+        budget = STARTUP_BUDGETS_MS[label]
+        status = "ok" if ms <= budget else "OVER"
+        if ms > budget:
+            over.append(label)
+        print(f"  {label:<32} {ms:>10.1f} ms   budget {budget:>5} ms  {status}")
+    print("  slowest imports: " + ", ".join(f"{name} {ms:.1f} ms" for ms, name in modules[:5]))
+    if check and over:
+        print(f"Over budget: {', '.join(over)}")
+        return 1
+    return 0
+
+
+def bench_recurrence(todo, size):
+    """
+    Next occurrence of many recurrence rules: one rule at a time against the
+    column-wise computation, and lazily expanding a month of occurrences.
+    """
+    rng = random.Random(7)
+    start = datetime.date(2025, 1, 1).toordinal()
+    tasks = []
+    for i in range(size):
+        recurring = rng.choice(RECURRING[3:])
+        due = start + rng.randrange(0, 365 * 2)
+        task = todo.Task(f"rule #{i}", due=due, recur=todo.RECURRING_LEVELS[recurring], id=i + 1)
+        task.rule.every = rng.randint(1, 3)
+        tasks.append(task)
+    day = todo.date_ordinal("2027-06-15")
+    print(f"\nRecurrence over {size} rules:")
+    seconds, expected = timed(lambda: [todo.next_occurrence(task, day) for task in tasks])
+    print_row("next occurrence, per rule", seconds)
+    seconds, found = timed(todo.next_occurrences, tasks, day)
+    assert found == expected
+    print_row("next occurrence, vectorized", seconds)
+    seconds, views = timed(todo.recurring_occurrences, tasks, day, day + 30)
+    print_row(f"expand 31 days ({len(views)} occ.)", seconds)
+
+
+def make_archive_rows(n, seed=7):
+    """
+    n archived (completed) rows, due over the last two years and completed
+    from a few days early to two months late.
+    """
+    rng = random.Random(seed)
+    today = datetime.date.today().toordinal()
+    rows = []
+    for i in range(n):
+        due = today - rng.randrange(0, 730)
+        done = datetime.date.fromordinal(due + rng.randrange(-5, 60))
+        rows.append({
+            "id": i,
+            "title": f"archived #{i}",
+            "completed": True,
+            "due_date": datetime.date.fromordinal(due).strftime("%Y-%m-%d") if rng.random() < 0.9 else None,
+            "priority": rng.choice(PRIORITIES),
+            "categories": rng.sample([1, 2, 3, 4, 5], rng.randint(0, 2)),
+            "completion_timestamp": done.strftime("%Y-%m-%d") + " 18:00:00",
+        })
+    return rows
+
+
+def bench_analytics(todo, size, archived):
+    """
+    --analytics metrics with NumPy column operations against the plain
+    Python loops, over size active tasks and archived archive rows.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(size)]
+    rows = make_archive_rows(archived)
+    print(f"\nAnalytics over {size} tasks and {archived} archived rows:")
+    seconds, columns = timed(todo.analytics_columns, tasks, rows)
+    print_row("build columns", seconds)
+    recurring = [task for task in tasks if task.rule and (task.rule.start or task.due)]
+    today = todo.today_ordinal()
+    python_seconds, expected = timed(todo.analytics_python, columns, recurring, today)
+    print_row("pure Python", python_seconds)
+    if importlib.util.find_spec("numpy") is None:
+        print("  NumPy is not installed; only the pure Python version ran")
+        return
+    numpy_seconds, result = timed(todo.analytics_numpy, columns, recurring, today)
+    print_row("NumPy", numpy_seconds)
+    print(f"  speedup x{python_seconds / numpy_seconds:.1f}, results {'match' if result == expected else 'DIFFER'}")
+
+
+def bench_shards(todo, size, worker_counts):
+    """
+    Sharded storage queries with 1, 2, 4, ... pool workers, each split by
+    due month and by category, with the speedup over one worker.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(size)]
+    print(f"\nSharded storage, {size} tasks, {os.cpu_count()} CPUs:")
+    for shard_by in ("month", "category"):
+        with scratch_dir():
+            todo.config["storage"] = "sharded"
+            todo.config["shard_by"] = shard_by
+            todo.storage = todo.ShardedStorage()
+            todo.write_snapshot(tasks)
+            seconds, paths = timed(todo.storage.shard_files)
+            print(f" by {shard_by}: {len(paths)} shards, split in {seconds:.1f} s")
+            operations = [
+                ("load", lambda: todo.storage.load()),
+                ("page sort_by=due_date", lambda: todo.storage.page("due_date", 0, 20)),
+                ("search", lambda: todo.storage.search("review")),
+                ("category filter", lambda: todo.storage.select_categories([1], [3], [2])),
+                ("overdue", lambda: todo.storage.overdue_tasks(None)),
+                ("report stats", lambda: todo.storage.build_stats(None)),
+            ]
+            for name, operation in operations:
+                single = None
+                cells = []
+                for workers in worker_counts:
+                    todo.config["workers"] = workers
+                    seconds = timed(operation)[0]
+                    single = single or seconds
+                    cells.append(f"{workers}: {seconds * 1000:>7.0f} ms x{single / seconds:>4.1f}")
+                print(f"  {name:<24} " + "   ".join(cells))
+    todo.config.pop("workers", None)
+    todo.config.pop("shard_by", None)
+
+
+SHARED_TASK_ID = 1
+
+
+def stress_worker(todo, worker, ops, results):
+    """
+    One concurrent user. Every op is a fresh command (load, change, save):
+    add a task, toggle the one just added, or toggle the shared task, which
+    is retried after a conflict with another worker.
+    """
+    counts = {"adds": 0, "toggles": 0, "shared": 0, "conflicts": 0, "saves": 0, "lost": 0}
+    todo.storage = todo.get_storage()
+    mine = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(ops):
+            while True:
+                todo.pending_changes.clear()
+                todo.reset_task_indexes()
+                tasks = todo.load_tasks()
+                if i % 3 == 0:
+                    task = todo.assign_task_id(todo.Task(f"worker {worker} task {i}"))
+                    tasks.append(task)
+                    todo.record_change("add", task)
+                else:
+                    task = {t.id: t for t in tasks}.get(mine[-1] if i % 3 == 1 else SHARED_TASK_ID)
+                    if task is None:
+                        # Another writer's save overwrote it
+                        counts["lost"] += 1
+                        break
+                    todo.toggle_task(tasks, task)
+                conflicts = todo.save_tasks(tasks)
+                counts["saves"] += 1
+                if not conflicts:
+                    break
+                counts["conflicts"] += 1
+            if task is None:
+                continue
+            if i % 3 == 0:
+                # The save may have renumbered the task if another worker took its ID
+                mine.append(task.id)
+                counts["adds"] += 1
+            else:
+                counts["toggles" if i % 3 == 1 else "shared"] += 1
+    results.put(counts)
+
+
+def bench_concurrency(todo, processes, ops):
+    """
+    Run processes workers at once against each backend and check that no
+    update was lost: every added task is there once, every own toggle
+    stuck, and the shared task's state matches the number of its toggles.
+    """
+    context = multiprocessing.get_context("fork")
+    failures = []
+    print(f"\n{processes} processes x {ops} commands:")
+    for name in ("json", "journal", "sqlite", "ndjson", "binary", "sharded"):
+        with scratch_dir():
+            todo.config["storage"] = name
+            todo.storage = todo.get_storage()
+            todo.pending_changes.clear()
+            todo.reset_task_indexes()
+            with contextlib.redirect_stdout(io.StringIO()):
+                tasks = todo.load_tasks()
+                shared = todo.assign_task_id(todo.Task("shared"))
+                tasks.append(shared)
+                todo.record_change("add", shared)
+                todo.save_tasks(tasks)
+            if hasattr(todo.storage, "conn"):
+                todo.storage.conn.close()
+
+            results = context.Queue()
+            workers = [context.Process(target=stress_worker, args=(todo, n, ops, results)) for n in range(processes)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            totals = {}
+            for _ in workers:
+                for key, value in results.get().items():
+                    totals[key] = totals.get(key, 0) + value
+            for worker in workers:
+                worker.join()
+            seconds = time.perf_counter() - start
+
+            todo.storage = todo.get_storage()
+            todo.reset_task_indexes()
+            with contextlib.redirect_stdout(io.StringIO()):
+                tasks = todo.load_tasks()
+            by_id = {t.id: t for t in tasks}
+            own = [t for t in tasks if t.id != SHARED_TASK_ID]
+            problems = [f"{totals['lost']} tasks lost"] if totals["lost"] else []
+            if len(by_id) != len(tasks) or len(own) != totals["adds"]:
+                problems.append(f"{len(own)} tasks for {totals['adds']} adds")
+            if len({t.title for t in own}) != len(own):
+                problems.append("duplicate tasks")
+            if sum(t.completed for t in own) != totals["toggles"]:
+                problems.append(f"{sum(t.completed for t in own)} of {totals['toggles']} toggles kept")
+            if by_id[SHARED_TASK_ID].completed != (totals["shared"] % 2 == 1):
+                problems.append("shared task toggle lost")
+            if hasattr(todo.storage, "conn"):
+                todo.storage.conn.close()
+        print(f"  {name:<8} {totals['saves'] / seconds:>8.0f} saves/s  {totals['conflicts']:>5} conflicts retried  "
+              f"{'; '.join(problems) or 'no lost updates'}")
+        if problems:
+            failures.append(name)
+    return 1 if failures else 0
+
+
+# Operations faster than this are too noisy to flag as regressions
+MIN_COMPARE_SECONDS = 0.005
+
+
+@contextlib.contextmanager
+def answers(*replies):
+    """
+    Feed canned replies to input() so interactive commands can be timed.
+    """
+    import builtins
+    pending = list(replies)
+    original = builtins.input
+    builtins.input = lambda prompt="": pending.pop(0)
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+
+def reset_state(todo):
+    """
+    Forget every cached index and unsaved change, so each suite operation
+    runs cold like the first command of a fresh process.
+    """
+    todo.pending_changes.clear()
+    todo.change_listeners.clear()
+    todo.search_index = None
+    todo.due_index = None
+    todo.task_stats = None
+    todo.categories = todo.CategoryRegistry(todo.DEFAULT_CATEGORIES)
+    for filename in (todo.SEARCH_INDEX_FILE, todo.STATS_FILE):
+        if os.path.exists(filename):
+            os.remove(filename)
+
+
+def suite_operations(todo):
+    """
+    (name, function of the task list) for every hot path the suite covers.
+    """
+    def save_one_change(tasks):
+        tasks[0].title = tasks[0].title[::-1]
+        todo.record_change("update", tasks[0])
+        todo.save_tasks(tasks)
+
+    def interactive(fn, *replies):
+        def run(tasks):
+            with answers(*replies):
+                fn(tasks)
+        return run
+
+    def startup(tasks):
+        subprocess.run([sys.executable, SCRIPT, "--list", "--limit", "20"], stdout=subprocess.DEVNULL, check=True)
+
+    return [
+        ("load_tasks", lambda tasks: todo.load_tasks()),
+        ("save_tasks", save_one_change),
+        ("archive_completed_tasks", lambda tasks: todo.archive_completed_tasks(tasks)),
+        ("display_tasks", lambda tasks: todo.display_tasks(list(tasks))),
+        ("display_tasks sort_by=due_date", lambda tasks: todo.display_tasks(list(tasks), sort_by="due_date")),
+        ("display_tasks sort_by=priority", lambda tasks: todo.display_tasks(list(tasks), sort_by="priority")),
+        ("display_tasks sort_by=category", lambda tasks: todo.display_tasks(list(tasks), sort_by="category")),
+        ("search_tasks", interactive(todo.search_tasks, "report")),
+        ("filter_tasks_by_multiple_categories",
+         interactive(lambda tasks: todo.filter_tasks_by_multiple_categories(tasks, todo.categories), "1,+3")),
+        ("view_tasks_by_day", interactive(todo.view_tasks_by_day, "2026-06-15")),
+        ("show_report", lambda tasks: todo.show_report(tasks)),
+        ("export_tasks_to_csv", lambda tasks: todo.export_tasks_to_csv(tasks, "bench.csv")),
+        ("export_tasks_to_json", lambda tasks: todo.export_tasks_to_json(tasks, "bench.json")),
+        ("startup --list --limit 20", startup),
+    ]
+
+
+def run_suite(todo, sizes, repeat, memory):
+    """
+    Time each operation (best of repeat) on a fresh copy of the tasks and,
+    in a separate traced run, record its peak memory.
+    """
+    results = {}
+    for size in sizes:
+        print(f"\nSuite, {size} tasks:")
+        dicts = make_tasks(size)
+        results[str(size)] = measured = {}
+        with scratch_dir():
+            todo.config["storage"] = "json"
+            todo.storage = todo.JsonStorage()
+            with contextlib.redirect_stdout(io.StringIO()):
+                todo.write_snapshot([todo.Task.from_dict(data) for data in dicts])
+            for name, operation in suite_operations(todo):
+                runs = []
+                for _ in range(repeat + memory):
+                    reset_state(todo)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        tasks = todo.load_tasks()
+                    tracing = len(runs) == repeat
+                    if tracing:
+                        gc.collect()
+                        tracemalloc.start()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        seconds = timed(operation, tasks)[0]
+                    if tracing:
+                        peak = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                    else:
+                        runs.append(seconds)
+                measured[name] = {"seconds": min(runs), "peak_bytes": peak if memory else None}
+                peak_text = f"   peak {peak / 1e6:>8.1f} MB" if memory else ""
+                print(f"  {name:<40} {min(runs) * 1000:>10.1f} ms{peak_text}")
+        reset_state(todo)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare_results(current, baseline, time_threshold, memory_threshold):
+    """
+    Print how each operation moved against the baseline and return the
+    ones that got slower (or bigger) than the thresholds allow.
+    """
+    regressions = []
+    print("\nAgainst baseline:")
+    for size, operations in current["results"].items():
+        for name, now in operations.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if not before:
+                continue
+            time_ratio = now["seconds"] / before["seconds"] if before["seconds"] else 1.0
+            notes = []
+            if time_ratio > 1 + time_threshold and now["seconds"] >= MIN_COMPARE_SECONDS:
+                notes.append("slower")
+            if now.get("peak_bytes") and before.get("peak_bytes"):
+                memory_ratio = now["peak_bytes"] / before["peak_bytes"]
+                if memory_ratio > 1 + memory_threshold:
+                    notes.append(f"memory x{memory_ratio:.2f}")
+            if notes:
+                regressions.append(f"{size} {name}")
+            print(f"  {size:>8} {name:<40} x{time_ratio:>5.2f}  {', '.join(notes) or 'ok'}")
+    return regressions
+
+
+def bench_suite(todo, args):
+    current = run_suite(todo, args.sizes, args.repeat, not args.no_memory)
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_results(current, baseline, args.time_threshold, args.memory_threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="To-do list benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+    storage = sub.add_parser("storage", help="JSON vs SQLite backend")
+    storage.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    alerts = sub.add_parser("alerts", help="startup overdue alerts and reminders")
+    alerts.add_argument("--size", type=int, default=100000)
+    memory = sub.add_parser("memory", help="dicts vs Task vs TaskTable footprint")
+    memory.add_argument("--size", type=int, default=1000000)
+    search = sub.add_parser("search", help="trigram title index vs linear scan")
+    search.add_argument("--size", type=int, default=1000000)
+    export = sub.add_parser("export", help="streaming exporters")
+    export.add_argument("--size", type=int, default=100000)
+    lazy = sub.add_parser("lazy", help="NDJSON offset index vs full JSON load")
+    lazy.add_argument("--size", type=int, default=100000)
+    formats = sub.add_parser("formats", help="JSON vs NDJSON vs binary snapshot: file size and load time")
+    formats.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    backups = sub.add_parser("backups", help="incremental chunked backups: bytes and time per generation")
+    backups.add_argument("--size", type=int, default=100000)
+    scheduler = sub.add_parser("scheduler", help="timer-heap reminder scheduler vs rescanning")
+    scheduler.add_argument("--size", type=int, default=1000000)
+    report = sub.add_parser("report", help="incremental report statistics vs full scan")
+    report.add_argument("--size", type=int, default=100000)
+    bulk = sub.add_parser("import", help="bulk --import into each backend")
+    bulk.add_argument("--size", type=int, default=100000)
+    startup = sub.add_parser("startup", help="import time and CLI wall clock against budgets")
+    startup.add_argument("--size", type=int, default=10000)
+    startup.add_argument("--check", action="store_true", help="exit non-zero when over budget")
+    recurrence = sub.add_parser("recurrence", help="per-rule vs vectorized next occurrence")
+    recurrence.add_argument("--size", type=int, default=100000)
+    concurrency = sub.add_parser("concurrency", help="concurrent writers: throughput and lost-update check")
+    concurrency.add_argument("--processes", type=int, default=8)
+    concurrency.add_argument("--ops", type=int, default=60, help="commands per process")
+    analytics = sub.add_parser("analytics", help="vectorized analytics vs pure Python")
+    analytics.add_argument("--size", type=int, default=100000)
+    analytics.add_argument("--archived", type=int, default=2000000)
+    shards = sub.add_parser("shards", help="sharded storage scaling across pool sizes")
+    shards.add_argument("--size", type=int, default=2000000)
+    shards.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    suite = sub.add_parser("suite", help="every hot path, with JSON results and baseline comparison")
+    suite.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    suite.add_argument("--repeat", type=int, default=3, help="timed runs per operation; the best counts")
+    suite.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory run")
+    suite.add_argument("--output", default="benchmark_results.json")
+    suite.add_argument("--baseline", default=None, help="results file to compare against")
+    suite.add_argument("--save-baseline", default=None, help="also write this run to a baseline file")
+    suite.add_argument("--time-threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    suite.add_argument("--memory-threshold", type=float, default=0.10, help="allowed peak memory growth")
+    args = parser.parse_args()
+
+    with scratch_dir():
+        todo = load_todo_module()
+    if args.benchmark == "storage":
+        bench_storage(todo, args.sizes)
+    elif args.benchmark == "alerts":
+        bench_alerts(todo, args.size)
+    elif args.benchmark == "memory":
+        bench_memory(todo, args.size)
+    elif args.benchmark == "search":
+        bench_search(todo, args.size)
+    elif args.benchmark == "export":
+        bench_export(todo, args.size)
+    elif args.benchmark == "lazy":
+        bench_lazy(todo, args.size)
+    elif args.benchmark == "formats":
+        bench_formats(todo, args.sizes)
+    elif args.benchmark == "backups":
+        bench_backups(todo, args.size)
+    elif args.benchmark == "scheduler":
+        bench_scheduler(todo, args.size)
+    elif args.benchmark == "report":
+        bench_report(todo, args.size)
+    elif args.benchmark == "import":
+        bench_import(todo, args.size)
+    elif args.benchmark == "startup":
+        return bench_startup(todo, args.size, args.check)
+    elif args.benchmark == "recurrence":
+        bench_recurrence(todo, args.size)
+    elif args.benchmark == "analytics":
+        bench_analytics(todo, args.size, args.archived)
+    elif args.benchmark == "shards":
+        bench_shards(todo, args.size, args.workers)
+    elif args.benchmark == "concurrency":
+        return bench_concurrency(todo, args.processes, args.ops)
+    elif args.benchmark == "suite":
+        return bench_suite(todo, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Shared setup for the tests: the to-do module loaded from to-do-list.py, task
+data to run it on, and a test case that runs each test in its own throwaway
+directory, so the real todo_list.json is never touched.
+"""
+import datetime
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def load_module():
+    """
+    Import to-do-list.py (its file name is not a valid module name) without
+    opening any storage; ScratchTestCase does that per test.
+    """
+    spec = importlib.util.spec_from_file_location("todo", os.path.join(ROOT, "to-do-list.py"))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so forked workers can pickle references to its functions
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+todo = sys.modules.get("todo") or load_module()
+
+WORDS = ["report", "email", "groceries", "workout", "read", "call", "invoice", "review",
+         "meeting", "laundry", "python", "budget", "dentist", "plan", "backup", "garden"]
+PRIORITIES = ["High", "Medium", "Low"]
+RECURRING = [None, None, None, "daily", "weekly", "monthly", "yearly"]
+
+
+def make_tasks(n, seed=42, completed_ratio=0.2):
+    """
+    n task dicts with IDs 1..n: mixed priorities, categories 1-5, recurrence
+    and due dates spread over 2025-2028. Titles end in "#<id>".
+    """
+    rng = random.Random(seed)
+    start = datetime.date(2025, 1, 1).toordinal()
+    tasks = []
+    for i in range(1, n + 1):
+        completed = rng.random() < completed_ratio
+        due = datetime.date.fromordinal(start + rng.randrange(0, 365 * 4))
+        tasks.append({
+            "id": i,
+            "title": " ".join(rng.sample(WORDS, rng.randint(1, 4))) + f" #{i}",
+            "completed": completed,
+            "due_date": due.strftime("%Y-%m-%d") if rng.random() < 0.9 else None,
+            "priority": rng.choice(PRIORITIES),
+            "recurring": rng.choice(RECURRING),
+            "categories": rng.sample(range(1, 6), rng.randint(0, 2)),
+            "completion_timestamp": f"{due.strftime('%Y-%m-%d')} 12:00:00" if completed else None,
+        })
+    return tasks
+
+
+def make_archive_rows(n, seed=7):
+    """
+    n archived (completed) task dicts, due over the last two years and
+    completed from a few days early to two months late.
+    """
+    rng = random.Random(seed)
+    today = datetime.date.today().toordinal()
+    rows = []
+    for i in range(n):
+        due = today - rng.randrange(0, 730)
+        done = datetime.date.fromordinal(due + rng.randrange(-5, 60))
+        rows.append({
+            "id": i,
+            "title": f"archived #{i}",
+            "completed": True,
+            "due_date": datetime.date.fromordinal(due).strftime("%Y-%m-%d") if rng.random() < 0.9 else None,
+            "priority": rng.choice(PRIORITIES),
+            "categories": rng.sample([1, 2, 3, 4, 5], rng.randint(0, 2)),
+            "completion_timestamp": done.strftime("%Y-%m-%d") + " 18:00:00",
+        })
+    return rows
+
+
+class ScratchTestCase(unittest.TestCase):
+    """
+    Runs every test inside an empty temporary directory with the module's
+    in-memory state (config, pending changes, indexes, storage) reset.
+    """
+
+    def setUp(self):
+        previous = os.getcwd()
+        scratch = tempfile.TemporaryDirectory()
+        os.chdir(scratch.name)
+        self.addCleanup(scratch.cleanup)
+        self.addCleanup(os.chdir, previous)
+        # No config.json here, so this is the default configuration
+        todo.config = todo.load_config()
+        self.use_storage("json")
+
+    def use_storage(self, name):
+        todo.config["storage"] = name
+        todo.storage = todo.get_storage()
+        todo.pending_changes.clear()
+        todo.loaded_signature = None
+        todo.reset_task_indexes()
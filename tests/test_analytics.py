@@ -0,0 +1,78 @@
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import unittest
+
+from support import ScratchTestCase, make_archive_rows, make_tasks, todo
+
+
+class AnalyticsTest(ScratchTestCase):
+
+    def columns(self, wide):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(2000, seed=7)]
+        rows = make_archive_rows(2000)
+        if wide:
+            tasks[0].categories = [2, 70]
+            tasks[0].due = todo.today_ordinal()
+            rows[0]["categories"] = [1, 130]
+        recurring = [task for task in tasks if task.rule and (task.rule.start or task.due)]
+        return todo.analytics_columns(tasks, rows), recurring
+
+    def test_wide_masks_fall_back_to_ints(self):
+        columns, _ = self.columns(wide=True)
+        self.assertIsInstance(columns["cat_mask"], list)
+        self.assertEqual(columns["cat_mask"][0], 1 << 2 | 1 << 70)
+        self.assertEqual(columns["cat_mask"][2000], 1 << 1 | 1 << 130)
+        self.assertEqual(len(columns["cat_mask"]), len(columns["due"]))
+
+    @unittest.skipIf(importlib.util.find_spec("numpy") is None, "NumPy is not installed")
+    def test_numpy_matches_python(self):
+        today = todo.today_ordinal()
+        for wide in (False, True):
+            with self.subTest(wide=wide):
+                columns, recurring = self.columns(wide)
+                expected = todo.analytics_python(columns, recurring, today)
+                self.assertEqual(todo.analytics_numpy(columns, recurring, today), expected)
+                categories = {row["category"] for row in expected["completion_rate"]}
+                self.assertEqual(70 in categories, wide)
+
+
+class ShowAnalyticsTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def archive(self):
+        tasks = [todo.Task.from_dict(data) for data in make_tasks(300, seed=2)]
+        for task in tasks:
+            todo.record_change("add", task)
+        todo.save_tasks(tasks)
+        tasks = todo.archive_completed_tasks(todo.load_tasks())
+        todo.save_tasks(tasks)
+        return todo.load_tasks()
+
+    def test_archived_rows_are_counted(self):
+        for storage in todo.STORAGE_BACKENDS:
+            with self.subTest(storage=storage):
+                os.mkdir(storage)
+                os.chdir(storage)
+                self.use_storage(storage)
+                tasks = self.archive()
+                archived = list(todo.storage.iter_archive())
+                self.assertGreater(len(archived), 0)
+                # The archive reaches the columns as a generator, exactly as --analytics passes it
+                columns = todo.analytics_columns(tasks, todo.storage.iter_archive())
+                self.assertEqual(len(columns["due"]), len(tasks) + len(archived))
+                self.assertEqual(len(columns["cat_mask"]), len(columns["due"]))
+                with contextlib.redirect_stdout(io.StringIO()) as out:
+                    todo.show_analytics(tasks, "json")
+                shown, expected = json.loads(out.getvalue()), todo.compute_analytics(tasks, archived)
+                for name in ("lateness", "lateness_summary", "recurring_adherence"):
+                    self.assertEqual(shown[name], expected[name], name)
+                os.chdir(os.pardir)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import contextlib
+import io
+import os
+import unittest
+import zlib
+
+from support import ScratchTestCase, todo
+
+
+class BackupTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        self.addCleanup(todo.config.update, {"backup_count": 10, "backup_days": 7})
+        self.snapshots = []
+
+    def save(self, titles):
+        tasks = [todo.Task(title, id=n, version=1) for n, title in enumerate(titles, 1)]
+        todo.write_snapshot(tasks)
+        self.snapshots.append(todo.snapshot_text(tasks).encode("utf-8"))
+
+    def titles(self):
+        return [task.title for task in todo.load_tasks()]
+
+    def test_generations_hold_each_snapshot(self):
+        self.save(["a", "b"])
+        self.save(["a", "b", "c"])
+        self.save(["a", "B", "c"])
+        self.assertEqual(todo.backup_generations(), [1, 2, 3])
+        for generation, expected in enumerate(self.snapshots, 1):
+            self.assertEqual(todo.read_backup(generation), (expected, None))
+
+    def test_unchanged_snapshot_adds_no_generation(self):
+        self.save(["a"])
+        self.save(["a"])
+        self.assertEqual(todo.backup_generations(), [1])
+
+    def test_edit_stores_only_changed_chunks(self):
+        self.save([f"task {n}" for n in range(5000)])
+        self.save([f"task {n}" if n != 2500 else "edited" for n in range(5000)])
+        first, second = todo.read_backup_manifest(1), todo.read_backup_manifest(2)
+        self.assertLess(second["stored"], first["stored"] / 20)
+        self.assertEqual(todo.read_backup(2), (self.snapshots[1], None))
+
+    def test_restore_generation(self):
+        for storage in ("json", "journal"):
+            with self.subTest(storage=storage):
+                os.mkdir(storage)
+                os.chdir(storage)
+                self.use_storage(storage)
+                self.snapshots = []
+                self.save(["a", "b"])
+                self.save(["a", "b", "c"])
+                self.save(["c", "d"])
+                self.assertTrue(todo.restore_backup(2))
+                self.assertEqual(self.titles(), ["a", "b", "c"])
+                # The restore is an ordinary save, undone by restoring the generation before it
+                self.assertTrue(todo.restore_backup(3))
+                self.assertEqual(self.titles(), ["c", "d"])
+                os.chdir(os.pardir)
+
+    def test_damaged_chunk_is_refused(self):
+        self.save(["a", "b"])
+        self.save(["c"])
+        chunk_id = todo.read_backup_manifest(1)["chunks"][0]
+        with open(todo.chunk_path(chunk_id), 'wb') as f:
+            f.write(zlib.compress(b"tampered"))
+        data, error = todo.read_backup(1)
+        self.assertIsNone(data)
+        self.assertIn("does not match its hash", error)
+        self.assertFalse(todo.restore_backup(1))
+        self.assertEqual(self.titles(), ["c"])
+        self.assertEqual(todo.read_backup(99), (None, "No backup generation 99."))
+
+    def test_prune_keeps_newest_generations(self):
+        todo.config.update({"backup_count": 2, "backup_days": 0})
+        for n in range(5):
+            self.save([f"version {n}"])
+        self.assertEqual(todo.backup_generations(), [4, 5])
+        self.assertEqual(todo.read_backup(4), (self.snapshots[3], None))
+        chunks = sum(len(names) for _, _, names in os.walk(todo.BACKUP_CHUNK_DIR))
+        self.assertEqual(chunks, 2)
+
+    def test_legacy_backups_are_imported(self):
+        with open(todo.BACKUP_FILE, 'w') as f:
+            f.write('[{"title": "legacy"}]')
+        self.save(["current"])
+        self.assertFalse(os.path.exists(todo.BACKUP_FILE))
+        self.assertEqual(todo.read_backup(1), (b'[{"title": "legacy"}]', None))
+        self.assertEqual(todo.read_backup(2), (self.snapshots[0], None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import unittest
+
+from support import ScratchTestCase, todo
+
+
+def sample_tasks():
+    rows = [
+        {"title": "Plain", "due_date": "2026-03-01", "priority": "High", "categories": [1, 2]},
+        {"title": "Done", "completed": True, "completion_timestamp": "2026-02-01 08:30:00", "categories": [63]},
+        {"title": "Wide categories", "due_date": "2026-04-01", "categories": [1, 64, 70, 200]},
+        {"title": "Weekly", "due_date": "2026-03-02", "recurring": "weekly", "every": 2,
+         "until": "2026-12-31", "exceptions": ["2026-03-16"]},
+        {"title": "Unparseable", "due_date": "2025-02-30", "priority": "Urgent"},
+        {"title": "Ünïcödé ✓", "priority": "Low"},
+    ]
+    tasks = [todo.Task.from_dict(row) for row in rows]
+    todo.ensure_task_ids(tasks)
+    return tasks
+
+
+class BinaryRoundTripTest(ScratchTestCase):
+
+    def test_write_read_round_trip(self):
+        tasks = sample_tasks()
+        todo.write_binary_tasks(tasks, "tasks.bin")
+        back = todo.read_tasks_file("tasks.bin", "binary")
+        self.assertEqual([t.to_dict() for t in back], [t.to_dict() for t in tasks])
+
+    def test_masks_wider_than_64_bits(self):
+        tasks = sample_tasks()
+        todo.write_binary_tasks(tasks, "tasks.bin")
+        task_file = todo.BinaryTaskFile("tasks.bin")
+        try:
+            self.assertEqual(task_file.task(2).categories, [1, 64, 70, 200])
+            self.assertEqual(task_file.field(2, "cat_mask"), tasks[2].cat_mask)
+            self.assertEqual(task_file.field(1, "cat_mask"), 1 << 63)
+        finally:
+            task_file.close()
+
+    def test_header_counts_and_due_range(self):
+        tasks = sample_tasks()
+        todo.write_binary_tasks(tasks, "tasks.bin")
+        task_file = todo.BinaryTaskFile("tasks.bin")
+        try:
+            self.assertEqual(len(task_file), len(tasks))
+            self.assertEqual(task_file.completed, 1)
+            first, last = todo.date_ordinal("2026-03-01"), todo.date_ordinal("2026-03-31")
+            self.assertEqual([t.title for t in task_file.due_between(first, last)], ["Plain", "Weekly"])
+            self.assertEqual(task_file.count_due_between(first, last), 2)
+        finally:
+            task_file.close()
+
+    def test_convert_json_to_binary_and_back(self):
+        tasks = sample_tasks()
+        todo.write_snapshot(tasks)
+        todo.convert_tasks(todo.TODO_FILE, "tasks.bin")
+        todo.convert_tasks("tasks.bin", "again.json")
+        self.assertEqual([t.to_dict() for t in todo.read_tasks_file("again.json", "json")],
+                         [t.to_dict() for t in tasks])
+
+    def test_binary_storage_save_and_load(self):
+        tasks = sample_tasks()
+        self.use_storage("binary")
+        todo.storage.save(tasks)
+        todo.storage.reset()
+        self.assertTrue(os.path.exists(todo.BINARY_FILE))
+        self.assertEqual([t.to_dict() for t in todo.storage.load()], [t.to_dict() for t in tasks])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import unittest
+
+from support import ScratchTestCase, todo
+
+PROCESSES = 4
+COMMANDS = 20
+
+
+def run_commands(worker, results):
+    """
+    One user running COMMANDS fresh commands (load, change, save): add a
+    task, toggle the one just added, or toggle the shared task 1, retried
+    after a conflict with another process.
+    """
+    counts = {"adds": 0, "toggles": 0, "shared": 0, "lost": 0}
+    todo.storage = todo.get_storage()
+    mine = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(COMMANDS):
+            while True:
+                todo.pending_changes.clear()
+                todo.reset_task_indexes()
+                tasks = todo.load_tasks()
+                if i % 3 == 0:
+                    task = todo.assign_task_id(todo.Task(f"worker {worker} task {i}"))
+                    tasks.append(task)
+                    todo.record_change("add", task)
+                else:
+                    task = {t.id: t for t in tasks}.get(mine[-1] if i % 3 == 1 else 1)
+                    if task is None:
+                        counts["lost"] += 1
+                        break
+                    todo.toggle_task(tasks, task)
+                if not todo.save_tasks(tasks):
+                    break
+            if task is None:
+                continue
+            if i % 3 == 0:
+                # The save renumbers the task if another process took its ID first
+                mine.append(task.id)
+                counts["adds"] += 1
+            else:
+                counts["toggles" if i % 3 == 1 else "shared"] += 1
+    results.put(counts)
+
+
+class ConcurrencyTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "needs fork")
+    def test_no_lost_updates(self):
+        context = multiprocessing.get_context("fork")
+        for name in todo.STORAGE_BACKENDS:
+            with self.subTest(storage=name):
+                os.mkdir(name)
+                os.chdir(name)
+                self.use_storage(name)
+                tasks = todo.load_tasks()
+                shared = todo.assign_task_id(todo.Task("shared"))
+                tasks.append(shared)
+                todo.record_change("add", shared)
+                todo.save_tasks(tasks)
+                if isinstance(todo.storage, todo.SqliteStorage):
+                    todo.storage.conn.close()
+
+                results = context.Queue()
+                workers = [context.Process(target=run_commands, args=(n, results)) for n in range(PROCESSES)]
+                for worker in workers:
+                    worker.start()
+                totals = {}
+                for _ in workers:
+                    for key, value in results.get(timeout=60).items():
+                        totals[key] = totals.get(key, 0) + value
+                for worker in workers:
+                    worker.join()
+
+                self.use_storage(name)
+                tasks = todo.load_tasks()
+                own = [t for t in tasks if t.id != 1]
+                self.assertEqual(totals["lost"], 0)
+                self.assertEqual(len({t.id for t in tasks}), len(tasks))
+                self.assertEqual(len({t.title for t in own}), totals["adds"])
+                self.assertEqual(len(own), totals["adds"])
+                self.assertEqual(sum(t.completed for t in own), totals["toggles"])
+                self.assertEqual(tasks[0].completed, totals["shared"] % 2 == 1)
+                if isinstance(todo.storage, todo.SqliteStorage):
+                    todo.storage.conn.close()
+                os.chdir(os.pardir)
+
+    def test_merge_keeps_external_listeners(self):
+        seen = []
+        listener = lambda op, task, before=None: seen.append((op, task.title))
+        todo.change_listeners.append(listener)
+        self.addCleanup(todo.change_listeners.remove, listener)
+        tasks = todo.load_tasks()
+        todo.get_due_index(tasks)
+        todo.get_category_index(tasks)
+        other = todo.Task.from_dict({"id": 1, "title": "from another process"})
+        todo.write_snapshot([other])
+
+        todo.merge_concurrent_changes(tasks)
+        self.assertEqual([t.title for t in tasks], ["from another process"])
+        self.assertEqual(todo.change_listeners, [listener])
+        task = todo.assign_task_id(todo.Task("after the merge"))
+        todo.record_change("add", task)
+        self.assertEqual(seen, [("add", "after the merge")])
+
+
+if __name__ == "__main__":
+    unittest.main()
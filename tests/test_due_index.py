@@ -0,0 +1,69 @@
+import contextlib
+import io
+import random
+import unittest
+
+from support import ScratchTestCase, make_tasks, todo
+
+
+class DueDateIndexTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        self.tasks = [todo.Task.from_dict(data) for data in make_tasks(1000, seed=8)]
+        todo.ensure_task_ids(self.tasks)
+        self.index = todo.get_due_index(self.tasks)
+        self.rng = random.Random(4)
+
+    def change(self, count):
+        for _ in range(count):
+            task = self.rng.choice(self.tasks)
+            action = self.rng.random()
+            if action < 0.4:
+                todo.toggle_task(self.tasks, task)
+            elif action < 0.8:
+                before = task.copy()
+                task.due_date = self.rng.choice([None, "2026-05-01", "2027-02-14", task.due_date])
+                todo.record_change("update", task, before)
+            elif action < 0.9:
+                self.tasks.remove(task)
+                todo.record_change("remove", task)
+            else:
+                added = todo.assign_task_id(todo.Task.from_dict({"title": "new", "due_date": "2026-05-01"}))
+                self.tasks.append(added)
+                todo.record_change("add", added)
+
+    def assertMatchesRebuild(self):
+        fresh = todo.DueDateIndex.build(self.tasks)
+        self.assertEqual(self.index.range(1, todo.NO_DUE_DATE), fresh.range(1, todo.NO_DUE_DATE))
+        self.assertEqual(self.index.keys, fresh.keys)
+        self.assertEqual(self.index.count(todo.date_ordinal("2026-05-01"), todo.date_ordinal("2026-05-01")),
+                         fresh.count(todo.date_ordinal("2026-05-01"), todo.date_ordinal("2026-05-01")))
+
+    def test_changes_are_merged_on_lookup(self):
+        keys = self.index.keys
+        before = keys.tolist()
+        self.change(200)
+        self.assertIs(self.index.keys, keys)
+        self.assertEqual(keys.tolist(), before)
+        self.assertMatchesRebuild()
+        self.assertFalse(self.index.added or self.index.removed)
+
+    def test_small_and_large_batches_match_a_rebuild(self):
+        for batch in (1, 3, todo.DUE_INDEX_MERGE_SINGLE, todo.DUE_INDEX_MERGE_SINGLE + 1, 400):
+            with self.subTest(batch=batch):
+                self.change(batch)
+                self.assertMatchesRebuild()
+
+    def test_update_that_keeps_the_date_is_a_no_op(self):
+        task = next(task for task in self.tasks if task.due and not task.completed)
+        before = task.copy()
+        task.title = "renamed"
+        todo.record_change("update", task, before)
+        self.assertFalse(self.index.added or self.index.removed)
+        self.assertIn(task, self.index.on(task.due))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import contextlib
+import io
+import unittest
+
+from support import ScratchTestCase, todo
+
+RECURRING = {"id": 1, "title": "Water plants", "due_date": "2026-03-07", "recurring": "weekly", "priority": "Low",
+             "categories": [2, 3], "every": 2, "until": "2026-12-31", "start": "2026-01-10",
+             "exceptions": ["2026-01-10", "2026-01-24", "2026-03-21"]}
+
+
+class ExportImportTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def test_round_trip_keeps_the_schedule(self):
+        original = todo.Task.from_dict(RECURRING)
+        for fmt in todo.EXPORT_WRITERS:
+            with self.subTest(fmt=fmt):
+                filename = "export" + todo.EXPORT_FORMATS[fmt]
+                todo.export_tasks([original], fmt, filename)
+                tasks = []
+                self.assertEqual(todo.import_tasks(tasks, filename), 1)
+                imported = todo.load_tasks()[-1]
+                expected = dict(original.to_dict(), id=imported.id, version=imported.version)
+                self.assertEqual(imported.to_dict(), expected)
+                self.assertEqual(todo.next_occurrence(imported, imported.due), todo.next_occurrence(original, original.due))
+
+    def test_invalid_rule_dates_are_rejected(self):
+        for field, value, message in (("start", "2026-02-30", "invalid start date"),
+                                      ("exceptions", "2026-01-10;someday", "invalid completed occurrence 'someday'")):
+            with self.subTest(field=field):
+                task, error = todo.import_row_task(dict(RECURRING, **{field: value}))
+                self.assertIsNone(task)
+                self.assertIn(message, error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import contextlib
+import io
+import os
+import unittest
+
+from support import ScratchTestCase, todo
+
+
+def lines_on_disk():
+    with open(todo.JOURNAL_FILE, 'rb') as f:
+        return f.read().count(b"\n")
+
+
+class JournalCountTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.use_storage("journal")
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        todo.config["journal_compact_ops"] = 10
+        todo.config["fsync"] = False
+        self.addCleanup(todo.config.update, {"journal_compact_ops": 1000, "fsync": True})
+        self.tasks = todo.load_tasks()
+
+    def add(self, *titles):
+        for title in titles:
+            task = todo.assign_task_id(todo.Task(title))
+            self.tasks.append(task)
+            todo.record_change("add", task)
+        todo.save_tasks(self.tasks)
+
+    def test_count_follows_appends_without_rereading(self):
+        self.add("a", "b", "c")
+        self.assertEqual(todo.journal_line_count(), 3)
+        reads = []
+        real_open = open
+        self.addCleanup(delattr, todo, "open")
+        todo.open = lambda name, mode='r', *args: reads.append((name, mode)) or real_open(name, mode, *args)
+        self.add("d")
+        self.assertEqual(todo.journal_lines[2], lines_on_disk())
+        self.assertNotIn((todo.JOURNAL_FILE, 'rb'), reads)
+
+    def test_other_writers_lines_are_counted(self):
+        self.add("a")
+        entry = {"op": "add", "task": todo.Task("theirs", id=99, version=1).to_dict()}
+        with open(todo.JOURNAL_FILE, 'a') as f:
+            f.write(todo.json.dumps(entry) + "\n" + todo.json.dumps(entry)[:20])
+        self.assertEqual(todo.journal_line_count(), 2)
+        with open(todo.JOURNAL_FILE, 'a') as f:
+            f.write(todo.json.dumps(entry)[20:] + "\n")
+        self.assertEqual(todo.journal_line_count(), 3)
+
+    def test_replay_seeds_the_count(self):
+        self.add("a", "b")
+        todo.journal_lines = None
+        self.tasks = todo.load_tasks()
+        self.assertEqual(todo.journal_lines, (os.stat(todo.JOURNAL_FILE).st_ino, os.path.getsize(todo.JOURNAL_FILE), 2))
+
+    def test_compaction_at_the_op_limit(self):
+        for n in range(9):
+            self.add(f"task {n}")
+        self.assertEqual(lines_on_disk(), 9)
+        self.add("tenth")
+        self.assertFalse(os.path.exists(todo.JOURNAL_FILE))
+        self.assertIsNone(todo.journal_lines)
+        self.add("after")
+        self.assertEqual(todo.journal_line_count(), 1)
+        self.assertEqual(len(todo.load_tasks()), 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import contextlib
+import datetime
+import io
+import unittest
+
+from support import ScratchTestCase, make_tasks, todo
+
+
+def day(text):
+    return datetime.date.fromisoformat(text).toordinal()
+
+
+class QueryParserTest(ScratchTestCase):
+
+    def parse(self, text):
+        return todo.QueryParser(text, todo.categories).parse()
+
+    def test_and_binds_tighter_than_or(self):
+        self.assertEqual(self.parse("priority=high or priority=low and status=pending"),
+                         ("or", [("cmp", "priority", "=", 0),
+                                 ("and", [("cmp", "priority", "=", 2), ("cmp", "status", "=", False)])]))
+
+    def test_parentheses_override_precedence(self):
+        self.assertEqual(self.parse("(priority=high or priority=low) and status=pending"),
+                         ("and", [("or", [("cmp", "priority", "=", 0), ("cmp", "priority", "=", 2)]),
+                                  ("cmp", "status", "=", False)]))
+
+    def test_not_applies_to_the_next_term(self):
+        self.assertEqual(self.parse("not cat=work and id>3"),
+                         ("and", [("not", ("cmp", "cat", "=", 1)), ("cmp", "id", ">", 3)]))
+        self.assertEqual(self.parse("not (cat=work and id>3)"),
+                         ("not", ("and", [("cmp", "cat", "=", 1), ("cmp", "id", ">", 3)])))
+
+    def test_nested_conjunctions_are_flattened(self):
+        self.assertEqual(self.parse("id>1 and (id<9 and id!=5)"),
+                         ("and", [("cmp", "id", ">", 1), ("cmp", "id", "<", 9), ("cmp", "id", "!=", 5)]))
+
+    def test_values_are_converted(self):
+        self.assertEqual(self.parse('Due_Date<=2026-03-01 and prio in (high, medium) and title~"a b"'),
+                         ("and", [("cmp", "due", "<=", day("2026-03-01")), ("cmp", "priority", "in", [0, 1]),
+                                  ("cmp", "title", "~", "a b")]))
+        self.assertEqual(self.parse("category in (Work, shopping)"), ("cmp", "cat", "in", [1, 4]))
+        self.assertEqual(self.parse("due=none"), ("cmp", "due", "=", 0))
+
+    def test_errors(self):
+        cases = {
+            "": "The query is empty.",
+            "id=1 id=2": "Expected 'and' or 'or' near 'id'.",
+            "(id=1": "Expected '\\)' at the end of the query.",
+            "size>3": "Unknown field 'size'. Fields: title, priority",
+            "id": "Expected an operator after 'id' at the end of the query.",
+            "title<abc": "'title' does not support '<'",
+            "due>tomorrow": "Invalid date 'tomorrow'",
+            "priority=urgent": "Invalid priority 'urgent'",
+            "status=done": "Invalid status 'done'",
+            "cat=chores": "Unknown category 'chores'.",
+            "due<none": "'due' can only be compared to none with = or !=.",
+            "id=x": "Invalid task ID 'x'.",
+            "and id=1": "Unknown field 'and'.",
+        }
+        for text, message in cases.items():
+            with self.subTest(text):
+                with self.assertRaisesRegex(ValueError, "^" + message):
+                    self.parse(text)
+
+
+class RunQueryTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        self.tasks = [todo.Task.from_dict(data) for data in make_tasks(2000, seed=11)]
+
+    def assertMatches(self, text, predicate):
+        matches, plan = todo.run_query(self.tasks, text)
+        expected = [task for task in self.tasks if predicate(task)]
+        self.assertEqual([task.id for task in matches], [task.id for task in expected], text)
+        return plan["path"][0]
+
+    def test_results_match_a_brute_force_filter(self):
+        cases = {
+            "priority=high or priority=low and status=completed":
+                lambda t: t.priority == "High" or (t.priority == "Low" and t.completed),
+            "(priority=high or priority=low) and status=completed":
+                lambda t: t.priority in ("High", "Low") and t.completed,
+            "not cat=work and cat=fitness": lambda t: 1 not in t.categories and 3 in t.categories,
+            "not (cat=work and cat=fitness)": lambda t: not (1 in t.categories and 3 in t.categories),
+            "cat=none or due=none": lambda t: not t.categories or not t.due_date,
+            "priority>low and recurring!=none": lambda t: t.priority != "Low" and t.recurring,
+            "title~garden and not title~python": lambda t: "garden" in t.title and "python" not in t.title,
+        }
+        for text, predicate in cases.items():
+            with self.subTest(text):
+                self.assertMatches(text, predicate)
+
+    def test_due_index_needs_pending(self):
+        in_march = lambda t: t.due_date and "2026-03-01" <= t.due_date < "2026-04-01"
+        path = self.assertMatches("due>=2026-03-01 and due<2026-04-01 and status=pending",
+                                  lambda t: in_march(t) and not t.completed)
+        self.assertEqual(path, "due-date index")
+        _, plan = todo.run_query(self.tasks, "due>=2026-03-01 and due<2026-04-01")
+        self.assertEqual(plan["path"][0], "full scan")
+        self.assertEqual([name for name, _ in plan["notes"]], ["due-date index"])
+
+    def test_due_and_title_terms_together(self):
+        pending_in = lambda t, start, end: not t.completed and t.due_date and start <= t.due_date < end
+        path = self.assertMatches('status=pending and due>=2026-03-01 and due<2026-03-03 and title~"report"',
+                                  lambda t: pending_in(t, "2026-03-01", "2026-03-03") and "report" in t.title)
+        self.assertEqual(path, "due-date index")
+        path = self.assertMatches("status=pending and due<2028-01-01 and title~#1234",
+                                  lambda t: pending_in(t, "", "2028-01-01") and "#1234" in t.title)
+        self.assertEqual(path, "title index")
+
+    def test_category_index_for_rare_categories(self):
+        path = self.assertMatches("cat=work and cat=learning and priority=high",
+                                  lambda t: {1, 5} <= set(t.categories) and t.priority == "High")
+        self.assertEqual(path, "category index")
+
+    def test_title_index_for_rare_words(self):
+        path = self.assertMatches("title~#1234", lambda t: "#1234" in t.title)
+        self.assertEqual(path, "title index")
+
+    def test_terms_under_or_scan_everything(self):
+        path = self.assertMatches("title~#1234 or cat=work", lambda t: "#1234" in t.title or 1 in t.categories)
+        self.assertEqual(path, "full scan")
+
+    def test_explain_marks_the_chosen_path(self):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            todo.show_query(self.tasks, "title~#1234 and id>1000", explain=True)
+        lines = out.getvalue().splitlines()
+        self.assertIn('  access: title index on title ~ "#1234"', lines)
+        self.assertIn("  filter: id > 1000", lines)
+        self.assertTrue(any(line.startswith("  * title index") for line in lines))
+        self.assertTrue(any(line.startswith("    full scan") for line in lines))
+
+
+if __name__ == "__main__":
+    unittest.main()
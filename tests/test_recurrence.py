@@ -0,0 +1,67 @@
+import contextlib
+import io
+import os
+import unittest
+
+from support import ScratchTestCase, todo
+
+
+def day(text):
+    return todo.date_ordinal(text)
+
+
+class RecurrenceTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def daily(self, **rule):
+        return todo.Task.from_dict({"id": 1, "title": "Stretch", "due_date": "2026-03-01", "recurring": "daily",
+                                    **rule})
+
+    def test_completions_are_recorded(self):
+        task = self.daily(until="2026-03-03")
+        tasks = [task]
+        for _ in range(3):
+            todo.toggle_task(tasks, task)
+        self.assertTrue(task.completed)
+        self.assertEqual(task.rule.exceptions, (day("2026-03-01"), day("2026-03-02"), day("2026-03-03")))
+        # Reopening the last occurrence takes it back out of the history
+        todo.toggle_task(tasks, task)
+        self.assertFalse(task.completed)
+        self.assertEqual(task.rule.exceptions, (day("2026-03-01"), day("2026-03-02")))
+
+    def test_early_completions_are_skipped(self):
+        task = self.daily(exceptions=["2026-03-02", "2026-02-20"])
+        self.assertEqual(task.rule.exceptions, (day("2026-02-20"), day("2026-03-02")))
+        todo.complete_occurrence(task)
+        self.assertEqual(task.due_date, "2026-03-03")
+        self.assertEqual(task.rule.done_after(task.due), ())
+        self.assertEqual(len(task.rule.exceptions), 3)
+        views = todo.recurring_occurrences([task], day("2026-03-01"), day("2026-03-06"))
+        self.assertEqual([view.due_date for view in views], ["2026-03-04", "2026-03-05", "2026-03-06"])
+
+    def test_history_survives_every_backend(self):
+        for storage in todo.STORAGE_BACKENDS:
+            with self.subTest(storage=storage):
+                os.mkdir(storage)
+                os.chdir(storage)
+                self.use_storage(storage)
+                task = self.daily(until="2026-03-02")
+                todo.record_change("add", task)
+                todo.save_tasks([task])
+                tasks = todo.load_tasks()
+                todo.toggle_task(tasks, tasks[0])
+                todo.save_tasks(tasks)
+                tasks = todo.load_tasks()
+                self.assertEqual(tasks[0].rule.exceptions, (day("2026-03-01"),))
+                todo.toggle_task(tasks, tasks[0])
+                todo.save_tasks(todo.archive_completed_tasks(tasks))
+                [row] = todo.storage.iter_archive()
+                self.assertEqual(row["exceptions"], ["2026-03-01", "2026-03-02"])
+                os.chdir(os.pardir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import contextlib
+import io
+import os
+import unittest
+
+from support import ScratchTestCase, todo
+
+
+def rejected(*args, **kwargs):
+    raise AssertionError("full rebuild")
+
+
+class SchedulerSyncTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.output = self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def start(self, storage, count=5):
+        self.use_storage(storage)
+        tasks = [todo.assign_task_id(todo.Task(f"task {n}", due=todo.today_ordinal() + 5 + n)) for n in range(count)]
+        for task in tasks:
+            todo.record_change("add", task)
+        todo.save_tasks(tasks)
+        scheduler = todo.ReminderScheduler(todo.load_tasks(), sinks=())
+        scheduler.build = rejected
+        return scheduler
+
+    def other_process(self, change):
+        # Another writer: its own load, change and save, none of it routed through the scheduler
+        tasks = todo.load_tasks()
+        change(tasks)
+        todo.save_tasks(tasks)
+
+    def check_sync(self, scheduler):
+        def change(tasks):
+            first, second = tasks[0], tasks[1]
+            before = first.copy()
+            first.due += 30
+            todo.record_change("update", first, before)
+            todo.record_change("remove", second)
+            tasks.remove(second)
+            added = todo.assign_task_id(todo.Task("new", due=todo.today_ordinal() + 2))
+            tasks.append(added)
+            todo.record_change("add", added)
+
+        self.other_process(change)
+        with todo.storage_lock(shared=True):
+            scheduler.sync()
+        by_title = {task.title: task for task in scheduler.tasks.values()}
+        self.assertNotIn("task 1", by_title)
+        self.assertEqual(by_title["task 0"].due, todo.today_ordinal() + 35)
+        self.assertEqual(scheduler.next_instant(), scheduler.instant(by_title["new"], todo.REMIND))
+        self.assertEqual(len(scheduler.tasks), 5)
+
+    def test_journal_tail(self):
+        scheduler = self.start("journal")
+        todo.storage.changed_tasks = rejected
+        self.addCleanup(delattr, todo.storage, "changed_tasks")
+        self.check_sync(scheduler)
+
+    def test_journal_after_compaction(self):
+        scheduler = self.start("journal")
+        self.other_process(todo.compact_journal)
+        self.check_sync(scheduler)
+
+    def test_version_changes(self):
+        for storage in ("json", "sqlite", "ndjson", "binary", "sharded"):
+            with self.subTest(storage=storage):
+                os.mkdir(storage)
+                os.chdir(storage)
+                self.check_sync(self.start(storage))
+                os.chdir(os.pardir)
+
+    def test_server_merge_applies_changes(self):
+        self.use_storage("json")
+        tasks = [todo.assign_task_id(todo.Task("mine", due=todo.today_ordinal() + 5))]
+        todo.record_change("add", tasks[0])
+        todo.save_tasks(tasks)
+        tasks = todo.load_tasks()
+        scheduler = todo.ReminderScheduler(tasks, sinks=())
+        scheduler.build = rejected
+        server = todo.TaskServer(tasks, scheduler)
+        self.addCleanup(todo.change_listeners.remove, scheduler.on_change)
+
+        def change(tasks):
+            added = todo.assign_task_id(todo.Task("theirs", due=todo.today_ordinal() + 1))
+            tasks.append(added)
+            todo.record_change("add", added)
+
+        signature = todo.loaded_signature
+        self.other_process(change)
+        todo.loaded_signature = signature
+        server.add({"title": "ours", "due_date": todo.date_string(todo.today_ordinal() + 3)})
+        server.flush()
+        self.assertEqual(sorted(task.title for task in scheduler.tasks.values()), ["mine", "ours", "theirs"])
+        theirs = next(task for task in server.tasks if task.title == "theirs")
+        self.assertEqual(scheduler.next_instant(), scheduler.instant(theirs, todo.REMIND))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import contextlib
+import io
+import os
+import pickle
+import unittest
+
+from support import ScratchTestCase, todo
+
+TITLES = ["Pay the electricity bill", "Book dentist appointment", "Read python book", "Call the plumber",
+          "Renew passport", "Buy birthday present"]
+
+
+class Exploit:
+    def __reduce__(self):
+        return open, ("exploited", "w")
+
+
+class TrigramIndexTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        tasks = [todo.assign_task_id(todo.Task(title)) for title in TITLES]
+        for task in tasks:
+            todo.record_change("add", task)
+        todo.save_tasks(tasks)
+        self.tasks = todo.load_tasks()
+
+    def assertSearchesMatch(self, index, tasks):
+        fresh = todo.TrigramIndex.build(tasks)
+        for query in ("the", "book", "pay", "plumber", "pass", "x", "renewed", "dentist"):
+            self.assertEqual([t.id for t in index.search(query)], [t.id for t in fresh.search(query)], query)
+
+    def test_round_trip(self):
+        todo.TrigramIndex.build(self.tasks).save()
+        index = todo.TrigramIndex.load(self.tasks)
+        self.assertIsNotNone(index)
+        self.assertFalse(index.dirty)
+        self.assertSearchesMatch(index, self.tasks)
+
+    def test_other_writer_changes_are_applied_incrementally(self):
+        todo.TrigramIndex.build(self.tasks).save()
+        tasks = todo.load_tasks()
+        renamed, removed = tasks[0], tasks[1]
+        before = renamed.copy()
+        renamed.title = "Pay the water bill"
+        todo.record_change("update", renamed, before)
+        tasks.remove(removed)
+        todo.record_change("remove", removed)
+        added = todo.assign_task_id(todo.Task("Water the garden"))
+        tasks.append(added)
+        todo.record_change("add", added)
+        todo.save_tasks(tasks)
+
+        index = todo.TrigramIndex.load(tasks)
+        self.assertIsNotNone(index)
+        self.assertEqual(index.stale, 2)
+        self.assertTrue(index.dirty)
+        self.assertSearchesMatch(index, tasks)
+        self.assertEqual([t.title for t in index.search("water")], ["Pay the water bill", "Water the garden"])
+
+    def test_reused_id_is_reindexed(self):
+        todo.TrigramIndex.build(self.tasks).save()
+        last = self.tasks.pop()
+        todo.record_change("remove", last)
+        todo.save_tasks(self.tasks)
+        tasks = todo.load_tasks()
+        reused = todo.assign_task_id(todo.Task("Feed the cat"))
+        tasks.append(reused)
+        todo.record_change("add", reused)
+        # Same ID and version as the removed task, so only the title tells them apart
+        self.assertEqual((reused.id, reused.version), (last.id, last.version))
+        todo.save_tasks(tasks)
+        index = todo.TrigramIndex.load(tasks)
+        self.assertEqual([t.title for t in index.search("cat")], ["Feed the cat"])
+
+    def test_pickle_is_never_loaded(self):
+        with open(todo.SEARCH_INDEX_FILE, 'wb') as f:
+            pickle.dump({"signature": todo.storage_signature(), "postings": Exploit(), "stale": 0}, f)
+        self.assertIsNone(todo.TrigramIndex.load(self.tasks))
+        self.assertFalse(os.path.exists("exploited"))
+
+    def test_truncated_file_is_ignored(self):
+        todo.TrigramIndex.build(self.tasks).save()
+        with open(todo.SEARCH_INDEX_FILE, 'r+b') as f:
+            f.truncate(os.path.getsize(todo.SEARCH_INDEX_FILE) - 4)
+        self.assertIsNone(todo.TrigramIndex.load(self.tasks))
+
+
+if __name__ == "__main__":
+    unittest.main()
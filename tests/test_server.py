@@ -0,0 +1,99 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import unittest
+
+from support import ScratchTestCase, todo
+
+
+class HttpServerTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        self.server = todo.TaskServer(todo.load_tasks())
+
+    def post(self, headers, body=b""):
+        async def exchange():
+            http = await asyncio.start_server(self.server.serve_http, "127.0.0.1", 0)
+            port = http.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            lines = [line.format(port=port) for line in headers]
+            writer.write("\r\n".join(lines + ["", ""]).encode() + body)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            http.close()
+            await http.wait_closed()
+            return response
+
+        head, _, payload = asyncio.run(exchange()).partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(payload)
+
+    def request(self, content_type="application/json", origin=None, length=None, body=None):
+        body = json.dumps(body or {"command": "add", "title": "Water plants"}).encode()
+        headers = ["POST / HTTP/1.1", f"Content-Length: {len(body) if length is None else length}"]
+        if content_type:
+            headers.append(f"Content-Type: {content_type}")
+        if origin:
+            headers.append(f"Origin: {origin}")
+        return self.post(headers, body)
+
+    def test_json_post(self):
+        status, response = self.request(content_type="application/json; charset=utf-8")
+        self.assertEqual(status, 200)
+        self.assertEqual(response["task"]["title"], "Water plants")
+
+    def test_same_origin_allowed(self):
+        for origin in ("http://127.0.0.1:{port}", "http://localhost:{port}"):
+            with self.subTest(origin=origin):
+                self.assertEqual(self.request(origin=origin)[0], 200)
+
+    def test_rejected_requests(self):
+        cases = {
+            "text/plain": (dict(content_type="text/plain"), 415),
+            "no content type": (dict(content_type=None), 415),
+            "form": (dict(content_type="application/x-www-form-urlencoded"), 415),
+            "foreign origin": (dict(origin="https://evil.example"), 403),
+            "other port": (dict(origin="http://127.0.0.1:1"), 403),
+            "malformed length": (dict(length="12abc"), 400),
+            "negative length": (dict(length="-5"), 400),
+            "invalid JSON": (dict(body="not json", length=3), 400),
+        }
+        for name, (kwargs, expected) in cases.items():
+            with self.subTest(name):
+                status, response = self.request(**kwargs)
+                self.assertEqual(status, expected)
+                self.assertFalse(response["ok"])
+        self.assertEqual(self.server.tasks, [])
+
+    def test_only_post(self):
+        self.assertEqual(self.post(["GET / HTTP/1.1"])[0], 405)
+
+
+class FlushTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def test_idle_flush_writes_nothing(self):
+        server = todo.TaskServer(todo.load_tasks())
+        server.flush()
+        self.assertFalse(os.path.exists(todo.TODO_FILE))
+
+    def test_completed_tasks_from_startup_are_archived(self):
+        done = todo.Task.from_dict({"id": 1, "title": "done", "completed": True,
+                                    "completion_timestamp": "2026-01-02 10:00:00"})
+        todo.write_snapshot([done, todo.Task.from_dict({"id": 2, "title": "open"})])
+        server = todo.TaskServer(todo.load_tasks())
+        server.flush()
+        self.assertEqual([task.title for task in server.tasks], ["open"])
+        self.assertEqual([row["title"] for row in todo.load_archive()], ["done"])
+        self.assertFalse(server.unarchived)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import contextlib
+import io
+import unittest
+
+from support import ScratchTestCase, make_tasks, todo
+
+
+class SqliteQueryTest(ScratchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+        self.use_storage("sqlite")
+        self.tasks = [todo.Task.from_dict(data) for data in make_tasks(500, seed=6)]
+        for task in self.tasks:
+            todo.record_change("add", task)
+        todo.save_tasks(self.tasks)
+
+    def test_category_filter_matches_the_bitsets(self):
+        registry = todo.get_category_index(self.tasks)
+        for text in ("2", "1,4", "+1,+3", "1,-2", "-5", "2,+3,-4", ""):
+            with self.subTest(text):
+                groups = todo.parse_category_filter(todo.categories, text)
+                self.assertEqual([t.id for t in todo.storage.select_categories(*groups)],
+                                 [t.id for t in registry.select(*groups)])
+
+    def test_filter_and_report_skip_the_full_load(self):
+        self.addCleanup(delattr, todo, "load_tasks")
+        todo.load_tasks = lambda: self.fail("loaded every task")
+        parser = todo.build_arg_parser()
+        for argv in (["--filter", "+1,-2"], ["--report"], ["--list", "--limit", "5"]):
+            with self.subTest(argv=argv):
+                self.assertTrue(todo.run_lazy_command(parser.parse_args(argv)))
+        self.assertFalse(todo.run_lazy_command(parser.parse_args(["--search", "report"])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import contextlib
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+import unittest
+
+from support import ScratchTestCase, make_tasks, todo
+
+# Wall-clock budgets depend on the machine and its load, so they are only checked on request
+CHECK_BUDGETS = os.environ.get("TODO_CHECK_STARTUP") == "1"
+# Modules imported at the script's top level, in milliseconds
+IMPORT_BUDGET_MS = 60
+# Median milliseconds of a fresh process with 10000 tasks in JSON storage
+COMMAND_BUDGETS_MS = {
+    "--help": 175,
+    "--list --limit 20": 400,
+    "--report": 400,
+    "--search report": 400,
+    "--overdue": 400,
+}
+RUNS = 5
+
+
+class StartupTest(ScratchTestCase):
+
+    def test_import_reads_no_files(self):
+        # A config file that cannot be parsed would fail any import that read it
+        with open(todo.CONFIG_FILE, 'w') as f:
+            f.write("{not json")
+        code = ("import importlib.util, sys\n"
+                "spec = importlib.util.spec_from_file_location('todo', sys.argv[1])\n"
+                "module = importlib.util.module_from_spec(spec)\n"
+                "spec.loader.exec_module(module)\n"
+                "print(module.config, module.storage)\n")
+        result = subprocess.run([sys.executable, "-c", code, todo.__file__], capture_output=True, text=True)
+        self.assertEqual((result.returncode, result.stdout), (0, "None None\n"), result.stderr)
+        self.assertEqual(os.listdir(), [todo.CONFIG_FILE])
+
+    @unittest.skipUnless(CHECK_BUDGETS, "set TODO_CHECK_STARTUP=1 to check the startup budgets")
+    def test_imports_within_budget(self):
+        result = subprocess.run([sys.executable, "-X", "importtime", todo.__file__, "--help"],
+                                capture_output=True, text=True, check=True)
+        modules = {}
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "cumulative" not in line:
+                _, cumulative, name = line.split("|")
+                if not name.startswith("  "):
+                    modules[name.strip()] = int(cumulative) / 1000
+        self.assertLessEqual(sum(modules.values()), IMPORT_BUDGET_MS, modules)
+
+    @unittest.skipUnless(CHECK_BUDGETS, "set TODO_CHECK_STARTUP=1 to check the startup budgets")
+    def test_commands_within_budget(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            todo.write_snapshot([todo.Task.from_dict(data) for data in make_tasks(10000, completed_ratio=0)])
+        for command, budget in COMMAND_BUDGETS_MS.items():
+            with self.subTest(command=command):
+                runs = []
+                for _ in range(RUNS):
+                    start = time.perf_counter()
+                    subprocess.run([sys.executable, todo.__file__] + command.split(), stdout=subprocess.DEVNULL,
+                                   check=True)
+                    runs.append((time.perf_counter() - start) * 1000)
+                self.assertLessEqual(statistics.median(runs), budget)
+
+
+if __name__ == "__main__":
+    unittest.main()
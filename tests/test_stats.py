@@ -0,0 +1,69 @@
+import contextlib
+import io
+import random
+import unittest
+
+from support import ScratchTestCase, make_tasks, todo
+
+COUNTERS = ("total", "completed", "by_priority", "by_category", "open_by_due", "overdue", "completions_by_day",
+            "completions_by_category")
+
+
+class TaskStatsTest(ScratchTestCase):
+
+    def assertSameStats(self, stats, expected):
+        for name in COUNTERS:
+            # Counters that dropped to zero stay as keys in the incremental version
+            mine, theirs = getattr(stats, name), getattr(expected, name)
+            if isinstance(mine, dict):
+                mine = {key: value for key, value in mine.items() if value}
+            self.assertEqual(mine, theirs, name)
+
+    def test_updates_match_a_rebuild(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            tasks = [todo.Task.from_dict(data) for data in make_tasks(500, seed=3)]
+            todo.ensure_task_ids(tasks)
+            archived = []
+            stats = todo.TaskStats.build(tasks, archived)
+            todo.change_listeners.append(stats.on_change)
+            self.addCleanup(todo.change_listeners.remove, stats.on_change)
+            rng = random.Random(5)
+            for _ in range(300):
+                task = rng.choice(tasks)
+                action = rng.random()
+                if action < 0.6:
+                    # Includes completing single occurrences of recurring tasks
+                    todo.toggle_task(tasks, task)
+                elif action < 0.8:
+                    before = task.copy()
+                    task.priority = rng.choice(["High", "Medium", "Low"])
+                    task.categories = rng.sample(range(1, 6), 2)
+                    todo.record_change("update", task, before)
+                elif action < 0.9:
+                    tasks.remove(task)
+                    todo.record_change("remove", task)
+                elif task.completed:
+                    tasks.remove(task)
+                    archived.append(task.to_dict())
+                    todo.record_change("archive", task)
+        self.assertTrue(any(task.rule and task.done_at and not task.completed for task in tasks))
+        self.assertSameStats(stats, todo.TaskStats.build(tasks, archived))
+
+    def test_every_occurrence_counts(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            task = todo.Task.from_dict({"id": 1, "title": "Stretch", "due_date": "2026-03-01", "recurring": "daily",
+                                        "categories": [3]})
+            stats = todo.TaskStats.build([task], [])
+            todo.change_listeners.append(stats.on_change)
+            self.addCleanup(todo.change_listeners.remove, stats.on_change)
+            for _ in range(3):
+                todo.toggle_task([task], task)
+        days = [todo.date_ordinal(day) for day in ("2026-03-01", "2026-03-02", "2026-03-03")]
+        self.assertEqual(stats.completions_by_day, dict.fromkeys(days, 1))
+        self.assertEqual(stats.completions_by_category, {3: 3})
+        archived = todo.TaskStats.build([], [task.to_dict()])
+        self.assertEqual(archived.completions_by_day, stats.completions_by_day)
+
+
+if __name__ == "__main__":
+    unittest.main()
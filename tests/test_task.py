@@ -0,0 +1,43 @@
+import unittest
+
+from support import ScratchTestCase, todo
+
+
+class TaskDataTest(ScratchTestCase):
+
+    def test_invalid_due_date_and_priority_are_kept(self):
+        row = {"id": 1, "title": "Odd", "due_date": "2025-02-30", "priority": "Urgent"}
+        task = todo.Task.from_dict(row)
+        self.assertEqual(task.due, 0)
+        self.assertEqual(task.prio, todo.PRIORITY_MEDIUM)
+        self.assertEqual(task.to_dict()["due_date"], "2025-02-30")
+        self.assertEqual(task.to_dict()["priority"], "Urgent")
+        self.assertEqual(task.copy().to_dict(), task.to_dict())
+
+    def test_editing_replaces_the_kept_strings(self):
+        task = todo.Task.from_dict({"id": 1, "title": "Odd", "due_date": "2025-02-30", "priority": "Urgent"})
+        task.due_date = "2026-01-05"
+        task.priority = "High"
+        self.assertIsNone(task.invalid)
+        self.assertEqual((task.to_dict()["due_date"], task.to_dict()["priority"]), ("2026-01-05", "High"))
+
+    def test_invalid_fields_survive_every_backend(self):
+        row = {"id": 1, "title": "Odd", "due_date": "2025-02-30", "priority": "Urgent", "categories": [70]}
+        for name in ("json", "journal", "sqlite", "ndjson", "binary", "sharded"):
+            with self.subTest(storage=name):
+                self.use_storage(name)
+                todo.storage.save([todo.Task.from_dict(row)])
+                todo.storage.reset()
+                task, = todo.storage.load()
+                self.assertEqual((task.due_date, task.priority, task.categories), ("2025-02-30", "Urgent", [70]))
+
+    def test_task_table_holds_wide_masks(self):
+        tasks = [todo.Task.from_dict({"id": 1, "title": "a", "categories": [1]}),
+                 todo.Task.from_dict({"id": 2, "title": "b", "categories": [3, 70]})]
+        table = todo.TaskTable.from_tasks(tasks)
+        self.assertEqual(table.category_indices([70]), [1])
+        self.assertEqual(table.task(1).categories, [3, 70])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,23 +2,58 @@ import os
 import json
 import sys
 import datetime
-import shutil
-import argparse
-import csv
+import time
+import atexit
+import bisect
+import io
+import struct
+import itertools
+import heapq
+import operator
+import contextlib
+import functools
+from array import array
 
 START_DATE = datetime.date(2025, 1, 1)
 TODO_FILE = "todo_list.json"
 ARCHIVE_FILE = "archive_list.json"
+ARCHIVE_DIR = "archive"
+ARCHIVE_MANIFEST = os.path.join(ARCHIVE_DIR, "manifest.json")
 CONFIG_FILE = "config.json"
 BACKUP_FILE = "todo_list_backup.json"
+BACKUP_DIR = "backups"
+JOURNAL_FILE = "todo_list.journal"
+JOURNAL_SYNC_FILE = "todo_list.journal.sync"
+LOCK_FILE = "todo_list.lock"
+SQLITE_FILE = "todo_list.db"
+NDJSON_FILE = "todo_list.ndjson"
+NDJSON_INDEX_FILE = "todo_list.ndjson.idx"
+BINARY_FILE = "todo_list.bin"
+SEARCH_INDEX_FILE = "todo_list.trigrams"
+CATEGORIES_FILE = "categories.json"
+STATS_FILE = "todo_list.stats.json"
+SOCKET_FILE = "todo_list.sock"
 RED = "\033[31m"
 GREEN = "\033[32m"
 YELLOW = "\033[33m"
 BLUE = "\033[34m"
 RESET = "\033[0m"
 
-categories = [
-    ["Category ID", "Category Name", "Description"],
+# Priorities and recurrence intervals are stored on tasks as small ints
+PRIORITY_NAMES = ("High", "Medium", "Low")
+PRIORITY_LEVELS = {name: level for level, name in enumerate(PRIORITY_NAMES)}
+PRIORITY_HIGH = PRIORITY_LEVELS["High"]
+PRIORITY_MEDIUM = PRIORITY_LEVELS["Medium"]
+RECURRING_NAMES = (None, "daily", "weekly", "monthly", "yearly")
+RECURRING_LEVELS = {name: level for level, name in enumerate(RECURRING_NAMES)}
+# Sort key for tasks without a due date (ordinal of 9999-12-31)
+NO_DUE_DATE = datetime.date.max.toordinal()
+# Sorts after every category bit, so uncategorized tasks come last
+NO_CATEGORY_KEY = 1 << 64
+SECONDS_PER_DAY = 86400
+
+# Category ID, Category Name, Description; used until categories have been saved
+DEFAULT_CATEGORIES = [
     [1, "Work", "Tasks related to your job or career"],
     [2, "Personal", "Personal tasks and errands"],
     [3, "Fitness", "Workouts, health, and fitness-related tasks"],
@@ -35,466 +70,4892 @@ def load_config():
         return {
             "default_recurring": None,
             "reminder_days_ahead": 1,
-            "default_priority": "Medium"
+            "default_priority": "Medium",
+            "storage": "json",
+            "journal_compact_ops": 1000,
+            "journal_compact_bytes": 1048576,
+            "backup_count": 10,
+            "backup_days": 7,
+            "reminder_time": "09:00",
+            "fsync": True
         }
 
-config = load_config()
+# Both set by open_storage(), so importing the module reads no files
+config = None
+storage = None
 
-def load_tasks():
+# Stable task IDs let journal entries refer to a task without its list position
+next_task_id = 1
+# Mutations recorded since the last save, flushed to the journal by save_tasks
+pending_changes = []
+# Callables notified of every recorded mutation, used to keep indexes in sync
+change_listeners = []
+# (task id, due date) pairs already reported as invalid by Task.from_dict
+warned_due_dates = set()
+# storage_signature() as of our last load or save; anything else means another process wrote
+loaded_signature = None
+# (inode, end offset) of this process's last journal append that is not fsynced yet
+journal_unsynced = None
+# (inode, size, line count) of the journal as last counted; only bytes appended since are read again
+journal_lines = None
+# Nesting depth and descriptor of the held storage lock
+lock_depth = 0
+lock_fd = None
+
+# --profile / TODO_PROFILE instrumentation. Nothing is recorded while profiling is False.
+PROFILE_ENV = "TODO_PROFILE"
+PROFILE_MODES = ("summary", "json", "prom", "cprofile")
+METRICS_FILE = "todo_metrics.jsonl"
+PROM_FILE = "todo_metrics.prom"
+PSTATS_FILE = "todo_profile.pstats"
+profiling = False
+metric_timings = {}
+metric_counters = {}
+
+
+@contextlib.contextmanager
+def measure(operation):
+    """
+    Add the wall time of the with-block to operation's total.
+    """
+    if not profiling:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric_timings[operation] = metric_timings.get(operation, 0.0) + time.perf_counter() - start
+
+
+def count_metric(name, n=1):
+    if profiling:
+        metric_counters[name] = metric_counters.get(name, 0) + n
+
+
+def record_filter(scanned, returned):
+    count_metric("tasks_scanned", scanned)
+    count_metric("tasks_returned", returned)
+
+
+def file_size(filename):
+    return os.path.getsize(filename) if os.path.exists(filename) else 0
+
+
+def assign_task_id(task):
+    global next_task_id
+    task.id = next_task_id
+    next_task_id += 1
+    return task
+
+
+# Ops that take a task out of the active list
+REMOVAL_OPS = ("remove", "archive")
+
+
+def record_change(op, task, before=None):
+    """
+    Record a mutation ("add", "update", "remove" or "archive") so the journal
+    only has to write the changed task instead of the whole list. For
+    updates, before is a copy of the task as it was. Adds and updates bump
+    the task's version; the version a change was based on is kept so a
+    save can tell whether another process changed the task meanwhile.
+    """
+    if op in REMOVAL_OPS:
+        pending_changes.append({"op": "remove", "id": task.id, "version": task.version})
+    elif op == "add":
+        task.version = 1
+        pending_changes.append({"op": op, "task": task})
+    else:
+        base = before.version if before is not None else task.version
+        task.version = base + 1
+        pending_changes.append({"op": op, "task": task, "base": base})
+    for listener in change_listeners:
+        listener(op, task, before)
+
+
+def ensure_task_ids(tasks):
+    """
+    Give every task an ID, returning True if any task was missing one.
+    """
+    global next_task_id
+    next_task_id = max((t.id for t in tasks), default=0) + 1
+    missing = False
+    for t in tasks:
+        if not t.id:
+            assign_task_id(t)
+            missing = True
+    return missing
+
+
+def read_snapshot():
     if os.path.exists(TODO_FILE):
-        with open(TODO_FILE, 'r') as f:
-            return json.load(f)
+        with measure("read"), open(TODO_FILE, 'r') as f:
+            rows = json.load(f)
+        count_metric("bytes_read", file_size(TODO_FILE))
+        with measure("parse"):
+            return [Task.from_dict(data) for data in rows]
     else:
         return []
 
-def save_tasks(tasks):
-    # Overwrite single backup file before saving
-    if os.path.exists(TODO_FILE):
-        shutil.copyfile(TODO_FILE, BACKUP_FILE)
 
-    with open(TODO_FILE, 'w') as f:
-        json.dump(tasks, f, indent=2)
+def replay_journal(tasks):
+    """
+    Apply the journal tail on top of the snapshot. Entries are keyed by task
+    ID so replaying an entry that is already in the snapshot is harmless.
+    """
+    global journal_lines
+    if not os.path.exists(JOURNAL_FILE):
+        return tasks, 0
+    by_id = {t.id: t for t in tasks}
+    count = 0
+    size = 0
+    count_metric("bytes_read", file_size(JOURNAL_FILE))
+    with open(JOURNAL_FILE, 'rb') as f:
+        ino = os.fstat(f.fileno()).st_ino
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A torn last line from an interrupted write; everything before it is intact
+                break
+            if entry["op"] == "remove":
+                by_id.pop(entry["id"], None)
+            else:
+                task = Task.from_dict(entry["task"])
+                by_id[task.id] = task
+            count += 1
+            size += len(line)
+        else:
+            # Saves decide on compaction by line count; this read already did the counting
+            journal_lines = ino, size, count
+    return list(by_id.values()), count
 
-def load_archive():
+
+def journal_position():
+    """
+    Where a reader that is up to date with the journal backend picks up
+    its tail: the snapshot's (size, mtime) and the journal's inode and size.
+    None for the other backends.
+    """
+    if config.get("storage", "json") != "journal":
+        return None
+    try:
+        stat = os.stat(TODO_FILE)
+        snapshot = stat.st_size, stat.st_mtime_ns
+    except FileNotFoundError:
+        snapshot = None
+    try:
+        stat = os.stat(JOURNAL_FILE)
+    except FileNotFoundError:
+        return snapshot, None, 0
+    return snapshot, stat.st_ino, stat.st_size
+
+
+def read_journal_tail(position):
+    """
+    The journal entries appended since position (from journal_position)
+    and the position after the last complete one. None when the journal
+    was compacted or replaced meanwhile, so its tail alone is not the
+    whole change.
+    """
+    if position is None:
+        return None
+    snapshot, ino, offset = position
+    current = journal_position()
+    if current is None or current[0] != snapshot:
+        return None
+    if current[1] is None:
+        return ([], position) if ino is None else None
+    if ino is not None and current[1] != ino or current[2] < offset:
+        return None
+    with open(JOURNAL_FILE, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    count_metric("bytes_read", len(data))
+    entries = []
+    for line in data.splitlines(keepends=True):
+        try:
+            if not line.endswith(b"\n"):
+                raise ValueError("incomplete line")
+            entries.append(json.loads(line))
+        except ValueError:
+            break  # Torn or still being written; picked up next time
+        offset += len(line)
+    return entries, (snapshot, current[1], offset)
+
+
+def load_json_tasks():
+    tasks = read_snapshot()
+    missing_ids = ensure_task_ids(tasks)
+    if config.get("storage", "json") != "journal":
+        return tasks
+
+    tasks, _ = replay_journal(tasks)
+    ensure_task_ids(tasks)
+    if missing_ids:
+        # Older snapshots have no IDs; persist them so the journal can refer to them
+        compact_journal(tasks)
+    return tasks
+
+
+# Backups are content-addressed chunks of the JSON snapshot plus one manifest per generation.
+# A line ends a chunk when its CRC has these bits clear (about 1 line in 128); longer chunks are cut
+# every BACKUP_CHUNK_MAX bytes.
+BACKUP_CHUNK_DIR = os.path.join(BACKUP_DIR, "chunks")
+BACKUP_GENERATION_DIR = os.path.join(BACKUP_DIR, "generations")
+BACKUP_CHUNK_MASK = 0x7F
+BACKUP_CHUNK_MAX = 1 << 20
+
+
+def backup_chunks(data):
+    """
+    Split a snapshot into chunks at line ends picked by the line's content
+    (its CRC), so an edit only changes the chunk holding the edited line and
+    an insertion does not shift the chunks after it.
+    """
+    import zlib
+    lines = data.splitlines(keepends=True)
+    cuts = [n + 1 for n, crc in enumerate(map(zlib.crc32, lines)) if not crc & BACKUP_CHUNK_MASK]
+    start = 0
+    for end in cuts + [len(lines)]:
+        chunk = b"".join(lines[start:end])
+        start = end
+        for offset in range(0, len(chunk), BACKUP_CHUNK_MAX):
+            yield chunk[offset:offset + BACKUP_CHUNK_MAX]
+
+
+def chunk_path(chunk_id):
+    return os.path.join(BACKUP_CHUNK_DIR, chunk_id[:2], chunk_id)
+
+
+def backup_generations():
+    if not os.path.isdir(BACKUP_GENERATION_DIR):
+        return []
+    return sorted(int(name[:-len(".json")]) for name in os.listdir(BACKUP_GENERATION_DIR) if name.endswith(".json"))
+
+
+def read_backup_manifest(generation):
+    path = os.path.join(BACKUP_GENERATION_DIR, f"{generation:06d}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_backup(data, created=None):
+    """
+    Store data as a new backup generation. Only chunks no generation holds
+    yet are written (zlib-compressed), then the manifest listing the
+    generation's chunks. Returns the generation number, or None when data
+    is identical to the newest generation.
+    """
+    import hashlib
+    import zlib
+    generations = backup_generations()
+    latest = read_backup_manifest(generations[-1]) if generations else None
+    known = set(latest["chunks"]) if latest else set()
+    chunk_ids = []
+    stored = 0
+    for chunk in backup_chunks(data):
+        chunk_id = hashlib.blake2b(chunk, digest_size=16).hexdigest()
+        chunk_ids.append(chunk_id)
+        if chunk_id in known:
+            continue
+        known.add(chunk_id)
+        path = chunk_path(chunk_id)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            packed = zlib.compress(chunk)
+            write_durably(path, packed, 'wb', fsync=False)
+            stored += len(packed)
+    if latest and chunk_ids == latest["chunks"]:
+        return None
+
+    generation = generations[-1] + 1 if generations else 1
+    created = created or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    manifest = {"generation": generation, "created": created, "size": len(data), "stored": stored,
+                "chunks": chunk_ids}
+    text = json.dumps(manifest)
+    os.makedirs(BACKUP_GENERATION_DIR, exist_ok=True)
+    # The manifest goes last: a crash before it leaves only unreferenced chunks. Backups skip the
+    # fsync; the snapshot itself is durable, and a chunk lost in a crash fails its hash on restore.
+    write_durably(os.path.join(BACKUP_GENERATION_DIR, f"{generation:06d}.json"), text, fsync=False)
+    count_metric("bytes_written", stored + len(text))
+    return generation
+
+
+def prune_backups():
+    """
+    Apply the retention policy: keep the newest backup_count generations and
+    the newest generation of each of the last backup_days days. Chunks only
+    the dropped generations used are deleted.
+    """
+    generations = backup_generations()
+    manifests = {generation: read_backup_manifest(generation) for generation in generations}
+    keep = set(generations[-max(config.get("backup_count", 10), 1):])
+    days = {}
+    for generation in generations:
+        # Later generations overwrite earlier ones, leaving the newest of each day
+        days[manifests[generation]["created"][:10]] = generation
+    daily = config.get("backup_days", 7)
+    if daily > 0:
+        keep.update(generation for _, generation in sorted(days.items())[-daily:])
+    dropped = [generation for generation in generations if generation not in keep]
+    if not dropped:
+        return
+    live = set()
+    for generation in keep:
+        live.update(manifests[generation]["chunks"])
+    for generation in dropped:
+        for chunk_id in set(manifests[generation]["chunks"]) - live:
+            if os.path.exists(chunk_path(chunk_id)):
+                os.remove(chunk_path(chunk_id))
+        os.remove(os.path.join(BACKUP_GENERATION_DIR, f"{generation:06d}.json"))
+
+
+def import_legacy_backups():
+    """
+    Turn the full-copy backups of earlier versions (todo_list_backup.json,
+    todo_list_backup.1.json, ...) and the snapshot about to be replaced into
+    the first generations, oldest first.
+    """
+    base, ext = os.path.splitext(BACKUP_FILE)
+    legacy = sorted(name for name in os.listdir(".") if name.startswith(base) and name.endswith(ext))
+    legacy.sort(key=os.path.getmtime)
+    for filename in legacy + [TODO_FILE]:
+        if os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                data = f.read()
+            created = datetime.datetime.fromtimestamp(os.path.getmtime(filename)).strftime("%Y-%m-%d %H:%M:%S")
+            write_backup(data, created)
+    for filename in legacy:
+        os.remove(filename)
+
+
+def backup_snapshot(text):
+    """
+    Record the snapshot about to be written as a backup generation. Backup
+    I/O is the changed chunks plus a small manifest, not a copy of the list.
+    """
+    if config.get("backup_count", 10) < 1:
+        return
+    with measure("backup"):
+        if not backup_generations():
+            import_legacy_backups()
+        if write_backup(text.encode("utf-8")) is not None:
+            prune_backups()
+
+
+def read_backup(generation):
+    """
+    Reassemble a generation's snapshot, checking every chunk against its
+    hash. Returns (data, None) or (None, error message).
+    """
+    import hashlib
+    import zlib
+    manifest = read_backup_manifest(generation)
+    if manifest is None:
+        return None, f"No backup generation {generation}."
+    parts = []
+    for chunk_id in manifest["chunks"]:
+        try:
+            with open(chunk_path(chunk_id), 'rb') as f:
+                chunk = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None, f"Backup generation {generation} is damaged: chunk {chunk_id} is missing or unreadable."
+        if hashlib.blake2b(chunk, digest_size=16).hexdigest() != chunk_id:
+            return None, f"Backup generation {generation} is damaged: chunk {chunk_id} does not match its hash."
+        parts.append(chunk)
+    return b"".join(parts), None
+
+
+def show_backups():
+    generations = backup_generations()
+    if not generations:
+        print("No backups yet.")
+        return
+    print("Backups (newest first):")
+    print(f"  {'GEN':>5}  {'CREATED':<19}  {'SIZE':>10}  {'WRITTEN':>10}")
+    chunk_ids = set()
+    for generation in reversed(generations):
+        manifest = read_backup_manifest(generation)
+        chunk_ids.update(manifest["chunks"])
+        print(f"  {generation:>5}  {manifest['created']:<19}  {manifest['size'] / 1024:>6.1f} KiB  "
+              f"{manifest['stored'] / 1024:>6.1f} KiB")
+    stored = sum(file_size(chunk_path(chunk_id)) for chunk_id in chunk_ids)
+    print(f"{len(generations)} generation(s) in {len(chunk_ids)} chunk(s), {stored / 1024:.1f} KiB on disk.")
+
+
+def restore_backup(generation):
+    """
+    Make the task list what it was in a backup generation. The differences
+    are saved as ordinary changes, so every backend and a concurrent writer
+    see a normal save, and the restore itself can be undone by restoring the
+    generation before it.
+    """
+    data, error = read_backup(generation)
+    if error:
+        print(RED + "Error: " + error + RESET)
+        return False
+    restored = [Task.from_dict(row) for row in json.loads(data)]
+    with storage_lock():
+        tasks = load_tasks()
+        current = {t.id: t for t in tasks}
+        restored_ids = {t.id for t in restored}
+        for task in tasks:
+            if task.id not in restored_ids:
+                record_change("remove", task)
+        for task in restored:
+            before = current.get(task.id)
+            if before is None:
+                record_change("add", task)
+                continue
+            task.version = before.version
+            if task.to_dict() != before.to_dict():
+                record_change("update", task, before)
+        ensure_task_ids(restored)
+        save_tasks(restored)
+    print(GREEN + f"Restored backup generation {generation} ({len(restored)} task(s))." + RESET)
+    return True
+
+
+def write_durably(filename, data, mode='w', fsync=True):
+    """
+    Replace filename with data via a temp file, fsync and rename, so readers
+    and a crash see the old contents or the new, never a torn file. Without
+    fsync readers still never see a partial file.
+    """
+    temp_file = filename + ".tmp"
+    with open(temp_file, mode) as f:
+        f.write(data)
+        if fsync and config.get("fsync", True):
+            f.flush()
+            with measure("fsync"):
+                os.fsync(f.fileno())
+    os.replace(temp_file, filename)
+
+
+def snapshot_text(tasks):
+    # One task per line: still readable, and json.dumps without indent uses the C encoder
+    return "[\n" + ",\n".join(json.dumps(t.to_dict()) for t in tasks) + "\n]\n"
+
+
+def write_snapshot(tasks):
+    text = snapshot_text(tasks)
+    backup_snapshot(text)
+    write_durably(TODO_FILE, text)
+    count_metric("bytes_written", len(text))
+
+
+def compact_journal(tasks):
+    """
+    Fold the journal into a fresh snapshot and start a new, empty journal.
+    """
+    global journal_unsynced, journal_lines
+    write_snapshot(tasks)
+    if os.path.exists(JOURNAL_FILE):
+        os.remove(JOURNAL_FILE)
+    # The snapshot is fsynced; a new journal starts with nothing synced
+    journal_unsynced = journal_lines = None
+    if os.path.exists(JOURNAL_SYNC_FILE):
+        os.remove(JOURNAL_SYNC_FILE)
+
+
+def journal_line_count():
+    """
+    Number of complete lines in the journal. Only what was appended since
+    the last count (by another process) is read.
+    """
+    global journal_lines
+    try:
+        stat = os.stat(JOURNAL_FILE)
+    except FileNotFoundError:
+        journal_lines = None
+        return 0
+    if journal_lines and journal_lines[0] == stat.st_ino and journal_lines[1] <= stat.st_size:
+        _, size, count = journal_lines
+    else:
+        size = count = 0
+    if size < stat.st_size:
+        with open(JOURNAL_FILE, 'rb') as f:
+            f.seek(size)
+            data = f.read(stat.st_size - size)
+        count_metric("bytes_read", len(data))
+        # A torn last line is left out until it is complete
+        complete = data.rfind(b"\n") + 1
+        size += complete
+        count += data.count(b"\n", 0, complete)
+    journal_lines = stat.st_ino, size, count
+    return count
+
+
+def journal_needs_compaction():
+    if not os.path.exists(JOURNAL_FILE):
+        return False
+    if os.path.getsize(JOURNAL_FILE) >= config.get("journal_compact_bytes", 1048576):
+        return True
+    return journal_line_count() >= config.get("journal_compact_ops", 1000)
+
+
+def group_commit():
+    """
+    Make this process's journal appends durable. Writers queue on the lock
+    of todo_list.journal.sync, which also records how far the journal has
+    been fsynced: the holder fsyncs everything appended so far, so writers
+    whose lines are already covered skip their own fsync and a burst of
+    concurrent saves shares one.
+    """
+    global journal_unsynced
+    if journal_unsynced is None:
+        return
+    ino, end = journal_unsynced
+    journal_unsynced = None
+    if not config.get("fsync", True):
+        return
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+    fd = os.open(JOURNAL_SYNC_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            with measure("fsync wait"):
+                fcntl.flock(fd, fcntl.LOCK_EX)
+        synced = os.pread(fd, 64, 0).split()
+        if len(synced) == 2 and int(synced[0]) == ino and int(synced[1]) >= end:
+            count_metric("fsyncs_shared")
+            return
+        try:
+            journal = os.open(JOURNAL_FILE, os.O_RDONLY)
+        except FileNotFoundError:
+            # Compacted into a snapshot, which was fsynced
+            return
+        try:
+            stat = os.fstat(journal)
+            if stat.st_ino != ino:
+                return
+            with measure("fsync"):
+                os.fsync(journal)
+            count_metric("fsyncs")
+        finally:
+            os.close(journal)
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, f"{ino} {stat.st_size}".encode(), 0)
+    finally:
+        os.close(fd)
+
+
+def json_journal_line(entry):
+    if "task" in entry:
+        entry = {"op": entry["op"], "task": entry["task"].to_dict()}
+    return json.dumps(entry) + "\n"
+
+
+def save_json_tasks(tasks):
+    global journal_unsynced, journal_lines
+    if config.get("storage", "json") != "journal":
+        pending_changes.clear()
+        write_snapshot(tasks)
+        return
+
+    if pending_changes:
+        # One append per save, sized by what changed rather than the whole list
+        lines = "".join(json_journal_line(entry) for entry in pending_changes)
+        with open(JOURNAL_FILE, 'a') as f:
+            start = f.tell()
+            f.write(lines)
+            f.flush()
+            # The fsync is left to group_commit, after the storage lock is released
+            journal_unsynced = (os.fstat(f.fileno()).st_ino, f.tell())
+        if journal_lines and journal_lines[:2] == (journal_unsynced[0], start):
+            journal_lines = journal_unsynced[0], journal_unsynced[1], journal_lines[2] + len(pending_changes)
+        count_metric("bytes_written", len(lines))
+        pending_changes.clear()
+
+    if journal_needs_compaction():
+        compact_journal(tasks)
+
+def load_legacy_archive():
     if os.path.exists(ARCHIVE_FILE):
         with open(ARCHIVE_FILE, 'r') as f:
             return json.load(f)
     else:
         return []
 
-def save_archive(archived):
-    with open(ARCHIVE_FILE, 'w') as f:
-        json.dump(archived, f, indent=2)
 
-def parse_date(date_str):
-    try:
-        # Attempt to parse date in YYYY-MM-DD format
-        return datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        # If the date format is invalid, return None
-        return None
+def archive_partition(row):
+    # Archived tasks are partitioned by completion month; tasks without a timestamp go together
+    timestamp = row.get("completion_timestamp")
+    return timestamp[:7] if timestamp else "undated"
 
 
-def is_overdue(task):
-    due_date_str = task.get("due_date")
-    if due_date_str:
-        due = parse_date(due_date_str)
-        if due is None:  # Handle invalid date
-            print(f"Warning: Task '{task.get('title', 'Unknown')}' has an invalid due date: {due_date_str}")
-            return False
-        return datetime.date.today() > due
-    return False
+def read_archive_manifest():
+    """
+    Return the archive manifest: one entry per segment file with its
+    partition, task count, due/completion date bounds and whether it has
+    been sealed. A legacy archive_list.json is split into segments once.
+    """
+    if os.path.exists(ARCHIVE_MANIFEST):
+        with open(ARCHIVE_MANIFEST, 'r') as f:
+            return json.load(f)
+    manifest = {"segments": []}
+    legacy = load_legacy_archive()
+    if legacy:
+        append_archive_rows(manifest, legacy)
+        print(GREEN + f"Split {len(legacy)} archived tasks from {ARCHIVE_FILE} into {ARCHIVE_DIR}/." + RESET)
+    return manifest
 
 
-def is_due_soon(task, days_ahead):
-    due_date_str = task.get("due_date")
-    if due_date_str:
-        due = parse_date(due_date_str)
-        return 0 <= (due - datetime.date.today()).days <= days_ahead
-    return False
+def write_archive_manifest(manifest):
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    temp_file = ARCHIVE_MANIFEST + ".tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_file, ARCHIVE_MANIFEST)
 
-def color_for_task(task):
-    if task["completed"]:
-        return GREEN
-    if is_overdue(task):
-        return RED
-    if task.get("priority", "Medium") == "High":
-        return YELLOW
-    return RESET
 
-def get_category_name(category_id, categories):
+def widen(entry, low_key, high_key, value):
+    if value:
+        if entry[low_key] is None or value < entry[low_key]:
+            entry[low_key] = value
+        if entry[high_key] is None or value > entry[high_key]:
+            entry[high_key] = value
+
+
+def append_archive_rows(manifest, rows):
     """
-    Retrieve the category name based on the category ID.
+    Append archived task dicts to the open segment of their partition,
+    starting a new segment when the partition's last one is sealed.
     """
-    for category in categories[1:]:  # Skip the header row
-        if category[0] == category_id:
-            return category[1]
-    return "Unknown"
-
-def display_tasks(tasks, show_all=True, sort_by=None):
-    filtered = tasks if show_all else [task for task in tasks if not task["completed"]]
+    by_partition = {}
+    for row in rows:
+        by_partition.setdefault(archive_partition(row), []).append(row)
 
-    if sort_by == "due_date":
-        filtered.sort(key=lambda t: t.get("due_date", "9999-12-31"))
-    elif sort_by == "priority":
-        priority_order = {"High": 1, "Medium": 2, "Low": 3}
-        filtered.sort(key=lambda t: priority_order.get(t.get("priority", "Medium"), 2))
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    for partition, partition_rows in sorted(by_partition.items()):
+        entry = next((e for e in reversed(manifest["segments"])
+                      if e["partition"] == partition and not e["sealed"]), None)
+        if entry is None:
+            part = sum(1 for e in manifest["segments"] if e["partition"] == partition)
+            entry = {"partition": partition, "file": f"{partition}.{part}.ndjson", "sealed": False, "count": 0,
+                     "min_due": None, "max_due": None, "first_completed": None, "last_completed": None}
+            manifest["segments"].append(entry)
+        text = "".join(json.dumps(row) + "\n" for row in partition_rows)
+        with open(os.path.join(ARCHIVE_DIR, entry["file"]), 'a') as f:
+            f.write(text)
+        count_metric("bytes_written", len(text))
+        entry["count"] += len(partition_rows)
+        for row in partition_rows:
+            widen(entry, "min_due", "max_due", row.get("due_date"))
+            widen(entry, "first_completed", "last_completed", row.get("completion_timestamp"))
 
-    if not filtered:
-        print("No tasks found.")
-        return
+    seal_archive_segments(manifest)
+    write_archive_manifest(manifest)
 
-    print("\nTo-Do List:")
-    for i, task in enumerate(filtered, 1):
-        status = "[Done]" if task["completed"] else "[ ]"
-        due_date = f"(Due: {task.get('due_date')})" if task.get("due_date") else ""
-        priority = f"(Priority: {task.get('priority', 'Medium')})"
-        # Display category names based on IDs
-        categories_str = ""
-        if task.get("categories"):
-            category_names = [cat[1] for cat in categories[1:] if cat[0] in task["categories"]]
-            categories_str = f"(Categories: {', '.join(category_names)})"
-        print(f"{i}. {status} {task['title']} {due_date} {priority} {categories_str}")
 
+def seal_archive_segments(manifest):
+    """
+    Compress every open segment from an earlier month than the current one.
+    Sealed segments are never written again.
+    """
+    import gzip
+    import shutil
+    current = datetime.date.today().strftime("%Y-%m")
+    for entry in manifest["segments"]:
+        if entry["sealed"] or entry["partition"] >= current:
+            continue  # "undated" sorts after every month and stays open
+        path = os.path.join(ARCHIVE_DIR, entry["file"])
+        with open(path, 'rb') as src, gzip.open(path + ".gz", 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+        entry["file"] += ".gz"
+        entry["sealed"] = True
 
-def add_task(tasks, title=None, due_date=None, priority=None, recurring=None, categories=None):
-    while True:
-        if not title:
-            title = input("Enter a new task (max 60 characters): ").strip()
 
-        # Check if the task exceeds 60 characters
-        if len(title) > 60:
-            print(RED + "Error: Task description exceeds 60 characters. Please try again." + RESET)
-            title = None  # Reset title to force re-entry
+def iter_archive(since=None):
+    """
+    Stream archived task dicts segment by segment, skipping segments whose
+    latest due date is before since.
+    """
+    import gzip
+    for entry in read_archive_manifest()["segments"]:
+        if since and entry["max_due"] is not None and entry["max_due"] < since:
             continue
+        path = os.path.join(ARCHIVE_DIR, entry["file"])
+        opener = gzip.open if entry["sealed"] else open
+        with opener(path, 'rt', encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
 
-        if not title:
-            print(RED + "Task cannot be empty. Please try again." + RESET)
-            continue
 
-        # Date validation
-        while True:
-            if due_date is None:
-                due_date = input("Enter due date (YYYY-MM-DD) or leave blank: ").strip()
-            if due_date:
-                try:
-                    parsed_date = datetime.datetime.strptime(due_date, "%Y-%m-%d").date()
-                    if parsed_date < datetime.date(2025, 1, 1):
-                        print(RED + f"Error: Date cannot be before 2025-01-01. Please try again." + RESET)
-                        due_date = None  # Reset due_date to retry
-                        continue
-                    break  # Valid date
-                except ValueError:
-                    print(RED + "Error: Invalid date format. Please enter a valid date in YYYY-MM-DD format." + RESET)
-                    due_date = None  # Reset due_date to retry
-                    continue
-            else:
-                break  # Allow blank due date
+def load_archive():
+    return list(iter_archive())
 
-        # Priority validation
-        allowed_priorities = ["High", "Medium", "Low", ""]
-        while priority not in allowed_priorities:
-            if priority is None:
-                priority = input("Enter priority (High/Medium/Low or leave blank): ").strip()
-            if priority not in allowed_priorities:
-                print(RED + "Error: Invalid priority. Please choose 'High', 'Medium', 'Low', or leave it blank." + RESET)
-                priority = None  # Force re-entry
 
-        # Recurring validation
-        allowed_recurring = ["daily", "weekly", "monthly", "yearly", ""]
-        while recurring not in allowed_recurring:
-            if recurring is None:
-                recurring = input("Enter recurring interval (daily/weekly/monthly/yearly or leave blank): ").strip()
-            if recurring not in allowed_recurring:
-                print(RED + "Error: Invalid recurring interval. Please choose 'daily', 'weekly', 'monthly', 'yearly', or leave it blank." + RESET)
-                recurring = None  # Force re-entry
+def version_changes(known, tasks):
+    """
+    The tasks that are new or whose version differs from known (task ID ->
+    task), and the IDs in known that are no longer among tasks.
+    """
+    current = set()
+    changed = []
+    for task in tasks:
+        current.add(task.id)
+        old = known.get(task.id)
+        if old is None or old.version != task.version:
+            changed.append(task)
+    return changed, [task_id for task_id in known if task_id not in current]
+
+
+class JsonStorage:
+    """
+    Tasks in todo_list.json (optionally journaled), archive in monthly
+    segments under archive/. Queries use the in-memory indexes.
+    """
+
+    def load(self):
+        return load_json_tasks()
+
+    def changed_tasks(self, known):
+        """
+        What other processes saved relative to known (task ID -> task), as
+        version_changes returns it.
+        """
+        return version_changes(known, self.load())
+
+    def reset(self):
+        # Nothing is cached between loads
+        pass
+
+    def iter_tasks(self, start=0, stop=None):
+        return itertools.islice(self.load(), start, stop)
+
+    def save(self, tasks):
+        save_json_tasks(tasks)
+
+    def load_archive(self):
+        return load_archive()
+
+    def iter_archive(self, since=None):
+        return iter_archive(since)
+
+    def load_categories(self):
+        if os.path.exists(CATEGORIES_FILE):
+            with open(CATEGORIES_FILE, 'r') as f:
+                return json.load(f)
+        return [list(row) for row in DEFAULT_CATEGORIES]
+
+    def save_categories(self, rows):
+        with open(CATEGORIES_FILE, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+    def append_archive(self, completed):
+        # Only the newly completed tasks are written; nothing to archive means no archive I/O
+        if completed:
+            append_archive_rows(read_archive_manifest(), [t.to_dict() for t in completed])
+
+    def tasks_due_on(self, tasks, date_str):
+        return get_due_index(tasks).on(date_ordinal(date_str))
+
+    def tasks_due_between(self, tasks, start_str, end_str):
+        return get_due_index(tasks).range(date_ordinal(start_str), date_ordinal(end_str))
+
+    def overdue_tasks(self, tasks):
+        return get_due_index(tasks).before(today_ordinal())
+
+    def due_soon_tasks(self, tasks, days_ahead):
+        today = today_ordinal()
+        return get_due_index(tasks).range(today, today + days_ahead)
+
+    def build_stats(self, tasks):
+        return TaskStats.build(tasks if tasks is not None else self.iter_tasks(), self.iter_archive())
+
+
+# Task IDs per "IN (?, ...)" query; older SQLite builds allow at most 999 parameters
+SQLITE_BATCH = 900
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    due_date TEXT,
+    priority TEXT NOT NULL DEFAULT 'Medium',
+    recurring TEXT,
+    completion_timestamp TEXT,
+    rule TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks (due_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed_due ON tasks (completed, due_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS task_categories (
+    task_id INTEGER NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+    category_id INTEGER NOT NULL,
+    PRIMARY KEY (task_id, category_id)
+);
+CREATE INDEX IF NOT EXISTS idx_task_categories_category ON task_categories (category_id, task_id);
+CREATE TABLE IF NOT EXISTS archive (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id INTEGER,
+    title TEXT NOT NULL,
+    completed INTEGER NOT NULL,
+    due_date TEXT,
+    priority TEXT,
+    recurring TEXT,
+    categories TEXT,
+    completion_timestamp TEXT,
+    rule TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_archive_due_date ON archive (due_date);
+"""
+
+TASK_COLUMNS = ("t.id, t.title, t.completed, t.due_date, t.priority, t.recurring, t.completion_timestamp, t.rule, "
+                "t.version")
+# Only well-formed dates take part in date comparisons, matching is_overdue's handling of bad input
+VALID_DATE_SQL = "t.due_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+
+
+class SqliteStorage:
+    """
+    Tasks, categories and archive in todo_list.db. Saves apply only the
+    recorded changes, and date/category/report queries run against indexes.
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename or config.get("sqlite_file", SQLITE_FILE)
+        self._conn = None
+
+    @property
+    def conn(self):
+        import sqlite3
+        if self._conn is None:
+            is_new = not os.path.exists(self.filename)
+            self._conn = sqlite3.connect(self.filename)
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.executescript(SQLITE_SCHEMA)
+            # Databases created before recurrence rules and task versions were stored lack the columns
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+            if "rule" not in columns:
+                self._conn.execute("ALTER TABLE tasks ADD COLUMN rule TEXT")
+            if "version" not in columns:
+                self._conn.execute("ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            if "rule" not in {row[1] for row in self._conn.execute("PRAGMA table_info(archive)")}:
+                self._conn.execute("ALTER TABLE archive ADD COLUMN rule TEXT")
+            if is_new:
+                self.migrate_from_json()
+        return self._conn
+
+    def migrate_from_json(self):
+        """
+        One-shot import of todo_list.json, archive_list.json and the category
+        table into a freshly created database.
+        """
+        tasks = read_snapshot()
+        ensure_task_ids(tasks)
+        archived = load_archive() if os.path.exists(ARCHIVE_MANIFEST) else load_legacy_archive()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO categories (id, name, description) VALUES (?, ?, ?)",
+                [tuple(row) for row in JsonStorage().load_categories()],
+            )
+            self.insert_tasks(tasks)
+            self.insert_archive(archived)
+        if tasks or archived:
+            print(GREEN + f"Migrated {len(tasks)} tasks and {len(archived)} archived tasks to {self.filename}." + RESET)
+
+    def insert_tasks(self, tasks):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO tasks (id, title, completed, due_date, priority, recurring, completion_timestamp, rule, "
+            "version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(t.id, t.title, int(t.completed), t.due_date, t.priority, t.recurring, t.completion_timestamp,
+              json.dumps(t.rule.to_dict()) if t.rule else None, t.version)
+             for t in tasks],
+        )
+        self.conn.executemany(
+            "DELETE FROM task_categories WHERE task_id = ?", [(t.id,) for t in tasks]
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO task_categories (task_id, category_id) VALUES (?, ?)",
+            [(t.id, cat_id) for t in tasks for cat_id in t.categories],
+        )
+
+    def insert_archive(self, archived):
+        self.conn.executemany(
+            "INSERT INTO archive (task_id, title, completed, due_date, priority, recurring, categories, completion_timestamp, "
+            "rule) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(t.get("id"), t["title"], int(t["completed"]), t.get("due_date"), t.get("priority", "Medium"),
+              t.get("recurring"), json.dumps(t.get("categories", [])), t.get("completion_timestamp"),
+              json.dumps({key: t[key] for key in RULE_FIELDS if key in t}) if t.get("recurring") else None)
+             for t in archived],
+        )
+
+    def select_tasks(self, where="", params=()):
+        rows = self.conn.execute(
+            f"SELECT {TASK_COLUMNS}, group_concat(tc.category_id) FROM tasks t "
+            f"LEFT JOIN task_categories tc ON tc.task_id = t.id {where} GROUP BY t.id ORDER BY t.id",
+            params,
+        )
+        return [
+            Task.from_dict({
+                "id": row[0],
+                "title": row[1],
+                "completed": bool(row[2]),
+                "due_date": row[3],
+                "priority": row[4],
+                "recurring": row[5],
+                "categories": [int(c) for c in row[9].split(",")] if row[9] else [],
+                "completion_timestamp": row[6],
+                "version": row[8],
+                **(json.loads(row[7]) if row[7] else {}),
+            })
+            for row in rows
+        ]
+
+    def load(self):
+        tasks = self.select_tasks()
+        ensure_task_ids(tasks)
+        return tasks
+
+    def changed_tasks(self, known):
+        # Compare versions first and decode only the rows that moved on
+        versions = dict(self.conn.execute("SELECT id, version FROM tasks"))
+        changed = [task_id for task_id, version in versions.items()
+                   if task_id not in known or known[task_id].version != version]
+        tasks = []
+        for start in range(0, len(changed), SQLITE_BATCH):
+            batch = changed[start:start + SQLITE_BATCH]
+            tasks += self.select_tasks(f"WHERE t.id IN ({','.join('?' * len(batch))})", tuple(batch))
+        return tasks, [task_id for task_id in known if task_id not in versions]
+
+    def reset(self):
+        # Each query sees the latest committed data
+        pass
+
+    def iter_tasks(self, start=0, stop=None):
+        limit = -1 if stop is None else stop - start
+        rows = self.select_tasks(f"WHERE t.id IN (SELECT id FROM tasks ORDER BY id LIMIT {int(limit)} OFFSET {int(start)})")
+        return iter(rows)
+
+    def save(self, tasks):
+        with self.conn:
+            # Consecutive adds/updates go out as one executemany (a bulk import is one batch)
+            batch = []
+            for entry in pending_changes:
+                if entry["op"] == "remove":
+                    self.insert_tasks(batch)
+                    batch = []
+                    self.conn.execute("DELETE FROM tasks WHERE id = ?", (entry["id"],))
+                else:
+                    batch.append(entry["task"])
+            self.insert_tasks(batch)
+        pending_changes.clear()
+
+    def load_archive(self):
+        return list(self.iter_archive())
+
+    def build_stats(self, tasks):
+        return TaskStats.build(tasks if tasks is not None else self.iter_tasks(), self.iter_archive())
+
+    def iter_archive(self, since=None):
+        rows = self.conn.execute(
+            "SELECT task_id, title, completed, due_date, priority, recurring, categories, completion_timestamp, rule "
+            "FROM archive WHERE ? IS NULL OR due_date >= ? ORDER BY id", (since, since)
+        )
+        for row in rows:
+            yield {"id": row[0], "title": row[1], "completed": bool(row[2]), "due_date": row[3], "priority": row[4],
+                   "recurring": row[5], "categories": json.loads(row[6] or "[]"), "completion_timestamp": row[7],
+                   **(json.loads(row[8]) if row[8] else {})}
+
+    def load_categories(self):
+        return [list(row) for row in self.conn.execute("SELECT id, name, description FROM categories ORDER BY id")]
+
+    def save_categories(self, rows):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO categories (id, name, description) VALUES (?, ?, ?)", [tuple(row) for row in rows]
+            )
+
+    def append_archive(self, completed):
+        # Move the rows in one transaction so queries never see a task in both tables
+        with self.conn:
+            self.insert_archive([t.to_dict() for t in completed])
+            self.conn.executemany("DELETE FROM tasks WHERE id = ?", [(t.id,) for t in completed])
+
+    def tasks_due_on(self, tasks, date_str):
+        return self.select_tasks("WHERE t.completed = 0 AND t.due_date = ?", (date_str,))
+
+    def tasks_due_between(self, tasks, start_str, end_str):
+        return self.select_tasks(
+            f"WHERE t.completed = 0 AND t.due_date BETWEEN ? AND ? AND {VALID_DATE_SQL}", (start_str, end_str)
+        )
+
+    def overdue_tasks(self, tasks):
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        return self.select_tasks(f"WHERE t.completed = 0 AND t.due_date < ? AND {VALID_DATE_SQL}", (today,))
+
+    def due_soon_tasks(self, tasks, days_ahead):
+        today = datetime.date.today()
+        end = today + datetime.timedelta(days=days_ahead)
+        return self.select_tasks(
+            f"WHERE t.completed = 0 AND t.due_date BETWEEN ? AND ? AND {VALID_DATE_SQL}",
+            (today.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")),
+        )
+
+    def select_categories(self, any_of=(), all_of=(), none_of=()):
+        """
+        Tasks in any of any_of, in all of all_of and in none of none_of, in
+        ID order, answered from the task_categories index.
+        """
+        in_any = "t.id {}IN (SELECT task_id FROM task_categories WHERE category_id IN ({}))"
+        conditions, params = [], []
+        if any_of:
+            conditions.append(in_any.format("", ",".join("?" * len(any_of))))
+            params += any_of
+        for cat_id in all_of:
+            conditions.append("t.id IN (SELECT task_id FROM task_categories WHERE category_id = ?)")
+            params.append(cat_id)
+        if none_of:
+            conditions.append(in_any.format("NOT ", ",".join("?" * len(none_of))))
+            params += none_of
+        return self.select_tasks("WHERE " + " AND ".join(conditions) if conditions else "", tuple(params))
+
+
+# Sidecar index header: magic, version, task count, size of the NDJSON file it describes
+NDJSON_INDEX_HEADER = struct.Struct("<4sIQQ")
+NDJSON_INDEX_MAGIC = b"TDNX"
+NDJSON_INDEX_VERSION = 1
+
+
+class NdjsonTaskFile:
+    """
+    Read-only view of todo_list.ndjson (one task per line) through its
+    sidecar offset index. The task file is memory-mapped and a line is only
+    parsed when its task is asked for, so commands can seek straight to the
+    N-th task or a due-date range and stop early.
+    """
+
+    def __init__(self, filename=NDJSON_FILE, index_filename=NDJSON_INDEX_FILE):
+        import mmap
+        self.filename = filename
+        self.index_filename = index_filename
+        self.offsets = array("Q", [0])
+        self.due = array("i")
+        self.done = array("b")
+        # Sorted (due << 32 | line) keys of incomplete tasks with a due date
+        self.due_keys = array("q")
+        self._file = None
+        self._map = None
+        if not self.read_index():
+            self.rebuild_index()
+        if self.offsets[-1]:
+            self._file = open(filename, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_index(self):
+        if not os.path.exists(self.index_filename):
+            return False
+        with open(self.index_filename, 'rb') as f:
+            header = f.read(NDJSON_INDEX_HEADER.size)
+            if len(header) < NDJSON_INDEX_HEADER.size:
+                return False
+            magic, version, count, size = NDJSON_INDEX_HEADER.unpack(header)
+            if magic != NDJSON_INDEX_MAGIC or version != NDJSON_INDEX_VERSION:
+                return False
+            if size != os.path.getsize(self.filename):
+                return False  # The task file changed without its index
+            self.offsets = array("Q")
+            self.offsets.fromfile(f, count + 1)
+            self.due = array("i")
+            self.due.fromfile(f, count)
+            self.done = array("b")
+            self.done.fromfile(f, count)
+            key_count = struct.unpack("<Q", f.read(8))[0]
+            self.due_keys = array("q")
+            self.due_keys.fromfile(f, key_count)
+        return True
+
+    def rebuild_index(self):
+        """
+        Scan the task file once to recreate a missing or stale index.
+        """
+        self.offsets = array("Q", [0])
+        self.due = array("i")
+        self.done = array("b")
+        with open(self.filename, 'rb') as f:
+            for line in f:
+                data = json.loads(line)
+                self.offsets.append(self.offsets[-1] + len(line))
+                self.due.append((date_ordinal(data["due_date"]) or 0) if data.get("due_date") else 0)
+                self.done.append(bool(data.get("completed")))
+        self.sort_due_keys()
+        self.write_index()
+
+    def sort_due_keys(self):
+        self.due_keys = array("q", sorted(
+            due << DUE_KEY_SHIFT | line for line, (due, done) in enumerate(zip(self.due, self.done)) if due and not done
+        ))
+
+    def write_index(self):
+        # A stale or torn index is rebuilt on read, so no fsync; the rename keeps readers off a partial one
+        temp_file = self.index_filename + ".tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(NDJSON_INDEX_HEADER.pack(NDJSON_INDEX_MAGIC, NDJSON_INDEX_VERSION, len(self), self.offsets[-1]))
+            self.offsets.tofile(f)
+            self.due.tofile(f)
+            self.done.tofile(f)
+            f.write(struct.pack("<Q", len(self.due_keys)))
+            self.due_keys.tofile(f)
+        os.replace(temp_file, self.index_filename)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def __len__(self):
+        return len(self.due)
+
+    def task(self, n):
+        return Task.from_dict(json.loads(self._map[self.offsets[n]:self.offsets[n + 1]]))
+
+    def iter_tasks(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        for n in range(start, stop):
+            yield self.task(n)
+
+    def due_between(self, start, end):
+        lo = bisect.bisect_left(self.due_keys, start << DUE_KEY_SHIFT)
+        hi = bisect.bisect_left(self.due_keys, (end + 1) << DUE_KEY_SHIFT)
+        return [self.task(key & DUE_KEY_ID_MASK) for key in self.due_keys[lo:hi]]
+
+    def count_due_between(self, start, end):
+        lo = bisect.bisect_left(self.due_keys, start << DUE_KEY_SHIFT)
+        hi = bisect.bisect_left(self.due_keys, (end + 1) << DUE_KEY_SHIFT)
+        return hi - lo
+
+
+def write_ndjson_tasks(tasks, filename=NDJSON_FILE, index_filename=NDJSON_INDEX_FILE, append=False):
+    """
+    Write tasks as NDJSON together with their offset index. With append the
+    tasks are added after the existing lines and the index is extended.
+    """
+    if append and os.path.exists(filename):
+        task_file = NdjsonTaskFile(filename, index_filename)
+        task_file.close()
+        offsets, due, done = task_file.offsets, task_file.due, task_file.done
+        target, mode = filename, 'ab'
+    else:
+        # A rewrite goes to a temp file that replaces the old one once complete
+        offsets, due, done = array("Q", [0]), array("i"), array("b")
+        target, mode = filename + ".tmp", 'wb'
+    with open(target, mode) as f:
+        for chunk in chunked(tasks):
+            lines = [(json.dumps(t.to_dict()) + "\n").encode("utf-8") for t in chunk]
+            for t, line in zip(chunk, lines):
+                offsets.append(offsets[-1] + len(line))
+                due.append(t.due)
+                done.append(t.completed)
+            f.write(b"".join(lines))
+            count_metric("bytes_written", sum(map(len, lines)))
+        if config.get("fsync", True):
+            f.flush()
+            with measure("fsync"):
+                os.fsync(f.fileno())
+    if target != filename:
+        os.replace(target, filename)
+    index = NdjsonTaskFile.__new__(NdjsonTaskFile)
+    index.filename, index.index_filename = filename, index_filename
+    index.offsets, index.due, index.done = offsets, due, done
+    index.sort_due_keys()
+    index.write_index()
+
+
+class NdjsonStorage(JsonStorage):
+    """
+    Tasks in todo_list.ndjson with a sidecar offset index; archive and
+    categories as for JSON. Without an in-memory task list (tasks=None) the
+    queries read only the index and the lines they return. An existing
+    todo_list.json is converted on first use.
+    """
+
+    def __init__(self):
+        self._file = None
+
+    @property
+    def task_file(self):
+        if self._file is None:
+            if not os.path.exists(NDJSON_FILE):
+                tasks = read_snapshot()
+                ensure_task_ids(tasks)
+                write_ndjson_tasks(tasks)
+            self._file = NdjsonTaskFile()
+        return self._file
+
+    def reset(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def load(self):
+        tasks = list(self.task_file.iter_tasks())
+        ensure_task_ids(tasks)
+        return tasks
+
+    def iter_tasks(self, start=0, stop=None):
+        return self.task_file.iter_tasks(start, stop)
+
+    def save(self, tasks):
+        # New tasks are appended with their index entries; anything else rewrites the file
+        only_adds = pending_changes and all(entry["op"] == "add" for entry in pending_changes)
+        self.reset()
+        if only_adds and os.path.exists(NDJSON_FILE):
+            write_ndjson_tasks([entry["task"] for entry in pending_changes], append=True)
+        else:
+            write_ndjson_tasks(tasks)
+        pending_changes.clear()
+
+    def tasks_due_on(self, tasks, date_str):
+        if tasks is not None:
+            return super().tasks_due_on(tasks, date_str)
+        day = date_ordinal(date_str)
+        return self.task_file.due_between(day, day)
+
+    def tasks_due_between(self, tasks, start_str, end_str):
+        if tasks is not None:
+            return super().tasks_due_between(tasks, start_str, end_str)
+        return self.task_file.due_between(date_ordinal(start_str), date_ordinal(end_str))
+
+    def overdue_tasks(self, tasks):
+        if tasks is not None:
+            return super().overdue_tasks(tasks)
+        return self.task_file.due_between(1, today_ordinal() - 1)
+
+    def due_soon_tasks(self, tasks, days_ahead):
+        if tasks is not None:
+            return super().due_soon_tasks(tasks, days_ahead)
+        today = today_ordinal()
+        return self.task_file.due_between(today, today + days_ahead)
+
+
+# Binary snapshot layout, all little-endian and 8-byte aligned up to the rules:
+#   header   magic, version, record size, task count, completed count, then
+#            (offset, count) of the records, due keys, rules, exceptions and
+#            (offset, size) of the title heap and the extras
+#   records  one fixed-width record per task, in task order
+#   due keys sorted (due << 32 | row) of incomplete tasks with a due date
+#   rules    start, every, until, first exception, exception count
+#   heap     UTF-8 titles, addressed by (offset, length) from the records
+#   extras   JSON {row: {...}} for the few records flagged BINARY_EXTRA: the
+#            full category mask when it needs more than 64 bits and the
+#            verbatim strings of an invalid due date or priority
+BINARY_HEADER = struct.Struct("<4sHHQQ" + "QQ" * 6)
+# Version 1 had no extras section
+BINARY_HEADER_V1 = struct.Struct("<4sHHQQ" + "QQ" * 5)
+BINARY_MAGIC = b"TDBN"
+BINARY_VERSION = 2
+# id, done_at, low 64 bits of cat_mask, title offset, title length, due, rule row (-1 for none), version,
+# completed, prio, recur, flags
+BINARY_RECORD = struct.Struct("<qqQIIiiI?bbB")
+BINARY_RULE = struct.Struct("<iiiII")
+BINARY_FIELDS = ("id", "done_at", "cat_mask", "title_offset", "title_length", "due", "rule", "version",
+                 "completed", "prio", "recur", "flags")
+BINARY_EXTRA = 1
+BINARY_MASK_BITS = (1 << 64) - 1
+
+
+class BinaryTaskFile:
+    """
+    Read-only view of a binary snapshot (todo_list.bin). The file is
+    memory-mapped; counts come from the header, due-date ranges are a
+    bisect over the mapped due keys, and a task is only decoded from its
+    record when it is asked for.
+    """
+
+    def __init__(self, filename=BINARY_FILE):
+        import mmap
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < BINARY_HEADER_V1.size:
+            self.close()
+            raise ValueError(f"'{filename}' is not a task snapshot")
+        version = BINARY_HEADER_V1.unpack_from(self._map)[1]
+        header = BINARY_HEADER if version == BINARY_VERSION else BINARY_HEADER_V1
+        (magic, version, record_size, self.count, self.completed, self.records_offset, _,
+         keys_offset, key_count, self.rules_offset, _, exceptions_offset, exception_count,
+         self.heap_offset, _, *extras) = header.unpack_from(self._map)
+        if magic != BINARY_MAGIC or version not in (1, BINARY_VERSION) or record_size != BINARY_RECORD.size:
+            self.close()
+            raise ValueError(f"'{filename}' is not a version {BINARY_VERSION} task snapshot")
+        # Version 1 records have a zero pad byte where the flags are, so nothing refers to extras
+        self.extras_offset, self.extras_size = extras or (0, 0)
+        self._extras = None
+        self._view = memoryview(self._map)
+        # Zero-copy: bisect and indexing read the mapped pages directly
+        self.due_keys = self._view[keys_offset:keys_offset + 8 * key_count].cast("q")
+        self.exceptions = self._view[exceptions_offset:exceptions_offset + 4 * exception_count].cast("i")
+
+    def close(self):
+        if self._map is not None:
+            for view in ("due_keys", "exceptions", "_view"):
+                if hasattr(self, view):
+                    getattr(self, view).release()
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def __len__(self):
+        return self.count
+
+    def record(self, n):
+        return BINARY_RECORD.unpack_from(self._map, self.records_offset + n * BINARY_RECORD.size)
+
+    def extras(self, n):
+        if self._extras is None:
+            start = self.extras_offset
+            self._extras = json.loads(self._map[start:start + self.extras_size]) if self.extras_size else {}
+        return self._extras.get(str(n), {})
+
+    def field(self, n, name):
+        """
+        One field of the n-th task, e.g. field(n, "due"), without decoding
+        the rest of its record or its title.
+        """
+        record = self.record(n)
+        if name == "cat_mask" and record[-1] & BINARY_EXTRA:
+            return self.extras(n).get("cat_mask", record[2])
+        return record[BINARY_FIELDS.index(name)]
+
+    def title(self, n):
+        _, _, _, offset, length, *_ = self.record(n)
+        start = self.heap_offset + offset
+        return str(self._map[start:start + length], "utf-8")
+
+    def rule(self, row):
+        start, every, until, first, count = BINARY_RULE.unpack_from(self._map, self.rules_offset + row * BINARY_RULE.size)
+        return RecurrenceRule(start, every, until, tuple(self.exceptions[first:first + count]))
+
+    def task(self, n):
+        id, done_at, cat_mask, offset, length, due, rule, version, completed, prio, recur, flags = self.record(n)
+        start = self.heap_offset + offset
+        invalid = None
+        if flags & BINARY_EXTRA:
+            extras = self.extras(n)
+            cat_mask = extras.get("cat_mask", cat_mask)
+            invalid = extras.get("invalid")
+        return Task(str(self._map[start:start + length], "utf-8"), completed=completed, due=due, prio=prio,
+                    recur=recur, cat_mask=cat_mask, done_at=done_at, id=id,
+                    rule=self.rule(rule) if rule >= 0 else None, version=version, invalid=invalid)
+
+    def iter_tasks(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        for n in range(start, stop):
+            yield self.task(n)
+
+    def due_between(self, start, end):
+        lo = bisect.bisect_left(self.due_keys, start << DUE_KEY_SHIFT)
+        hi = bisect.bisect_left(self.due_keys, (end + 1) << DUE_KEY_SHIFT)
+        return [self.task(key & DUE_KEY_ID_MASK) for key in self.due_keys[lo:hi]]
+
+    def count_due_between(self, start, end):
+        lo = bisect.bisect_left(self.due_keys, start << DUE_KEY_SHIFT)
+        hi = bisect.bisect_left(self.due_keys, (end + 1) << DUE_KEY_SHIFT)
+        return hi - lo
+
+
+def binary_snapshot(tasks):
+    """
+    Encode tasks in the binary snapshot layout described above.
+    """
+    records = bytearray(BINARY_RECORD.size * len(tasks))
+    heap = bytearray()
+    rules = bytearray()
+    exceptions = array("i")
+    due_keys = array("q")
+    extras = {}
+    completed = 0
+    for row, t in enumerate(tasks):
+        title = t.title.encode("utf-8")
+        flags = 0
+        if t.cat_mask > BINARY_MASK_BITS or t.invalid:
+            flags = BINARY_EXTRA
+            extras[row] = extra = {}
+            if t.cat_mask > BINARY_MASK_BITS:
+                extra["cat_mask"] = t.cat_mask
+            if t.invalid:
+                extra["invalid"] = t.invalid
+        rule = -1
+        if t.rule:
+            rule = len(rules) // BINARY_RULE.size
+            rules += BINARY_RULE.pack(t.rule.start, t.rule.every, t.rule.until, len(exceptions),
+                                      len(t.rule.exceptions))
+            exceptions.extend(t.rule.exceptions)
+        BINARY_RECORD.pack_into(records, row * BINARY_RECORD.size, t.id, t.done_at, t.cat_mask & BINARY_MASK_BITS,
+                                len(heap), len(title), t.due, rule, t.version, t.completed, t.prio, t.recur, flags)
+        heap += title
+        if t.completed:
+            completed += 1
+        elif t.due:
+            due_keys.append(t.due << DUE_KEY_SHIFT | row)
+    due_keys = array("q", sorted(due_keys))
+    records_offset = BINARY_HEADER.size
+    keys_offset = records_offset + len(records)
+    rules_offset = keys_offset + len(due_keys) * due_keys.itemsize
+    exceptions_offset = rules_offset + len(rules)
+    heap_offset = exceptions_offset + len(exceptions) * exceptions.itemsize
+    extras = json.dumps(extras, separators=(",", ":")).encode("utf-8") if extras else b""
+    header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, BINARY_RECORD.size, len(tasks), completed,
+                                records_offset, len(tasks), keys_offset, len(due_keys),
+                                rules_offset, len(rules) // BINARY_RULE.size, exceptions_offset, len(exceptions),
+                                heap_offset, len(heap), heap_offset + len(heap), len(extras))
+    return b"".join((header, records, due_keys.tobytes(), rules, exceptions.tobytes(), heap, extras))
+
+
+def write_binary_tasks(tasks, filename=BINARY_FILE):
+    data = binary_snapshot(tasks)
+    write_durably(filename, data, 'wb')
+    count_metric("bytes_written", len(data))
+
+
+class BinaryStorage(NdjsonStorage):
+    """
+    Tasks in the binary snapshot todo_list.bin; archive and categories as
+    for JSON. Queries without an in-memory task list (tasks=None) read the
+    header, the due keys and the records they return. Every save rewrites
+    the snapshot. An existing todo_list.json is converted on first use.
+    """
+
+    @property
+    def task_file(self):
+        if self._file is None:
+            if not os.path.exists(BINARY_FILE):
+                tasks = read_snapshot()
+                ensure_task_ids(tasks)
+                write_binary_tasks(tasks)
+            self._file = BinaryTaskFile()
+        return self._file
+
+    def save(self, tasks):
+        self.reset()
+        write_binary_tasks(tasks)
+        pending_changes.clear()
+
+
+# File formats --convert reads and writes, by extension
+CONVERT_FORMATS = {".json": "json", ".ndjson": "ndjson", ".bin": "binary"}
+
+
+def convert_format(filename):
+    return CONVERT_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def read_tasks_file(filename, fmt):
+    if fmt == "binary":
+        task_file = BinaryTaskFile(filename)
+        try:
+            return list(task_file.iter_tasks())
+        finally:
+            task_file.close()
+    with open(filename, 'rb') as f:
+        if fmt == "ndjson":
+            return [Task.from_dict(json.loads(line)) for line in f if line.strip()]
+        return [Task.from_dict(data) for data in json.load(f)]
+
+
+def convert_tasks(source, target):
+    """
+    Convert a task file between JSON, NDJSON and the binary snapshot
+    format (by extension), keeping IDs and versions, and compare the two
+    files' sizes and full load times.
+    """
+    source_fmt, target_fmt = convert_format(source), convert_format(target)
+    for filename, fmt in ((source, source_fmt), (target, target_fmt)):
+        if fmt is None:
+            print(RED + f"Error: Cannot tell the format of '{filename}'. Use a .json, .ndjson or .bin file." + RESET)
+            return False
+    if not os.path.exists(source):
+        print(RED + f"Error: File '{source}' not found." + RESET)
+        return False
+    try:
+        start = time.perf_counter()
+        tasks = read_tasks_file(source, source_fmt)
+        source_seconds = time.perf_counter() - start
+    except (ValueError, KeyError, TypeError) as e:
+        print(RED + f"Error: Could not read '{source}': {e}" + RESET)
+        return False
+    if os.path.abspath(source) == os.path.abspath(target):
+        print(RED + "Error: Source and target are the same file." + RESET)
+        return False
+
+    if target_fmt == "binary":
+        write_binary_tasks(tasks, target)
+    elif target_fmt == "ndjson":
+        write_ndjson_tasks(tasks, target, target + ".idx")
+    else:
+        write_durably(target, snapshot_text(tasks))
+    start = time.perf_counter()
+    read_tasks_file(target, target_fmt)
+    target_seconds = time.perf_counter() - start
+
+    print(GREEN + f"Converted {len(tasks)} task(s) from {source} to {target}." + RESET)
+    for filename, seconds in ((source, source_seconds), (target, target_seconds)):
+        print(f"  {filename:<30} {os.path.getsize(filename) / 1024:>10.1f} KiB  load {seconds * 1000:>8.1f} ms")
+    return True
+
+
+SHARD_DIR = "shards"
+# Below this many bytes of shards a query runs in-process; starting the pool costs more than it saves
+SHARD_PARALLEL_BYTES = 1 << 22
+
+
+def shard_key(task, shard_by):
+    if shard_by == "category":
+        low = task.cat_mask & -task.cat_mask
+        return f"category-{low.bit_length() - 1}" if low else "uncategorized"
+    return date_string(task.due)[:7] if task.due else "undated"
+
+
+# Per-shard work for the process pool. Each takes the shard path last and
+# returns a partial result that ShardedStorage merges.
+
+def read_shard(path):
+    with open(path, 'rb') as f:
+        return [Task.from_dict(json.loads(line)) for line in f]
+
+
+def page_shard(sort_by, end, path):
+    tasks = read_shard(path)
+    key = SORT_KEYS.get(sort_by)
+    if key is None:
+        return len(tasks), tasks[:end]
+    if end is not None and end < len(tasks):
+        return len(tasks), heapq.nsmallest(end, tasks, key=key)
+    return len(tasks), sorted(tasks, key=key)
+
+
+def search_shard(query, path):
+    # Only lines containing the query bytes are parsed, unless JSON escaping could hide a match
+    raw = query.encode() if query.isascii() and '"' not in query and "\\" not in query else None
+    found = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if raw is None or raw in line.lower():
+                task = Task.from_dict(json.loads(line))
+                if query in task.title.lower():
+                    found.append(task)
+    return found
+
+
+def category_shard(any_mask, all_mask, none_mask, path):
+    return [task for task in read_shard(path)
+            if (not any_mask or task.cat_mask & any_mask) and task.cat_mask & all_mask == all_mask
+            and not task.cat_mask & none_mask]
+
+
+def due_shard(start, end, path):
+    tasks = [task for task in read_shard(path) if not task.completed and start <= task.due <= end]
+    return sorted(tasks, key=lambda t: (t.due, t.id))
+
+
+def stats_shard(path):
+    return TaskStats.build(read_shard(path), ())
+
+
+class ShardedStorage(JsonStorage):
+    """
+    Tasks split into NDJSON shard files under shards/, one per due month
+    (config "shard_by": "month", the default) or per lowest category
+    ("category"). Loads, searches, category filters, due-date queries and
+    the report fan out over a process pool of config "workers" processes
+    (--workers, default one per CPU); each shard yields a partial result
+    and the parent merges them. A save rewrites only the shards it touched.
+    Archive and categories are as for JSON. An existing todo_list.json is
+    split into shards on first use.
+    """
+
+    def __init__(self):
+        self.shard_by = config.get("shard_by", "month")
+        # Shard of every loaded task, so a save knows which files a change touches
+        self.shard_of = {}
+
+    def shard_path(self, key):
+        return os.path.join(SHARD_DIR, key + ".ndjson")
+
+    def shard_files(self):
+        if not os.path.isdir(SHARD_DIR):
+            tasks = read_snapshot()
+            ensure_task_ids(tasks)
+            os.makedirs(SHARD_DIR, exist_ok=True)
+            self.write_shards(tasks, {shard_key(t, self.shard_by) for t in tasks})
+        return sorted(os.path.join(SHARD_DIR, name) for name in os.listdir(SHARD_DIR) if name.endswith(".ndjson"))
+
+    def fan_out(self, work, paths=None):
+        """
+        Run work(path) for every shard (or the given ones) and return the
+        results in shard order, in parallel when the shards are big enough.
+        """
+        paths = self.shard_files() if paths is None else paths
+        workers = min(config.get("workers") or os.cpu_count() or 1, len(paths))
+        count_metric("shards", len(paths))
+        if workers <= 1 or sum(map(file_size, paths)) < SHARD_PARALLEL_BYTES:
+            return [work(path) for path in paths]
+        import concurrent.futures
+        import multiprocessing
+        # fork shares the loaded module with the workers instead of importing it again
+        context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+        with measure("pool"), concurrent.futures.ProcessPoolExecutor(workers, mp_context=context) as pool:
+            return list(pool.map(work, paths))
+
+    def reset(self):
+        self.shard_of = {}
+
+    def load(self):
+        paths = self.shard_files()
+        parts = self.fan_out(read_shard, paths)
+        self.shard_of = {}
+        tasks = []
+        for path, part in zip(paths, parts):
+            key = os.path.basename(path)[:-len(".ndjson")]
+            for task in part:
+                self.shard_of[task.id] = key
+            tasks += part
+        # Each shard is in ID order, so this is a k-way merge of already sorted runs
+        tasks.sort(key=lambda t: t.id)
+        ensure_task_ids(tasks)
+        return tasks
+
+    def write_shards(self, tasks, keys):
+        groups = {key: [] for key in keys}
+        for task in tasks:
+            key = self.shard_of.get(task.id)
+            if key is None:
+                key = self.shard_of[task.id] = shard_key(task, self.shard_by)
+            if key in groups:
+                groups[key].append(task)
+        for key, members in groups.items():
+            path = self.shard_path(key)
+            if members:
+                text = "".join(json.dumps(t.to_dict()) + "\n" for t in members)
+                write_durably(path, text)
+                count_metric("bytes_written", len(text))
+            elif os.path.exists(path):
+                os.remove(path)
+
+    def save(self, tasks):
+        self.shard_files()
+        touched = set()
+        added = {}
+        only_adds = True
+        for entry in pending_changes:
+            if entry["op"] == "remove":
+                touched.add(self.shard_of.pop(entry["id"], None))
+                only_adds = False
+                continue
+            task = entry["task"]
+            key = shard_key(task, self.shard_by)
+            old = self.shard_of.get(task.id)
+            self.shard_of[task.id] = key
+            touched.update((old, key))
+            if entry["op"] == "add":
+                added.setdefault(key, []).append(task)
+            else:
+                only_adds = False
+        touched.discard(None)
+        if only_adds:
+            # New tasks are appended to their shards; nothing else is rewritten
+            for key, members in added.items():
+                text = "".join(json.dumps(t.to_dict()) + "\n" for t in members)
+                with open(self.shard_path(key), 'a') as f:
+                    f.write(text)
+                    if config.get("fsync", True):
+                        f.flush()
+                        os.fsync(f.fileno())
+                count_metric("bytes_written", len(text))
+        elif touched:
+            self.write_shards(tasks, touched)
+        pending_changes.clear()
+
+    def page(self, sort_by=None, offset=0, limit=None):
+        """
+        Like select_page over every task: each shard returns its count and
+        its first offset + limit tasks in sort order, merged k-way here.
+        """
+        end = None if limit is None else offset + limit
+        parts = self.fan_out(functools.partial(page_shard, sort_by, end))
+        total = sum(count for count, _ in parts)
+        key = SORT_KEYS.get(sort_by)
+        # Shards come back in (key, ID) order, as a stable sort of the whole list would be
+        merged = heapq.merge(*(part for _, part in parts), key=(lambda t: (key(t), t.id)) if key else (lambda t: t.id))
+        return list(itertools.islice(merged, offset, end)), total
+
+    def search(self, query):
+        found = [task for part in self.fan_out(functools.partial(search_shard, query.lower())) for task in part]
+        return sorted(found, key=lambda t: t.id)
+
+    def select_categories(self, any_of=(), all_of=(), none_of=()):
+        work = functools.partial(category_shard, category_mask(any_of), category_mask(all_of), category_mask(none_of))
+        return sorted((task for part in self.fan_out(work) for task in part), key=lambda t: t.id)
+
+    def due_between(self, start, end):
+        paths = self.shard_files()
+        if self.shard_by == "month":
+            # Month shards outside the range cannot match
+            first, last = date_string(start)[:7] if start > 1 else "", date_string(end)[:7]
+            paths = [path for path in paths if first <= os.path.basename(path)[:7] <= last]
+        parts = self.fan_out(functools.partial(due_shard, start, end), paths)
+        return list(heapq.merge(*parts, key=lambda t: (t.due, t.id)))
+
+    def build_stats(self, tasks):
+        if tasks is not None:
+            return super().build_stats(tasks)
+        stats = TaskStats()
+        for part in self.fan_out(stats_shard):
+            stats.merge(part)
+        for row in self.iter_archive():
+            stats.count_row(row)
+        stats.dirty = True
+        return stats
+
+    def tasks_due_on(self, tasks, date_str):
+        if tasks is not None:
+            return super().tasks_due_on(tasks, date_str)
+        day = date_ordinal(date_str)
+        return self.due_between(day, day)
+
+    def tasks_due_between(self, tasks, start_str, end_str):
+        if tasks is not None:
+            return super().tasks_due_between(tasks, start_str, end_str)
+        return self.due_between(date_ordinal(start_str), date_ordinal(end_str))
+
+    def overdue_tasks(self, tasks):
+        if tasks is not None:
+            return super().overdue_tasks(tasks)
+        return self.due_between(1, today_ordinal() - 1)
+
+    def due_soon_tasks(self, tasks, days_ahead):
+        if tasks is not None:
+            return super().due_soon_tasks(tasks, days_ahead)
+        today = today_ordinal()
+        return self.due_between(today, today + days_ahead)
+
+
+STORAGE_BACKENDS = {
+    "json": JsonStorage,
+    "journal": JsonStorage,
+    "sqlite": SqliteStorage,
+    "ndjson": NdjsonStorage,
+    "binary": BinaryStorage,
+    "sharded": ShardedStorage,
+}
+
+
+def get_storage():
+    name = config.get("storage", "json")
+    if name not in STORAGE_BACKENDS:
+        print(YELLOW + f"Warning: Unknown storage backend '{name}', using json." + RESET)
+        name = "json"
+    return STORAGE_BACKENDS[name]()
+
+
+def open_storage():
+    """
+    Read config.json and pick the storage backend it names. main() calls
+    this before any command; code importing the module calls it itself.
+    """
+    global config, storage
+    config = load_config()
+    storage = get_storage()
+
+
+@contextlib.contextmanager
+def storage_lock(shared=False):
+    """
+    Hold the advisory lock on todo_list.lock (fcntl.flock) while reading or
+    writing the task files, so concurrent processes take turns: shared for
+    loads, exclusive for saves. Re-entrant; a nested request keeps the
+    outer lock. Platforms without fcntl run unlocked.
+    """
+    global lock_depth, lock_fd
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    if lock_depth == 0:
+        lock_fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        with measure("lock wait"):
+            fcntl.flock(lock_fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+    lock_depth += 1
+    try:
+        yield
+    finally:
+        lock_depth -= 1
+        if lock_depth == 0:
+            # Closing the descriptor releases the lock
+            os.close(lock_fd)
+            lock_fd = None
+
+
+def reset_task_indexes():
+    """
+    Forget the in-memory indexes after the task list was replaced from
+    disk; each is rebuilt on its next use. Listeners registered by anything
+    else, such as a server's reminder scheduler, stay attached.
+    """
+    global search_index, due_index, task_stats
+    stale = [index.on_change for index in (search_index, due_index, task_stats) if index is not None]
+    if categories.indexed:
+        stale.append(categories.on_change)
+    change_listeners[:] = [listener for listener in change_listeners if listener not in stale]
+    search_index = due_index = task_stats = None
+    categories.tasks, categories.masks, categories.indexed = {}, {}, False
+
+
+def merge_concurrent_changes(tasks):
+    """
+    Another process saved since we loaded: reload the tasks from disk (in
+    place) and replay this session's pending changes on top. An update or
+    removal of a task whose version moved on in the meantime is a conflict:
+    the other process's version is kept and the task is returned. New
+    tasks whose ID was taken meanwhile get a fresh one.
+    """
+    with measure("merge"):
+        storage.reset()
+        current = {t.id: t for t in storage.load()}
+        conflicts = []
+        kept = []
+        renumbered = {}
+        for entry in pending_changes:
+            if entry["op"] == "add":
+                task = entry["task"]
+                if task.id in current and current[task.id] is not task:
+                    old_id = task.id
+                    renumbered[old_id] = assign_task_id(task).id
+                current[task.id] = task
+                kept.append(entry)
+            elif entry["op"] == "update":
+                task = entry["task"]
+                on_disk = current.get(task.id)
+                if on_disk is not task:
+                    if on_disk is None or on_disk.version != entry["base"]:
+                        conflicts.append(on_disk or task)
+                        continue
+                    current[task.id] = task
+                kept.append(entry)
+            else:
+                task_id = renumbered.get(entry["id"], entry["id"])
+                on_disk = current.get(task_id)
+                if on_disk is None:
+                    continue  # Already gone
+                if on_disk.version != entry["version"]:
+                    conflicts.append(on_disk)
+                    continue
+                del current[task_id]
+                kept.append({"op": "remove", "id": task_id, "version": entry["version"]})
+        pending_changes[:] = kept
+        tasks[:] = current.values()
+        ensure_task_ids(tasks)
+        reset_task_indexes()
+    count_metric("merges")
+    for task in conflicts:
+        print(RED + f"Error: Task '{task.title}' was changed by another process; your change to it was not saved."
+              + RESET)
+    return conflicts
+
+
+def sync_tasks(tasks):
+    """
+    Bring tasks up to date with the files if another process saved since our
+    last load or save. Call with the storage lock held.
+    """
+    if storage_signature() != loaded_signature:
+        return merge_concurrent_changes(tasks)
+    return []
+
+
+def load_tasks():
+    global loaded_signature
+    with measure("load"), storage_lock(shared=True):
+        tasks = storage.load()
+        loaded_signature = storage_signature()
+        return tasks
+
+
+def save_tasks(tasks):
+    """
+    Write the session's changes under the exclusive storage lock, first
+    merging whatever other processes saved since we loaded. Returns the
+    tasks whose change was dropped as a conflict.
+    """
+    global loaded_signature
+    with measure("save"):
+        with storage_lock():
+            conflicts = sync_tasks(tasks)
+            storage.save(tasks)
+            loaded_signature = storage_signature()
+        group_commit()
+    return conflicts
+
+# Due dates are parsed once per distinct string; repeats are a dict lookup
+date_ordinal_cache = {}
+
+
+def date_ordinal(date_str):
+    """
+    Return the proleptic ordinal of a YYYY-MM-DD string, or None if it is invalid.
+    """
+    try:
+        return date_ordinal_cache[date_str]
+    except KeyError:
+        pass
+    count_metric("strptime_calls")
+    try:
+        ordinal = datetime.datetime.strptime(date_str, "%Y-%m-%d").date().toordinal()
+    except (TypeError, ValueError):
+        ordinal = None
+    date_ordinal_cache[date_str] = ordinal
+    return ordinal
+
+
+# Formatting goes through a cache too; most tasks share a few thousand dates
+date_string_cache = {}
+
+
+def date_string(ordinal):
+    try:
+        return date_string_cache[ordinal]
+    except KeyError:
+        text = date_string_cache[ordinal] = datetime.date.fromordinal(ordinal).strftime("%Y-%m-%d")
+        return text
+
+
+def today_ordinal():
+    return datetime.date.today().toordinal()
+
+
+def parse_date(date_str):
+    # Attempt to parse date in YYYY-MM-DD format; None if the format is invalid
+    ordinal = date_ordinal(date_str)
+    return datetime.date.fromordinal(ordinal) if ordinal is not None else None
+
+
+def is_overdue(task, today=None):
+    # Tasks without a (valid) due date have due == 0
+    return 0 < task.due < (today or today_ordinal())
+
+
+def is_due_soon(task, days_ahead, today=None):
+    if task.due:
+        return 0 <= task.due - (today or today_ordinal()) <= days_ahead
+    return False
+
+def color_for_task(task, today=None):
+    if task.completed:
+        return GREEN
+    if is_overdue(task, today):
+        return RED
+    if task.prio == PRIORITY_HIGH:
+        return YELLOW
+    return RESET
+
+def get_category_name(category_id, categories):
+    """
+    Retrieve the category name based on the category ID.
+    """
+    return categories.name(category_id)
+
+# Sort keys for display_tasks; sorting by category orders by the lowest category ID
+SORT_KEYS = {
+    "due_date": lambda t: t.due or NO_DUE_DATE,  # Tasks without a due date sort last
+    "priority": lambda t: t.prio,
+    "category": lambda t: t.cat_mask & -t.cat_mask or NO_CATEGORY_KEY,
+}
+
+
+def select_page(tasks, show_all=True, sort_by=None, offset=0, limit=None):
+    """
+    Return (page, total): tasks offset..offset+limit of the filtered and
+    sorted view, and how many tasks the view has. Sorting works on a view,
+    never on the caller's list, and only the first offset + limit tasks
+    are ordered when a limit is given.
+    """
+    with measure("filter"):
+        view = tasks if show_all else [task for task in tasks if not task.completed]
+    if not show_all:
+        record_filter(len(tasks), len(view))
+
+    total = len(view)
+    end = None if limit is None else offset + limit
+    with measure("sort"):
+        key = SORT_KEYS.get(sort_by)
+        if key is not None:
+            view = heapq.nsmallest(end, view, key=key) if end is not None and end < total else sorted(view, key=key)
+        return view[offset:end], total
+
+
+def display_tasks(tasks, show_all=True, sort_by=None, offset=0, limit=None):
+    """
+    Print one page of tasks (see select_page), numbered by their stable IDs,
+    with a single write.
+    """
+    page, total = select_page(tasks, show_all, sort_by, offset, limit)
+    print_page(page, total, offset, limit)
+
+
+def print_page(page, total, offset=0, limit=None):
+    end = None if limit is None else offset + limit
+    if not page:
+        print("No tasks found.")
+        return
+
+    with measure("render"):
+        lines = ["\nTo-Do List:\n"]
+        category_names = {}  # Built once per distinct set of categories on the page
+        for task in page:
+            status = "[Done]" if task.completed else "[ ]"
+            due_date = f"(Due: {task.due_date})" if task.due else ""
+            priority = f"(Priority: {task.priority})"
+            # Display category names based on IDs
+            categories_str = ""
+            if task.cat_mask:
+                if task.cat_mask not in category_names:
+                    category_names[task.cat_mask] = f"(Categories: {', '.join(categories.names(task.cat_mask))})"
+                categories_str = category_names[task.cat_mask]
+            lines.append(f"{task.id}. {status} {task.title} {due_date} {priority} {categories_str}\n")
+        if end is not None and end < total:
+            lines.append(f"(Showing {offset + 1}-{end} of {total}; use --offset {end} for more)\n")
+        sys.stdout.write("".join(lines))
+
+
+def find_task_ids(tasks, choice):
+    """
+    Resolve comma separated task IDs to (ID, task) pairs; unknown IDs map to None.
+    """
+    by_id = {task.id: task for task in tasks}
+    return [(int(x), by_id.get(int(x))) for x in choice.split(",") if x.strip().isdigit()]
+
+
+def add_task(tasks, title=None, due_date=None, priority=None, recurring=None, categories=None, category_ids=None,
+             every=None, until=None):
+    while True:
+        if not title:
+            title = input("Enter a new task (max 60 characters): ").strip()
+
+        # Check if the task exceeds 60 characters
+        if len(title) > 60:
+            print(RED + "Error: Task description exceeds 60 characters. Please try again." + RESET)
+            title = None  # Reset title to force re-entry
+            continue
+
+        if not title:
+            print(RED + "Task cannot be empty. Please try again." + RESET)
+            continue
+
+        # Date validation
+        while True:
+            if due_date is None:
+                due_date = input("Enter due date (YYYY-MM-DD) or leave blank: ").strip()
+            if due_date:
+                parsed_date = parse_date(due_date)
+                if parsed_date is None:
+                    print(RED + "Error: Invalid date format. Please enter a valid date in YYYY-MM-DD format." + RESET)
+                    due_date = None  # Reset due_date to retry
+                    continue
+                if parsed_date < START_DATE:
+                    print(RED + f"Error: Date cannot be before 2025-01-01. Please try again." + RESET)
+                    due_date = None  # Reset due_date to retry
+                    continue
+                break  # Valid date
+            else:
+                break  # Allow blank due date
+
+        # Priority validation
+        allowed_priorities = ["High", "Medium", "Low", ""]
+        while priority not in allowed_priorities:
+            if priority is None:
+                priority = input("Enter priority (High/Medium/Low or leave blank): ").strip()
+            if priority not in allowed_priorities:
+                print(RED + "Error: Invalid priority. Please choose 'High', 'Medium', 'Low', or leave it blank." + RESET)
+                priority = None  # Force re-entry
+
+        # Recurring validation
+        allowed_recurring = ["daily", "weekly", "monthly", "yearly", ""]
+        while recurring not in allowed_recurring:
+            if recurring is None:
+                recurring = input("Enter recurring interval (daily/weekly/monthly/yearly or leave blank): ").strip()
+            if recurring not in allowed_recurring:
+                print(RED + "Error: Invalid recurring interval. Please choose 'daily', 'weekly', 'monthly', 'yearly', or leave it blank." + RESET)
+                recurring = None  # Force re-entry
+
+        # Interval and end date of the recurrence rule
+        if recurring:
+            while not (isinstance(every, int) and every > 0):
+                if every is None:
+                    every = input(f"Repeat every how many {RECURRING_UNITS[recurring]}? (default 1): ").strip() or "1"
+                every = int(every) if str(every).isdigit() else None
+                if not every:
+                    print(RED + "Error: Please enter a whole number of at least 1." + RESET)
+                    every = None  # Force re-entry
+            while True:
+                if until is None:
+                    until = input("Enter end date (YYYY-MM-DD) or leave blank to repeat forever: ").strip()
+                if until and (date_ordinal(until) is None or (due_date and until < due_date)):
+                    print(RED + "Error: Invalid end date. Use YYYY-MM-DD, not before the due date." + RESET)
+                    until = None  # Force re-entry
+                    continue
+                break
+
+        # Display categories and allow selection unless they were given up front
+        if category_ids is None:
+            display_categories(categories)
+            cat_input = input("Enter category IDs (comma separated) or leave blank: ").strip()
+            category_ids = [int(cat_id.strip()) for cat_id in cat_input.split(",") if cat_id.strip().isdigit()]
+
+        # Validate category IDs
+        selected_categories = [cat_id for cat_id in category_ids if cat_id in categories]
+
+        new_task = Task(title)
+        new_task.due_date = due_date
+        new_task.priority = priority or "Medium"  # Default to Medium
+        new_task.recurring = recurring or None  # Default to None
+        if new_task.rule:
+            new_task.rule.every = every
+            new_task.rule.until = date_ordinal(until) if until else 0
+        new_task.categories = selected_categories
+        assign_task_id(new_task)
+        tasks.append(new_task)
+        record_change("add", new_task)
+        print(GREEN + f"Task '{title}' added successfully." + RESET)
+        return tasks
+
+
+def remove_task(tasks):
+    display_tasks(tasks)
+    choice = input("\nEnter the task ID(s) to remove (e.g. '1' or '1,2,3'): ").strip()
+    if not choice:
+        return tasks
+    removed = set()
+    for task_id, task in find_task_ids(tasks, choice):
+        if task is None:
+            print(f"Invalid task ID: {task_id}")
+        elif task_id not in removed:
+            removed.add(task_id)
+            record_change("remove", task)
+            print(f"Task '{task.title}' removed.")
+    if removed:
+        tasks[:] = [task for task in tasks if task.id not in removed]
+    return tasks
+def is_valid_date(date_str):
+    """
+    Validate that the provided date is not before the START_DATE (01-01-2025).
+    """
+    ordinal = date_ordinal(date_str)
+    return ordinal is not None and ordinal >= START_DATE.toordinal()
+
+def edit_task(tasks):
+    display_tasks(tasks)
+    choice = input("\nEnter the task ID to edit: ").strip()
+    task = next((t for t in tasks if choice.isdigit() and t.id == int(choice)), None)
+    if task is None:
+        print(RED + "Invalid task ID." + RESET)
+        return tasks
+
+    print(f"Editing task '{task.title}'")
+    new_title = input("Enter updated title (leave blank to keep current): ").strip()
+    if new_title and len(new_title) > 60:
+        print(RED + "Error: Task description exceeds 60 characters. Update canceled." + RESET)
+        return tasks
+
+    new_due = input("Enter updated due date (YYYY-MM-DD) or blank to keep current: ").strip()
+    if new_due and not is_valid_date(new_due):
+        print(RED + f"Error: Date cannot be before {START_DATE.strftime('%Y-%m-%d')}. Update canceled." + RESET)
+        return tasks
+
+    new_priority = input("Enter updated priority (High/Medium/Low) or blank to keep current: ").strip()
+    if new_priority and new_priority not in PRIORITY_LEVELS:
+        print(RED + "Error: Invalid priority. Please choose 'High', 'Medium' or 'Low'. Update canceled." + RESET)
+        return tasks
+
+    # Apply the changes only once every field is valid
+    before = task.copy()
+    if new_title:
+        task.title = new_title
+    if new_due:
+        task.due_date = new_due
+    if new_priority:
+        task.priority = new_priority
+    record_change("update", task, before)
+
+    print(GREEN + f"Task '{task.title}' updated successfully." + RESET)
+    return tasks
+
+
+def toggle_task_status(tasks):
+    display_tasks(tasks)  # Display all tasks for user to choose from
+    choice = input("\nEnter the task ID(s) to toggle: ").strip()
+    if not choice:
+        return tasks
+
+    for task_id, task in find_task_ids(tasks, choice):
+        if task is None:
+            print(f"Invalid task ID: {task_id}")
+        else:
+            toggle_task(tasks, task)
+    return tasks
+
+def toggle_task(tasks, task):
+    before = task.copy()
+    if task.completed:
+        # Mark as incomplete and remove timestamp
+        task.completed = False
+        task.done_at = 0
+        if task.rule:
+            # The last occurrence is pending again
+            task.rule.record(task.due, done=False)
+        record_change("update", task, before)
+        print(f"Task '{task.title}' marked as incomplete.")
+    elif task.rule and task.due:
+        # Recurring tasks stay one task: the occurrence is recorded and due moves on
+        done_day = task.due_date
+        complete_occurrence(task)
+        record_change("update", task, before)
+        if task.completed:
+            print(f"Task '{task.title}' marked as complete. It was the last occurrence (due {done_day}).")
+        else:
+            print(f"Occurrence of '{task.title}' due {done_day} completed. Next due on {task.due_date}.")
+    else:
+        # Mark as complete and set timestamp
+        task.mark_complete()
+        record_change("update", task, before)
+        print(f"Task '{task.title}' marked as complete. Completion time: {task.completion_timestamp}")
+
+# Recurrence steps: in days for daily/weekly, in months for monthly/yearly
+DAY_STEPS = {"daily": 1, "weekly": 7}
+RECURRING_UNITS = {"daily": "days", "weekly": "weeks", "monthly": "months", "yearly": "years"}
+MONTH_STEPS = {"monthly": 1, "yearly": 12}
+# Day ordinal of 1970-01-01, where NumPy's datetime64[D] counts from
+NUMPY_EPOCH = 719163
+
+
+def add_months(ordinal, months):
+    """
+    Move a day ordinal by whole months, clamping to the end of shorter
+    months (Jan 31 + 1 month is Feb 28 or 29).
+    """
+    import calendar
+    date = datetime.date.fromordinal(ordinal)
+    year, month = divmod(date.year * 12 + date.month - 1 + months, 12)
+    day = min(date.day, calendar.monthrange(year, month + 1)[1])
+    return datetime.date(year, month + 1, day).toordinal()
+
+
+def occurrence_on_or_after(start, recurring, every, day):
+    """
+    First day of the series start, start + every units, ... that is on or
+    after day. Months are counted from start so day-of-month never drifts.
+    """
+    if day <= start:
+        return start
+    if recurring in DAY_STEPS:
+        step = DAY_STEPS[recurring] * every
+        return start + -(-(day - start) // step) * step
+    step = MONTH_STEPS[recurring] * every
+    first, target = datetime.date.fromordinal(start), datetime.date.fromordinal(day)
+    k = -(-((target.year - first.year) * 12 + target.month - first.month) // step)
+    occurrence = add_months(start, k * step)
+    return occurrence if occurrence >= day else add_months(start, (k + 1) * step)
+
+
+def next_occurrence(task, day):
+    """
+    The task's first pending occurrence on or after day, or 0 once its rule
+    has run out.
+    """
+    rule = task.rule
+    start = rule.start or task.due
+    occurrence = occurrence_on_or_after(start, task.recurring, rule.every, max(day, task.due))
+    while rule.done_on(occurrence):
+        occurrence = occurrence_on_or_after(start, task.recurring, rule.every, occurrence + 1)
+    if rule.until and occurrence > rule.until:
+        return 0
+    return occurrence
+
+
+def next_occurrences(tasks, day):
+    """
+    next_occurrence(task, day) for many recurring tasks at once, computed
+    column-wise with NumPy when it is installed.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [next_occurrence(task, day) for task in tasks]
+    n = len(tasks)
+    dues = np.fromiter((task.due for task in tasks), np.int64, n)
+    starts = np.fromiter((task.rule.start or task.due for task in tasks), np.int64, n)
+    every = np.fromiter((task.rule.every for task in tasks), np.int64, n)
+    until = np.fromiter((task.rule.until for task in tasks), np.int64, n)
+    names = [task.recurring for task in tasks]
+    day_step = np.fromiter((DAY_STEPS.get(name, 0) for name in names), np.int64, n) * every
+    month_step = np.fromiter((MONTH_STEPS.get(name, 0) for name in names), np.int64, n) * every
+    after = np.maximum(dues, day)
+
+    # Daily and weekly: a whole number of steps past start
+    step = np.maximum(day_step, 1)
+    by_days = starts + np.maximum(-(-(after - starts) // step), 0) * step
+
+    # Monthly and yearly: whole months past start's month, clamped to the month's length
+    start_days = (starts - NUMPY_EPOCH).astype("M8[D]")
+    start_months = start_days.astype("M8[M]")
+    day_of_month = (start_days - start_months.astype("M8[D]")).astype(np.int64)
+    month_gap = ((after - NUMPY_EPOCH).astype("M8[D]").astype("M8[M]") - start_months).astype(np.int64)
+    step = np.maximum(month_step, 1)
+    k = np.maximum(-(-month_gap // step), 0)
+
+    def nth_month(k):
+        months = start_months + (k * step).astype("m8[M]")
+        length = ((months + 1).astype("M8[D]") - months.astype("M8[D]")).astype(np.int64)
+        return (months.astype("M8[D]") - np.datetime64(0, "D")).astype(np.int64) + np.minimum(day_of_month, length - 1) + NUMPY_EPOCH
+
+    by_months = nth_month(k)
+    by_months = np.where(by_months < after, nth_month(k + 1), by_months)
+
+    result = np.where(day_step > 0, by_days, by_months)
+    result = np.where(after <= starts, starts, result)
+    result = np.where((until > 0) & (result > until), 0, result).tolist()
+    # Early completions are rare; step past them one task at a time
+    for i, task in enumerate(tasks):
+        if task.rule.exceptions and task.rule.done_on(result[i]):
+            result[i] = next_occurrence(task, result[i])
+    return result
+
+
+def complete_occurrence(task):
+    """
+    Mark the current occurrence of a recurring task done: it is recorded in
+    the rule's exceptions and due moves to the next pending occurrence, or
+    the task is completed after its last one.
+    """
+    rule = task.rule
+    if not rule.start:
+        rule.start = task.due
+    task.done_at = now_timestamp()
+    rule.record(task.due)
+    following = next_occurrence(task, task.due + 1)
+    if following:
+        task.due = following
+    else:
+        task.completed = True
+
+
+def occurrence_view(task, day):
+    # A read-only stand-in for one of a recurring task's later occurrences; it shares the rule
+    return Task(task.title, due=day, prio=task.prio, recur=task.recur, cat_mask=task.cat_mask, id=task.id,
+                rule=task.rule)
+
+
+def recurring_occurrences(tasks, first, last):
+    """
+    Occurrences of recurring tasks between two day ordinals, generated on
+    demand. The current occurrence of each task (its due date) is left out;
+    date queries already find it.
+    """
+    if tasks is None:
+        return []
+    rules = [task for task in tasks if task.rule and task.due and not task.completed]
+    found = []
+    for task, day in zip(rules, next_occurrences(rules, first)):
+        if day == task.due:
+            day = next_occurrence(task, day + 1)
+        if day and task.recurring in DAY_STEPS:
+            # Fixed-length steps: no need to search for each following occurrence
+            end = min(last, task.rule.until or last)
+            early = set(task.rule.done_after(task.due))
+            step = DAY_STEPS[task.recurring] * task.rule.every
+            found.extend(occurrence_view(task, d) for d in range(day, end + 1, step) if d not in early)
+            continue
+        while day and day <= last:
+            found.append(occurrence_view(task, day))
+            day = next_occurrence(task, day + 1)
+    return found
+
+
+def archive_completed_tasks(tasks):
+    """
+    Move completed tasks to the archive and return the rest. Callers hold
+    the storage lock until the removal is saved, so no other process can
+    archive the same tasks in between.
+    """
+    global loaded_signature
+    with measure("archive"), storage_lock():
+        sync_tasks(tasks)
+        completed = []
+        incompleted = []
+        for t in tasks:
+            if t.completed:
+                completed.append(t)
+                record_change("archive", t)
+            else:
+                incompleted.append(t)
+        if completed:
+            storage.append_archive(completed)
+            # Our own archive write is not another process's change
+            loaded_signature = storage_signature()
+            print("Completed tasks archived.")
+        return incompleted
+
+def display_completed_tasks(tasks):
+    print("\nCompleted Tasks:")
+    completed = [t for t in tasks if t.completed]
+    if not completed:
+        print("No completed tasks found.")
+    else:
+        for i, task in enumerate(completed, 1):
+            c = GREEN
+            title = task.title
+            timestamp = f" (Completed On: {task.completion_timestamp or 'N/A'})"
+            print(f"{c}{i}. {title}{timestamp}{RESET}")
+
+def storage_signature():
+    """
+    Size and modification time of every file the task list is stored in, used
+    to tell whether a persisted index still matches the data on disk.
+    """
+    signature = []
+    filenames = [TODO_FILE, JOURNAL_FILE, SQLITE_FILE, SQLITE_FILE + "-wal", NDJSON_FILE, BINARY_FILE,
+                 ARCHIVE_MANIFEST]
+    if os.path.isdir(SHARD_DIR):
+        filenames += sorted(os.path.join(SHARD_DIR, name) for name in os.listdir(SHARD_DIR))
+    for filename in filenames:
+        if os.path.exists(filename):
+            stat = os.stat(filename)
+            signature.append((filename, stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def title_trigrams(title):
+    title = title.lower()
+    return {title[i:i + 3] for i in range(len(title) - 2)}
+
+
+# Persisted trigram index: header, JSON metadata (storage signature, stale count, each gram
+# with its posting length), then task IDs (q), their title CRC32s (I) and all postings (i)
+SEARCH_INDEX_HEADER = struct.Struct("<4sHIQQ")
+SEARCH_INDEX_MAGIC = b"TDTG"
+SEARCH_INDEX_VERSION = 1
+
+
+class TrigramIndex:
+    """
+    Inverted index from lowercase title trigrams to task IDs. Posting lists
+    only ever grow; entries left behind by edits and removals are filtered
+    out when candidates are checked against the current title, and the
+    index is rebuilt once they outnumber the live tasks.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.tasks = {}
+        self.stale = 0
+        self.dirty = False
+
+    @classmethod
+    def build(cls, tasks):
+        index = cls()
+        for task in tasks:
+            index.add(task)
+        index.dirty = True
+        return index
+
+    def add(self, task):
+        self.tasks[task.id] = task
+        postings = self.postings
+        for gram in title_trigrams(task.title):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array("i")
+            posting.append(task.id)
+        self.dirty = True
+
+    def on_change(self, op, task, before=None):
+        if op in REMOVAL_OPS:
+            if self.tasks.pop(task.id, None) is not None:
+                self.stale += 1
+        elif op == "add" or task.id not in self.tasks:
+            self.add(task)
+        else:
+            # Re-index the current title; postings for the old one go stale
+            self.stale += 1
+            self.add(task)
+        if self.stale > max(len(self.tasks), 1000):
+            self.compact()
+
+    def search(self, query):
+        """
+        Return the tasks whose title contains query, in ID order.
+        """
+        query = query.lower()
+        grams = title_trigrams(query)
+        if not grams:
+            # Shorter than a trigram: nothing to intersect, check every title
+            matches = [t for _, t in sorted(self.tasks.items()) if query in t.title.lower()]
+            record_filter(len(self.tasks), len(matches))
+            return matches
+
+        postings = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if len(candidates) <= 64:
+                break  # Cheaper to verify the few left than to keep intersecting
+            candidates.intersection_update(posting)
+
+        matches = []
+        for task_id in sorted(candidates):
+            task = self.tasks.get(task_id)
+            if task is not None and query in task.title.lower():
+                matches.append(task)
+        record_filter(len(candidates), len(matches))
+        return matches
+
+    def estimate(self, query):
+        """
+        Upper bound on the titles search(query) checks: its rarest trigram's
+        posting list, or every task for queries shorter than a trigram.
+        """
+        grams = title_trigrams(query.lower())
+        if not grams:
+            return len(self.tasks)
+        return min(len(self.postings.get(gram, ())) for gram in grams)
+
+    def compact(self):
+        # Stale postings outnumber the live tasks: start over from the live titles
+        live = list(self.tasks.values())
+        self.postings, self.tasks, self.stale = {}, {}, 0
+        for task in live:
+            self.add(task)
+
+    def save(self, filename=SEARCH_INDEX_FILE):
+        grams = list(self.postings)
+        meta = json.dumps({"signature": storage_signature(), "stale": self.stale, "grams": grams,
+                           "lengths": [len(self.postings[gram]) for gram in grams]}).encode("utf-8")
+        ids = array("q", self.tasks)
+        titles = array("I", title_checksums(self.tasks.values()))
+        postings = b"".join(self.postings[gram].tobytes() for gram in grams)
+        header = SEARCH_INDEX_HEADER.pack(SEARCH_INDEX_MAGIC, SEARCH_INDEX_VERSION, len(meta), len(ids),
+                                          len(postings) // 4)
+        write_durably(filename, b"".join((header, meta, ids.tobytes(), titles.tobytes(), postings)), 'wb', fsync=False)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, tasks, filename=SEARCH_INDEX_FILE):
+        """
+        Load the persisted index, or return None if there is none. If the
+        data on disk changed since it was written, only the tasks whose
+        title checksum differs (or that were added or removed) are updated.
+        """
+        if not os.path.exists(filename):
+            return None
+        try:
+            with open(filename, 'rb') as f:
+                data = f.read()
+            magic, version, meta_size, count, entries = SEARCH_INDEX_HEADER.unpack_from(data)
+            if magic != SEARCH_INDEX_MAGIC or version != SEARCH_INDEX_VERSION:
+                return None
+            offset = SEARCH_INDEX_HEADER.size
+            meta = json.loads(data[offset:offset + meta_size])
+            offset += meta_size
+            ids, titles, postings = array("q"), array("I"), array("i")
+            for column, length in ((ids, count), (titles, count), (postings, entries)):
+                column.frombytes(data[offset:offset + length * column.itemsize])
+                offset += length * column.itemsize
+        except (OSError, ValueError, struct.error):
+            return None
+        if len(postings) != entries or sum(meta["lengths"]) != entries:
+            return None  # Truncated
+        index = cls()
+        position = 0
+        for gram, length in zip(meta["grams"], meta["lengths"]):
+            index.postings[gram] = postings[position:position + length]
+            position += length
+        index.stale = meta["stale"]
+        # JSON turns the signature tuples into lists
+        if meta["signature"] == [list(entry) for entry in storage_signature()]:
+            index.tasks = {t.id: t for t in tasks}
+            # In-memory changes that have not been saved yet are not in the file
+            for entry in pending_changes:
+                if entry["op"] == "remove":
+                    index.tasks.pop(entry["id"], None)
+                else:
+                    index.on_change(entry["op"], entry["task"])
+            return index
+        # Another process saved since: re-index just the titles that differ
+        stored = dict(zip(ids, titles))
+        for task, checksum in zip(tasks, title_checksums(tasks)):
+            known = stored.pop(task.id, None)
+            if known == checksum:
+                index.tasks[task.id] = task
+            else:
+                index.stale += known is not None
+                index.add(task)
+        index.stale += len(stored)
+        if stored:
+            index.dirty = True
+        if index.stale > max(len(index.tasks), 1000):
+            index.compact()
+        return index
+
+
+def title_checksums(tasks):
+    import zlib
+    return [zlib.crc32(task.title.encode("utf-8")) for task in tasks]
+
+
+search_index = None
+
+
+def get_search_index(tasks):
+    """
+    Load or build the title index on first use and keep it updated from
+    then on.
+    """
+    global search_index
+    if search_index is None:
+        search_index = TrigramIndex.load(tasks) or TrigramIndex.build(tasks)
+        change_listeners.append(search_index.on_change)
+        atexit.register(save_search_index)
+    return search_index
+
+
+def save_search_index():
+    # Only persist when memory matches disk, otherwise the signature would lie
+    if search_index is not None and search_index.dirty and not pending_changes:
+        search_index.save()
+
+
+# Due-date index keys pack (due ordinal, task ID) into one sortable int
+DUE_KEY_SHIFT = 32
+DUE_KEY_ID_MASK = (1 << DUE_KEY_SHIFT) - 1
+# Up to this many buffered due-index changes are merged one by one; more rebuild the array
+DUE_INDEX_MERGE_SINGLE = 16
+
+
+class DueDateIndex:
+    """
+    Incomplete tasks with a due date, kept sorted by (due date, ID) in a
+    compact int array so day, range and overdue lookups are a bisect plus
+    a slice.
+    """
+
+    def __init__(self):
+        self.keys = array("q")
+        self.key_by_id = {}
+        self.tasks = {}
+        # Changes not yet merged into keys, applied on the next lookup
+        self.added = set()
+        self.removed = set()
+
+    @classmethod
+    def build(cls, tasks):
+        index = cls()
+        keys = []
+        for task in tasks:
+            if task.due and not task.completed:
+                key = task.due << DUE_KEY_SHIFT | task.id
+                keys.append(key)
+                index.key_by_id[task.id] = key
+                index.tasks[task.id] = task
+        keys.sort()
+        index.keys = array("q", keys)
+        return index
+
+    def on_change(self, op, task, before=None):
+        # Inserting into or deleting from the array shifts everything after
+        # the key, so changes are only buffered here and merged in one pass
+        key = self.key_by_id.pop(task.id, None)
+        if key is not None:
+            del self.tasks[task.id]
+            if key in self.added:
+                self.added.discard(key)
+            else:
+                self.removed.add(key)
+        if op not in REMOVAL_OPS and task.due and not task.completed:
+            key = task.due << DUE_KEY_SHIFT | task.id
+            if key in self.removed:
+                self.removed.discard(key)
+            else:
+                self.added.add(key)
+            self.key_by_id[task.id] = key
+            self.tasks[task.id] = task
+
+    def merge(self):
+        """
+        Apply the buffered changes to keys: one at a time when there are
+        only a few, otherwise by rebuilding the array in a single sort.
+        """
+        if len(self.added) + len(self.removed) <= DUE_INDEX_MERGE_SINGLE:
+            for key in self.removed:
+                del self.keys[bisect.bisect_left(self.keys, key)]
+            for key in self.added:
+                self.keys.insert(bisect.bisect_left(self.keys, key), key)
+        else:
+            removed = self.removed
+            keys = [key for key in self.keys if key not in removed] if removed else self.keys.tolist()
+            keys.extend(sorted(self.added))
+            # Two sorted runs, which the sort merges in linear time
+            keys.sort()
+            self.keys = array("q", keys)
+        self.added.clear()
+        self.removed.clear()
+
+    def _slice(self, start, end):
+        # Tasks due on days start..end inclusive
+        if self.added or self.removed:
+            self.merge()
+        lo = bisect.bisect_left(self.keys, start << DUE_KEY_SHIFT)
+        hi = bisect.bisect_left(self.keys, (end + 1) << DUE_KEY_SHIFT)
+        return lo, hi
+
+    def range(self, start, end):
+        lo, hi = self._slice(start, end)
+        record_filter(hi - lo, hi - lo)
+        return [self.tasks[key & DUE_KEY_ID_MASK] for key in self.keys[lo:hi]]
+
+    def on(self, day):
+        return self.range(day, day)
+
+    def before(self, day):
+        return self.range(1, day - 1)
+
+    def count(self, start, end):
+        lo, hi = self._slice(start, end)
+        return hi - lo
+
+    def count_before(self, day):
+        return self.count(1, day - 1)
+
+
+due_index = None
+
+
+def get_due_index(tasks):
+    """
+    Build the due-date index on first use and keep it updated from then on.
+    """
+    global due_index
+    if due_index is None:
+        due_index = DueDateIndex.build(tasks)
+        change_listeners.append(due_index.on_change)
+    return due_index
+
+
+def bitmap_ids(bitmap):
+    """
+    Yield the positions of the set bits of an int bitset in ascending order.
+    """
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for byte_index, byte in enumerate(data):
+        if byte:
+            base = byte_index * 8
+            for bit in range(8):
+                if byte >> bit & 1:
+                    yield base + bit
+
+
+def ids_to_bitmap(ids):
+    ids = list(ids)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for task_id in ids:
+        data[task_id >> 3] |= 1 << (task_id & 7)
+    return int.from_bytes(data, "little")
+
+
+class CategoryRegistry:
+    """
+    The category table keyed by ID, with a name lookup and, once indexed,
+    one bitset per category whose set bits are the IDs of its tasks.
+    Multi-category filters are then ANDs, ORs and NOTs of those bitsets.
+    """
+
+    def __init__(self, rows):
+        self.rows = {}
+        self.by_name = {}
+        for row in rows:
+            self.register(row)
+        self.bitmaps = {}
+        self.all_tasks = 0
+        self.masks = {}
+        self.tasks = {}
+        self.indexed = False
+
+    def register(self, row):
+        cat_id, name, description = row
+        self.rows[cat_id] = [cat_id, name, description]
+        self.by_name[name.lower()] = cat_id
+
+    def __iter__(self):
+        return iter(sorted(self.rows.values()))
+
+    def __contains__(self, cat_id):
+        return cat_id in self.rows
+
+    def rows_list(self):
+        return list(self)
+
+    def name(self, cat_id):
+        row = self.rows.get(cat_id)
+        return row[1] if row else "Unknown"
+
+    def names(self, mask):
+        rows = self.rows
+        return [rows[cat_id][1] for cat_id in range(mask.bit_length()) if mask >> cat_id & 1 and cat_id in rows]
+
+    def lookup(self, token):
+        """
+        Resolve a category ID or (case-insensitive) name to its ID.
+        """
+        if token.isdigit():
+            return int(token) if int(token) in self.rows else None
+        return self.by_name.get(token.lower())
+
+    def add(self, name, description):
+        next_id = max(self.rows, default=0) + 1  # Generate the next ID
+        self.register([next_id, name, description])
+        return next_id
+
+    def index(self, tasks):
+        members = {}
+        for task in tasks:
+            self.tasks[task.id] = task
+            self.masks[task.id] = task.cat_mask
+            mask = task.cat_mask
+            while mask:
+                low = mask & -mask
+                members.setdefault(low.bit_length() - 1, []).append(task.id)
+                mask ^= low
+        self.bitmaps = {cat_id: ids_to_bitmap(ids) for cat_id, ids in members.items()}
+        self.all_tasks = ids_to_bitmap(self.tasks)
+        self.indexed = True
+
+    def on_change(self, op, task, before=None):
+        old_mask = self.masks.pop(task.id, 0)
+        bit = 1 << task.id
+        for cat_id in range(old_mask.bit_length()):
+            if old_mask >> cat_id & 1:
+                self.bitmaps[cat_id] &= ~bit
+        if op in REMOVAL_OPS:
+            self.tasks.pop(task.id, None)
+            self.all_tasks &= ~bit
+            return
+        self.tasks[task.id] = task
+        self.masks[task.id] = task.cat_mask
+        self.all_tasks |= bit
+        for cat_id in range(task.cat_mask.bit_length()):
+            if task.cat_mask >> cat_id & 1:
+                self.bitmaps[cat_id] = self.bitmaps.get(cat_id, 0) | bit
+
+    def select(self, any_of=(), all_of=(), none_of=()):
+        """
+        Tasks in any of any_of, in all of all_of and in none of none_of, in ID order.
+        """
+        result = self.select_bitmap(any_of, all_of, none_of)
+        found = [self.tasks[task_id] for task_id in bitmap_ids(result)]
+        # Bitset operations only ever touch the matching tasks
+        record_filter(len(found), len(found))
+        return found
+
+    def select_bitmap(self, any_of=(), all_of=(), none_of=()):
+        # The IDs select() returns, as a bitset; its bit_count() is the result size
+        result = self.all_tasks
+        if any_of:
+            union = 0
+            for cat_id in any_of:
+                union |= self.bitmaps.get(cat_id, 0)
+            result &= union
+        for cat_id in all_of:
+            result &= self.bitmaps.get(cat_id, 0)
+        for cat_id in none_of:
+            result &= ~self.bitmaps.get(cat_id, 0)
+        return result
+
+
+categories = CategoryRegistry(DEFAULT_CATEGORIES)
+
+
+def get_category_index(tasks):
+    """
+    Build the per-category task bitsets on first use and keep them updated.
+    """
+    if not categories.indexed:
+        categories.index(tasks)
+        change_listeners.append(categories.on_change)
+    return categories
+
+
+def find_tasks(tasks, query):
+    with measure("filter"):
+        return get_search_index(tasks).search(query)
+
+
+def search_tasks(tasks):
+    """
+    Search for tasks by title.
+    """
+    query = input("Enter search query: ").strip().lower()
+    if not query:
+        print("Search query cannot be empty.")
+        return
+
+    # Tasks that contain the query in their title
+    matching_tasks = find_tasks(tasks, query)
+
+    if not matching_tasks:
+        print(RED + "No tasks match your search query." + RESET)
+    else:
+        print(GREEN + "Search Results:" + RESET)
+        display_tasks(matching_tasks, show_all=True)  # Pass filtered tasks
+
+
+def display_categories(categories):
+    print("\nCategories:")
+    for category in categories:
+        print(f"ID: {category[0]} | Name: {category[1]} | Description: {category[2]}")
+def add_category(categories):
+    name = input("Enter category name: ").strip()
+    if not name:
+        print("Category name cannot be empty.")
+        return categories
+    if categories.lookup(name) is not None:
+        print(f"Category '{name}' already exists.")
+        return categories
+    description = input("Enter category description: ").strip()
+    next_id = categories.add(name, description)
+    storage.save_categories(categories.rows_list())
+    print(f"Category '{name}' added successfully with ID {next_id}.")
+    return categories
+
+
+def parse_category_filter(categories, text):
+    """
+    Split a comma separated filter into (any_of, all_of, none_of) category
+    ID lists. Plain entries match any, "+" entries are required and "-"
+    entries are excluded. Entries can be IDs or names.
+    """
+    groups = {"": [], "+": [], "-": []}
+    for token in text.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        prefix = token[0] if token[0] in "+-" else ""
+        cat_id = categories.lookup(token[len(prefix):].strip())
+        if cat_id is None:
+            print(YELLOW + f"Warning: Unknown category '{token}' ignored." + RESET)
+            continue
+        groups[prefix].append(cat_id)
+    return groups[""], groups["+"], groups["-"]
+
+def filter_tasks_by_multiple_categories(tasks, categories):
+    """
+    Filter tasks by multiple categories.
+    """
+    display_categories(categories)  # Show all categories
+    cat_ids_input = input("Enter category IDs (comma separated, +ID to require, -ID to exclude) to filter tasks: ").strip()
+
+    if not cat_ids_input:
+        print("No categories selected. Returning to main menu.")
+        return
+
+    any_of, all_of, none_of = parse_category_filter(categories, cat_ids_input)
+    if not (any_of or all_of or none_of):
+        print("Invalid input. Please enter valid category IDs.")
+        return
+
+    # Plain IDs match any of them, +IDs must all match, -IDs must not match
+    filtered_tasks = get_category_index(tasks).select(any_of, all_of, none_of)
+
+    if not filtered_tasks:
+        print(RED + "No tasks found for the selected categories." + RESET)
+    else:
+        print(GREEN + "Filtered tasks:" + RESET)
+        display_tasks(filtered_tasks, show_all=True)  # Removed `categories` argument
+
+
+def view_tasks_by_day(tasks):
+    """
+    Display tasks for a specific day.
+    """
+    date_str = input("Enter the date (YYYY-MM-DD) to view tasks for that day: ").strip()
+    selected_date = parse_date(date_str)
+    if selected_date is None:
+        print(RED + "Error: Invalid date format. Please enter a date in YYYY-MM-DD format." + RESET)
+        return
+    # Filter tasks for the selected date
+    day = selected_date.toordinal()
+    tasks_for_day = storage.tasks_due_on(tasks, date_str) + recurring_occurrences(tasks, day, day)
+
+    if not tasks_for_day:
+        print(GREEN + f"No tasks scheduled for {selected_date}." + RESET)
+    else:
+        print(BLUE + f"Tasks scheduled for {selected_date}:" + RESET)
+        display_tasks(tasks_for_day, show_all=True)
+
+
+
+def show_tasks_due_between(tasks, start_str, end_str):
+    """
+    Display incomplete tasks due between two dates (inclusive).
+    """
+    start, end = parse_date(start_str), parse_date(end_str)
+    if start is None or end is None:
+        print(RED + "Error: Invalid date format. Please enter dates in YYYY-MM-DD format." + RESET)
+        return
+    due_tasks = storage.tasks_due_between(tasks, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+    due_tasks += recurring_occurrences(tasks, start.toordinal(), end.toordinal())
+    due_tasks.sort(key=lambda t: t.due)
+    if not due_tasks:
+        print(GREEN + f"No tasks due between {start} and {end}." + RESET)
+    else:
+        print(BLUE + f"Tasks due between {start} and {end}:" + RESET)
+        display_tasks(due_tasks, show_all=True)
+
+
+def toggle_view_incomplete(tasks):
+    display_tasks(tasks, show_all=False)
+
+# --where query language: comparisons joined with and/or/not and parentheses, e.g.
+#   priority=High and due<2025-03-01 and cat in (Work,Learning) and title~"report"
+QUERY_TOKEN = r'\s*(?:("(?:[^"\\]|\\.)*")|(<=|>=|!=|[=<>~(),])|([^\s()=<>!~,"]+))'
+QUERY_COMPARISONS = ("=", "!=", "<", "<=", ">", ">=")
+# The operators each field takes
+QUERY_FIELDS = {
+    "title": ("=", "!=", "~"),
+    "priority": QUERY_COMPARISONS + ("in",),
+    "due": QUERY_COMPARISONS,
+    "status": ("=", "!="),
+    "recurring": ("=", "!=", "in"),
+    "cat": ("=", "!=", "in"),
+    "id": QUERY_COMPARISONS + ("in",),
+}
+QUERY_ALIASES = {"category": "cat", "prio": "priority", "due_date": "due"}
+QUERY_COMPARE = {"=": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le, ">": operator.gt,
+                 ">=": operator.ge}
+# Priority levels count down (High is 0), so "priority>Low" compares the levels the other way round
+QUERY_REVERSED = {"=": "=", "!=": "!=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+
+def tokenize_query(text):
+    import re
+    pattern = re.compile(QUERY_TOKEN)
+    text = text.strip()
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = pattern.match(text, pos)
+        if not match:
+            raise ValueError(f"Unexpected character '{text[pos:].lstrip()[0]}' in query.")
+        quoted, op, word = match.groups()
+        if quoted is not None:
+            try:
+                tokens.append(("str", json.loads(quoted)))
+            except ValueError:
+                raise ValueError(f"Invalid string {quoted} in query.")
+        elif op is not None:
+            tokens.append(("op", op))
+        else:
+            tokens.append(("word", word))
+        pos = match.end()
+    return tokens
+
+
+class QueryParser:
+    """
+    Recursive descent parser for --where expressions. parse() returns a
+    tree of ("or", nodes), ("and", nodes), ("not", node) and
+    ("cmp", field, op, value) tuples, with values already converted to
+    what the Task fields hold (day ordinals, level indexes, category IDs).
+    """
+
+    def __init__(self, text, categories):
+        self.tokens = tokenize_query(text)
+        self.pos = 0
+        self.categories = categories
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def near(self):
+        kind, value = self.peek()
+        return " at the end of the query" if kind is None else f" near '{value}'"
+
+    def keyword(self, word):
+        kind, value = self.peek()
+        if kind == "word" and value.lower() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, op):
+        if self.peek() != ("op", op):
+            raise ValueError(f"Expected '{op}'{self.near()}.")
+        self.pos += 1
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("The query is empty.")
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise ValueError(f"Expected 'and' or 'or'{self.near()}.")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.keyword("or"):
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = []
+        while True:
+            node = self.parse_not()
+            # Nested conjunctions are flattened so the planner sees every term
+            nodes.extend(node[1] if node[0] == "and" else [node])
+            if not self.keyword("and"):
+                break
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.keyword("not"):
+            return ("not", self.parse_not())
+        if self.peek() == ("op", "("):
+            self.pos += 1
+            node = self.parse_or()
+            self.expect(")")
+            return node
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        kind, name = self.peek()
+        if kind != "word":
+            raise ValueError(f"Expected a field name{self.near()}.")
+        self.pos += 1
+        field = QUERY_ALIASES.get(name.lower(), name.lower())
+        if field not in QUERY_FIELDS:
+            raise ValueError(f"Unknown field '{name}'. Fields: {', '.join(QUERY_FIELDS)}.")
+        if self.keyword("in"):
+            op = "in"
+            self.expect("(")
+            raw = [self.value()]
+            while self.peek() == ("op", ","):
+                self.pos += 1
+                raw.append(self.value())
+            self.expect(")")
+        else:
+            kind, op = self.peek()
+            if kind != "op" or op not in QUERY_COMPARISONS + ("~",):
+                raise ValueError(f"Expected an operator after '{name}'{self.near()}.")
+            self.pos += 1
+            raw = self.value()
+        if op not in QUERY_FIELDS[field]:
+            raise ValueError(f"'{field}' does not support '{op}'; use {', '.join(QUERY_FIELDS[field])}.")
+        value = [self.convert(field, item) for item in raw] if op == "in" else self.convert(field, raw)
+        if field in ("due", "cat") and op not in ("=", "!=") and (value == 0 if field == "due" else None in value):
+            raise ValueError(f"'{field}' can only be compared to none with = or !=.")
+        return ("cmp", field, op, value)
+
+    def value(self):
+        kind, value = self.peek()
+        if kind not in ("word", "str"):
+            raise ValueError(f"Expected a value{self.near()}.")
+        self.pos += 1
+        return value
+
+    def convert(self, field, raw):
+        text = raw.lower()
+        if field == "title":
+            return raw
+        if field == "due":
+            if text in ("none", "today"):
+                return today_ordinal() if text == "today" else 0
+            day = parse_date(raw)
+            if day is None:
+                raise ValueError(f"Invalid date '{raw}'. Use YYYY-MM-DD, today or none.")
+            return day.toordinal()
+        if field == "priority":
+            if raw.capitalize() not in PRIORITY_LEVELS:
+                raise ValueError(f"Invalid priority '{raw}'. Use {', '.join(PRIORITY_NAMES)}.")
+            return PRIORITY_LEVELS[raw.capitalize()]
+        if field == "status":
+            if text not in ("pending", "completed"):
+                raise ValueError(f"Invalid status '{raw}'. Use pending or completed.")
+            return text == "completed"
+        if field == "recurring":
+            if text != "none" and text not in RECURRING_LEVELS:
+                raise ValueError(f"Invalid recurring interval '{raw}'. Use none, daily, weekly, monthly or yearly.")
+            return RECURRING_LEVELS.get(text, 0)
+        if field == "cat":
+            if text == "none":
+                return None
+            cat_id = self.categories.lookup(raw)
+            if cat_id is None:
+                raise ValueError(f"Unknown category '{raw}'.")
+            return cat_id
+        if not raw.isdigit():
+            raise ValueError(f"Invalid task ID '{raw}'.")
+        return int(raw)
+
+
+def describe_query(node):
+    """
+    The query text for a (sub)tree, with values as the user would write them.
+    """
+    kind = node[0]
+    if kind == "and":
+        return " and ".join(describe_query(n) for n in node[1])
+    if kind == "or":
+        return "(" + " or ".join(describe_query(n) for n in node[1]) + ")"
+    if kind == "not":
+        return "not " + describe_query(node[1])
+    _, field, op, value = node
+    show = {
+        "title": json.dumps,
+        "due": lambda day: date_string(day) if day else "none",
+        "priority": lambda level: PRIORITY_NAMES[level],
+        "status": lambda done: "completed" if done else "pending",
+        "recurring": lambda level: RECURRING_NAMES[level] or "none",
+        "cat": lambda cat_id: "none" if cat_id is None else categories.name(cat_id),
+        "id": str,
+    }[field]
+    text = "(" + ", ".join(map(show, value)) + ")" if op == "in" else show(value)
+    return f"{field} {op} {text}"
+
+
+def chain_predicates(predicates, conjunction=True):
+    first = predicates[0]
+    if len(predicates) == 1:
+        return first
+    rest = chain_predicates(predicates[1:], conjunction)
+    if conjunction:
+        return lambda t: first(t) and rest(t)
+    return lambda t: first(t) or rest(t)
+
+
+def compile_query(node):
+    """
+    Turn a query tree into one predicate over Task objects, built from
+    closures over the slots so nothing is looked up by name per task.
+    """
+    kind = node[0]
+    if kind in ("and", "or"):
+        return chain_predicates([compile_query(n) for n in node[1]], kind == "and")
+    if kind == "not":
+        inner = compile_query(node[1])
+        return lambda t: not inner(t)
+
+    _, field, op, value = node
+    if op == "in":
+        if field == "cat":
+            mask = category_mask(value)
+            return lambda t: t.cat_mask & mask
+        values = frozenset(value)
+        attr = {"priority": "prio", "recurring": "recur", "id": "id"}[field]
+        return lambda t: getattr(t, attr) in values
+    compare = QUERY_COMPARE.get(op)
+    if field == "title":
+        query = value.lower()
+        if op == "~":
+            return lambda t: query in t.title.lower()
+        return lambda t: compare(t.title.lower(), query)
+    if field == "due":
+        if op in ("<", "<="):
+            # Tasks without a due date are not "before" anything
+            return lambda t: t.due and compare(t.due, value)
+        return lambda t: compare(t.due, value)
+    if field == "priority":
+        compare = QUERY_COMPARE[QUERY_REVERSED[op]]
+        return lambda t: compare(t.prio, value)
+    if field == "status":
+        return lambda t: compare(t.completed, value)
+    if field == "recurring":
+        return lambda t: compare(t.recur, value)
+    if field == "cat":
+        if value is None:
+            return (lambda t: not t.cat_mask) if op == "=" else (lambda t: t.cat_mask)
+        bit = 1 << value
+        return (lambda t: t.cat_mask & bit) if op == "=" else (lambda t: not t.cat_mask & bit)
+    return lambda t: compare(t.id, value)
+
+
+def plan_query(tasks, node):
+    """
+    Pick the access path for a query: the due-date index, the category
+    bitsets, the title trigram index or a full scan, whichever is expected
+    to hand the fewest rows to the predicate. Only the terms of a
+    top-level "and" can use an index. Returns the chosen path as
+    (name, covered terms, estimated rows, fetch), every path considered,
+    and notes on the indexes that could not be used.
+    """
+    terms = node[1] if node[0] == "and" else [node]
+    comparisons = [term for term in terms if term[0] == "cmp"]
+    paths = [("full scan", [], len(tasks), lambda: tasks)]
+    notes = []
+
+    due_terms = [term for term in comparisons if term[1] == "due" and term[3] and term[2] not in ("!=",)]
+    pending = next((term for term in comparisons if term[1] == "status" and (term[2] == "=") != term[3]), None)
+    if due_terms and pending is None:
+        notes.append(("due-date index", "needs status=pending; it only holds incomplete tasks"))
+    elif due_terms:
+        start, end = 1, datetime.date.max.toordinal()
+        for _, _, op, day in due_terms:
+            if op in ("=", ">=", ">"):
+                start = max(start, day + (op == ">"))
+            if op in ("=", "<=", "<"):
+                end = min(end, day - (op == "<"))
+        by_due = get_due_index(tasks)
+        paths.append(("due-date index", due_terms + [pending], max(by_due.count(start, end), 0),
+                      lambda: by_due.range(start, end) if start <= end else []))
+
+    cat_terms = [term for term in comparisons if term[1] == "cat" and term[3] is not None]
+    any_term = next((term for term in cat_terms if term[2] == "in"), None)
+    all_of = [term[3] for term in cat_terms if term[2] == "="]
+    none_of = [term[3] for term in cat_terms if term[2] == "!="]
+    if any_term or all_of:
+        registry = get_category_index(tasks)
+        any_of = any_term[3] if any_term else ()
+        covered = [term for term in cat_terms if term[2] != "in" or term is any_term]
+        paths.append(("category index", covered, registry.select_bitmap(any_of, all_of, none_of).bit_count(),
+                      lambda: registry.select(any_of, all_of, none_of)))
+
+    for term in comparisons:
+        if term[1] == "title" and term[2] == "~":
+            by_title = get_search_index(tasks)
+            paths.append(("title index", [term], by_title.estimate(term[3]),
+                          lambda query=term[3]: by_title.search(query)))
+
+    # Ties go to the earlier path, so an index has to beat the full scan outright
+    best = min(paths, key=lambda path: path[2])
+    return best, paths, notes
+
+
+def run_query(tasks, text):
+    """
+    Parse, plan and run a --where query. Returns (matches, plan) where plan
+    has what --explain shows; raises ValueError for an invalid query.
+    """
+    node = QueryParser(text, categories).parse()
+    with measure("filter"):
+        best, paths, notes = plan_query(tasks, node)
+        name, covered, _, fetch = best
+        terms = node[1] if node[0] == "and" else [node]
+        residual = [term for term in terms if not any(term is c for c in covered)]
+        candidates = fetch()
+        if residual:
+            predicate = compile_query(("and", residual) if len(residual) > 1 else residual[0])
+            matches = [task for task in candidates if predicate(task)]
+        else:
+            matches = list(candidates)
+        if name != "full scan":
+            # Every path returns the same order: task ID
+            matches.sort(key=lambda t: t.id)
+        record_filter(len(candidates), len(matches))
+    plan = {"path": best, "paths": paths, "notes": notes, "residual": residual, "scanned": len(candidates),
+            "matched": len(matches)}
+    return matches, plan
+
+
+def print_query_plan(plan):
+    name, covered, _, _ = plan["path"]
+    print(BLUE + "Query plan:" + RESET)
+    print(f"  access: {name}" + (f" on {describe_query(('and', covered))}" if covered else ""))
+    if plan["residual"]:
+        print(f"  filter: {describe_query(('and', plan['residual']))}")
+    print("  paths considered (* chosen):")
+    for path_name, path_terms, estimate, _ in plan["paths"]:
+        terms = describe_query(("and", path_terms)) if path_terms else "every task"
+        chosen = "*" if path_name == name and path_terms == covered else " "
+        print(f"  {chosen} {path_name:<15} {estimate:>9} rows  {terms}")
+    for path_name, reason in plan["notes"]:
+        print(f"    {path_name:<15} not usable: {reason}")
+    print(f"  rows scanned: {plan['scanned']}, matched: {plan['matched']}")
+
+
+def show_query(tasks, text, sort_by=None, offset=0, limit=None, explain=False):
+    try:
+        matches, plan = run_query(tasks, text)
+    except ValueError as e:
+        print(RED + f"Error: {e}" + RESET)
+        return
+    if not matches:
+        print(RED + "No tasks match the query." + RESET)
+    else:
+        display_tasks(matches, show_all=True, sort_by=sort_by, offset=offset, limit=limit)
+    if explain:
+        print_query_plan(plan)
+
+
+# every, until, start and exceptions are a recurring task's rule (RULE_FIELDS)
+EXPORT_FIELDS = ["title", "completed", "due_date", "priority", "recurring", "categories", "completion_timestamp",
+                 "every", "until", "start", "exceptions"]
+EXPORT_FORMATS = {"csv": ".csv", "json": ".json", "ndjson": ".ndjson"}
+# Rows are serialized and written this many at a time
+EXPORT_CHUNK_ROWS = 2000
+
+
+def iter_export_rows(tasks, since=None, fields=None, include_archive=False):
+    """
+    Yield export rows one at a time: active tasks, then optionally the
+    archive. since keeps tasks due on or after that YYYY-MM-DD date and
+    fields picks and orders the columns.
+    """
+    fields = fields or EXPORT_FIELDS
+    sources = [(t.to_dict() for t in tasks)]
+    if include_archive:
+        sources.append(storage.iter_archive(since))
+    for source in sources:
+        for row in source:
+            if since and not (row.get("due_date") and row["due_date"] >= since):
+                continue
+            yield {field: row.get(field) for field in fields}
+
+
+def open_export_file(filename):
+    """
+    Open an export file for text writing, compressing by file extension
+    (.gz, or .zst when the zstandard package is installed).
+    """
+    import gzip
+    if filename.endswith(".gz"):
+        # Level 6 is several times faster than the default 9 for almost the same size
+        return gzip.open(filename, 'wt', compresslevel=6, newline='', encoding="utf-8")
+    if filename.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            print(RED + "Error: zstd compression needs the 'zstandard' package. Use .gz instead." + RESET)
+            return None
+        raw = open(filename, 'wb')
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding="utf-8", newline='')
+    return open(filename, 'w', newline='', encoding="utf-8")
+
+
+def chunked(rows, size=EXPORT_CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_csv_rows(f, rows, fields):
+    import csv
+    writer = csv.writer(f)
+    writer.writerow(fields)
+    for chunk in chunked(rows):
+        # Categories are written as "1;3" rather than a Python list repr
+        writer.writerows(
+            [";".join(map(str, value)) if isinstance(value, list) else value for value in row.values()]
+            for row in chunk
+        )
+
+
+def write_json_rows(f, rows, fields):
+    # One object per line inside the array so the document never has to be built in memory
+    f.write("[")
+    separator = "\n"
+    for chunk in chunked(rows):
+        f.write(separator + ",\n".join(json.dumps(row) for row in chunk))
+        separator = ",\n"
+    f.write("\n]\n")
+
+
+def write_ndjson_rows(f, rows, fields):
+    for chunk in chunked(rows):
+        f.write("".join(json.dumps(row) + "\n" for row in chunk))
+
+
+EXPORT_WRITERS = {"csv": write_csv_rows, "json": write_json_rows, "ndjson": write_ndjson_rows}
+
+
+def export_tasks(tasks, fmt, filename=None, since=None, fields=None, include_archive=False):
+    """
+    Stream tasks to a CSV, JSON or NDJSON file without building the whole
+    output in memory. Returns the number of rows written.
+    """
+    fmt = fmt.lower()
+    if fmt not in EXPORT_WRITERS:
+        print(RED + f"Error: Unknown export format '{fmt}'. Choose csv, json or ndjson." + RESET)
+        return 0
+    fields = fields or EXPORT_FIELDS
+    unknown = [field for field in fields if field not in EXPORT_FIELDS + ["id"]]
+    if unknown:
+        print(RED + f"Error: Unknown export field(s): {', '.join(unknown)}" + RESET)
+        return 0
+    filename = filename or "tasks_export" + EXPORT_FORMATS[fmt]
+
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    f = open_export_file(filename)
+    if f is None:
+        return 0
+    with measure("export"), f:
+        EXPORT_WRITERS[fmt](f, counted(iter_export_rows(tasks, since, fields, include_archive)), fields)
+    count_metric("bytes_written", file_size(filename))
+    print(f"Tasks exported to {filename}")
+    return count
+
+
+def export_tasks_to_csv(tasks, filename="tasks_export.csv"):
+    export_tasks(tasks, "csv", filename)
+
+def export_tasks_to_json(tasks, filename="tasks_export.json"):
+    export_tasks(tasks, "json", filename)
+
+def export_tasks_to_ndjson(tasks, filename="tasks_export.ndjson"):
+    export_tasks(tasks, "ndjson", filename)
+
+# Import rows are validated this many at a time
+IMPORT_BATCH_ROWS = EXPORT_CHUNK_ROWS
+# Only the first few bad rows are printed; the rest are counted
+IMPORT_MAX_ERRORS_SHOWN = 20
+IMPORT_READ_BYTES = 1 << 16
+TRUE_STRINGS = ("true", "1", "yes")
+
+
+def open_import_file(filename):
+    """
+    Open an import file for text reading, decompressing by file extension.
+    "-" reads from standard input.
+    """
+    import gzip
+    if filename == "-":
+        return sys.stdin
+    if filename.endswith(".gz"):
+        return gzip.open(filename, 'rt', newline='', encoding="utf-8")
+    if filename.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            print(RED + "Error: zstd decompression needs the 'zstandard' package." + RESET)
+            return None
+        raw = open(filename, 'rb')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw), encoding="utf-8", newline='')
+    return open(filename, 'r', newline='', encoding="utf-8")
+
+
+def import_format(filename):
+    # "-" (standard input) is read as NDJSON, one task per line
+    if filename == "-":
+        return "ndjson"
+    base = filename[:-3] if filename.endswith(".gz") else filename[:-4] if filename.endswith(".zst") else filename
+    extension = os.path.splitext(base)[1].lower()
+    return {".csv": "csv", ".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson"}.get(extension)
+
+
+def read_csv_rows(f):
+    """
+    Yield (row number, row dict) pairs from a CSV file with a header line,
+    such as the one the CSV export writes.
+    """
+    import csv
+    reader = csv.DictReader(f)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_json_rows(f):
+    """
+    Yield (row number, object) pairs from a JSON array, decoding one element
+    at a time so the document is never loaded whole.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(IMPORT_READ_BYTES).lstrip()
+    if not buffer.startswith("["):
+        yield 1, ValueError("expected a JSON array")
+        return
+    pos = 1
+    number = 0
+    while True:
+        # Skip whitespace and the separators between elements
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buffer):
+            buffer = f.read(IMPORT_READ_BYTES)
+            pos = 0
+            if not buffer:
+                yield number + 1, ValueError("unterminated JSON array")
+                return
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except ValueError as error:
+            more = f.read(IMPORT_READ_BYTES)
+            if not more:
+                yield number + 1, error
+                return
+            # The element is cut off at the end of the buffer; read on
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+        number += 1
+        yield number, value
+        pos = end
+        if pos > IMPORT_READ_BYTES:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def read_ndjson_rows(f):
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as error:
+            yield number, error
+
+
+IMPORT_READERS = {"csv": read_csv_rows, "json": read_json_rows, "ndjson": read_ndjson_rows}
+
+
+def parse_import_list(value):
+    """
+    Turn a list field (categories, exceptions) into a list of tokens: a
+    JSON list, "1;3" as the CSV export writes it, or the older "[5]" /
+    "[1, 3]" list repr.
+    """
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    value = (value or "").strip().strip("[]")
+    return [token.strip().strip("'\"") for token in value.replace(";", ",").split(",") if token.strip()]
+
+
+def import_row_task(row):
+    """
+    Validate one imported row and build its Task. Returns (task, None) or
+    (None, error message).
+    """
+    if not isinstance(row, dict):
+        return None, "expected an object"
+    title = (row.get("title") or "").strip()
+    if not title:
+        return None, "title is empty"
+    if len(title) > 60:
+        return None, "title exceeds 60 characters"
+
+    due_date = row.get("due_date") or ""
+    if due_date and not is_valid_date(due_date):
+        return None, f"invalid due date '{due_date}' (YYYY-MM-DD, not before {START_DATE.strftime('%Y-%m-%d')})"
+    priority = row.get("priority") or "Medium"
+    if priority not in PRIORITY_LEVELS:
+        return None, f"invalid priority '{priority}'"
+    recurring = row.get("recurring") or None
+    if recurring not in RECURRING_LEVELS:
+        return None, f"invalid recurring interval '{recurring}'"
+    every = str(row.get("every") or 1)
+    if not every.isdigit() or int(every) < 1:
+        return None, f"invalid repeat interval '{every}'"
+    until = row.get("until") or ""
+    if until and (date_ordinal(until) is None or until < due_date):
+        return None, f"invalid end date '{until}'"
+    start = row.get("start") or ""
+    if start and date_ordinal(start) is None:
+        return None, f"invalid start date '{start}'"
+    exceptions = parse_import_list(row.get("exceptions"))
+    bad = next((day for day in exceptions if date_ordinal(day) is None), None)
+    if bad is not None:
+        return None, f"invalid completed occurrence '{bad}'"
+
+    category_ids = []
+    for token in parse_import_list(row.get("categories")):
+        cat_id = categories.lookup(token)
+        if cat_id is None:
+            return None, f"unknown category '{token}'"
+        category_ids.append(cat_id)
+
+    completed = row.get("completed")
+    if isinstance(completed, str):
+        completed = completed.strip().lower() in TRUE_STRINGS
+    timestamp = row.get("completion_timestamp") or None
+    done_at = parse_timestamp(timestamp)
+    if timestamp and not done_at:
+        return None, f"invalid completion timestamp '{timestamp}'"
+
+    task = Task(title, completed=bool(completed), due=date_ordinal(due_date) if due_date else 0,
+                prio=PRIORITY_LEVELS[priority], recur=RECURRING_LEVELS[recurring],
+                cat_mask=category_mask(category_ids), done_at=done_at if completed else 0)
+    if task.rule:
+        task.rule.every = int(every)
+        task.rule.until = date_ordinal(until) if until else 0
+        task.rule.start = date_ordinal(start) if start else 0
+        task.rule.exceptions = tuple(sorted(set(map(date_ordinal, exceptions))))
+    return task, None
+
+
+def import_tasks(tasks, filename):
+    """
+    Stream tasks in from a CSV, JSON or NDJSON file (optionally .gz/.zst),
+    validating them a batch at a time. Bad rows are reported and skipped;
+    the good ones are saved together in a single write. Returns the number
+    of tasks imported.
+    """
+    fmt = import_format(filename)
+    if fmt is None:
+        print(RED + f"Error: Cannot tell the format of '{filename}'. Use a .csv, .json or .ndjson file." + RESET)
+        return 0
+    if filename != "-" and not os.path.exists(filename):
+        print(RED + f"Error: File '{filename}' not found." + RESET)
+        return 0
+    f = open_import_file(filename)
+    if f is None:
+        return 0
+
+    imported = []
+    errors = 0
+    count_metric("bytes_read", file_size(filename))
+    with measure("import"), f:
+        for batch in chunked(IMPORT_READERS[fmt](f), IMPORT_BATCH_ROWS):
+            for number, row in batch:
+                if isinstance(row, Exception):
+                    task, error = None, f"unreadable: {row}"
+                else:
+                    task, error = import_row_task(row)
+                if error:
+                    errors += 1
+                    if errors <= IMPORT_MAX_ERRORS_SHOWN:
+                        print(RED + f"Error: Row {number}: {error}" + RESET)
+                    continue
+                imported.append(task)
+
+    if errors > IMPORT_MAX_ERRORS_SHOWN:
+        print(RED + f"... and {errors - IMPORT_MAX_ERRORS_SHOWN} more invalid row(s)." + RESET)
+    if imported:
+        # Imported IDs are not kept; they could clash with existing tasks
+        for task in imported:
+            assign_task_id(task)
+            record_change("add", task)
+        tasks.extend(imported)
+        save_tasks(tasks)
+    print(GREEN + f"Imported {len(imported)} task(s) from {filename}." + RESET)
+    if errors:
+        print(RED + f"Skipped {errors} invalid row(s)." + RESET)
+    return len(imported)
+
+
+def show_report(tasks):
+    stats = get_task_stats(tasks)
+    today = today_ordinal()
+    print("Task Report:")
+    print(f"Total tasks: {stats.total}")
+    print(f"Completed tasks: {stats.completed}")
+    print(f"Overdue tasks: {stats.overdue_count(today)}")
+
+    print("\nBy priority: " + ", ".join(f"{name} {stats.by_priority[level]}" for level, name in enumerate(PRIORITY_NAMES)))
+    if stats.by_category:
+        print("By category: " + ", ".join(
+            f"{categories.name(cat_id)} {count}" for cat_id, count in sorted(stats.by_category.items()) if count))
+
+    print("\nCompleted per day (last 7 days):")
+    for day in range(today - 6, today + 1):
+        print(f"  {date_string(day)}: {stats.completions_by_day.get(day, 0)}")
+    print("Completed per week (last 8 weeks):")
+    weeks = stats.completions_by_week()
+    for week_start in range(today - today % 7 - 7 * 7, today + 1, 7):
+        # Ordinal weeks start on Sunday (ordinal 7 is a Sunday)
+        print(f"  week of {date_string(week_start)}: {weeks.get(week_start, 0)}")
+    if stats.completions_by_category:
+        print("Completed by category (including archive): " + ", ".join(
+            f"{categories.name(cat_id)} {count}" for cat_id, count in sorted(stats.completions_by_category.items()) if count))
+
+# Bumped when the counters change meaning, so older statistics files are rebuilt
+STATS_VERSION = 2
+
+
+def completion_days(task):
+    """
+    The days a task counts as completed on in the report: every recorded
+    occurrence of a recurring task (on its scheduled day), otherwise the
+    day it was completed.
+    """
+    if task.rule and task.rule.exceptions:
+        return task.rule.exceptions
+    if task.completed and task.done_at:
+        return (task.done_at // SECONDS_PER_DAY,)
+    return ()
+
+
+class TaskStats:
+    """
+    Report aggregates kept up to date per mutation instead of recomputed:
+    counts by status, priority and category, incomplete tasks per due day
+    (so the overdue count only moves when the date boundary does) and
+    completions per day and per category across active and archived tasks.
+    Updates match what build() computes from the same tasks.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.completed = 0
+        self.by_priority = [0] * len(PRIORITY_NAMES)
+        self.by_category = {}
+        self.open_by_due = {}
+        self.boundary = today_ordinal()
+        self.overdue = 0
+        self.completions_by_day = {}
+        self.completions_by_category = {}
+        self.dirty = False
+
+    @classmethod
+    def build(cls, tasks, archived):
+        stats = cls()
+        for task in tasks:
+            stats.count(task, 1)
+            stats.count_completion(completion_days(task), task.cat_mask, 1)
+        for row in archived:
+            stats.count_row(row)
+        stats.dirty = True
+        return stats
+
+    def count(self, task, sign):
+        self.total += sign
+        self.by_priority[task.prio] += sign
+        mask = task.cat_mask
+        while mask:
+            low = mask & -mask
+            cat_id = low.bit_length() - 1
+            self.by_category[cat_id] = self.by_category.get(cat_id, 0) + sign
+            mask ^= low
+        if task.completed:
+            self.completed += sign
+        elif task.due:
+            self.open_by_due[task.due] = self.open_by_due.get(task.due, 0) + sign
+            if task.due < self.boundary:
+                self.overdue += sign
+
+    def count_completion(self, days, cat_mask, sign):
+        if not days:
+            return
+        for day in days:
+            self.completions_by_day[day] = self.completions_by_day.get(day, 0) + sign
+        sign *= len(days)
+        while cat_mask:
+            low = cat_mask & -cat_mask
+            cat_id = low.bit_length() - 1
+            self.completions_by_category[cat_id] = self.completions_by_category.get(cat_id, 0) + sign
+            cat_mask ^= low
+
+    def count_row(self, row):
+        # An archived task dict
+        if row.get("exceptions"):
+            days = [day for day in map(date_ordinal, row["exceptions"]) if day]
+        elif row.get("completed"):
+            done_at = parse_timestamp(row.get("completion_timestamp"))
+            days = [done_at // SECONDS_PER_DAY] if done_at else []
+        else:
+            days = []
+        self.count_completion(days, category_mask(row.get("categories") or []), 1)
+
+    def on_change(self, op, task, before=None):
+        if op == "update" and before is not None:
+            self.count(before, -1)
+            self.count(task, 1)
+            old, new = completion_days(before), completion_days(task)
+            if before.cat_mask != task.cat_mask:
+                self.count_completion(old, before.cat_mask, -1)
+                self.count_completion(new, task.cat_mask, 1)
+            elif old != new:
+                # Completing one occurrence of a long series only touches that occurrence's day
+                old_set, new_set = set(old), set(new)
+                self.count_completion([day for day in old if day not in new_set], task.cat_mask, -1)
+                self.count_completion([day for day in new if day not in old_set], task.cat_mask, 1)
+        elif op in REMOVAL_OPS:
+            self.count(task, -1)
+            if op == "remove":
+                # Archived tasks keep counting towards completion history
+                self.count_completion(completion_days(task), task.cat_mask, -1)
+        else:
+            self.count(task, 1)
+            self.count_completion(completion_days(task), task.cat_mask, 1)
+        self.dirty = True
+
+    def merge(self, other):
+        """
+        Add another TaskStats' counts to this one, e.g. one shard's.
+        """
+        self.total += other.total
+        self.completed += other.completed
+        self.by_priority = [a + b for a, b in zip(self.by_priority, other.by_priority)]
+        for name in ("by_category", "open_by_due", "completions_by_day", "completions_by_category"):
+            mine = getattr(self, name)
+            for key, value in getattr(other, name).items():
+                mine[key] = mine.get(key, 0) + value
+        self.overdue = sum(n for due, n in self.open_by_due.items() if due < self.boundary)
+
+    def overdue_count(self, today):
+        """
+        Move the overdue boundary to today, touching only the due days that
+        were crossed since it was last moved.
+        """
+        if today > self.boundary:
+            if today - self.boundary > len(self.open_by_due):
+                self.overdue = sum(n for due, n in self.open_by_due.items() if due < today)
+            else:
+                self.overdue += sum(self.open_by_due.get(day, 0) for day in range(self.boundary, today))
+            self.boundary = today
+            self.dirty = True
+        elif today < self.boundary:
+            self.overdue = sum(n for due, n in self.open_by_due.items() if due < today)
+            self.boundary = today
+            self.dirty = True
+        return self.overdue
+
+    def completions_by_week(self):
+        weeks = {}
+        for day, count in self.completions_by_day.items():
+            week_start = day - day % 7
+            weeks[week_start] = weeks.get(week_start, 0) + count
+        return weeks
+
+    def save(self, filename=STATS_FILE):
+        data = {
+            "version": STATS_VERSION,
+            "signature": storage_signature(),
+            "total": self.total,
+            "completed": self.completed,
+            "by_priority": self.by_priority,
+            "by_category": self.by_category,
+            "open_by_due": self.open_by_due,
+            "boundary": self.boundary,
+            "overdue": self.overdue,
+            "completions_by_day": self.completions_by_day,
+            "completions_by_category": self.completions_by_category,
+        }
+        with open(filename, 'w') as f:
+            json.dump(data, f)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, filename=STATS_FILE):
+        """
+        Load persisted statistics if they were written for the data currently
+        on disk, otherwise return None.
+        """
+        if not os.path.exists(filename):
+            return None
+        try:
+            with open(filename, 'r') as f:
+                data = json.load(f)
+        except ValueError:
+            return None
+        # JSON turns the signature tuples into lists
+        if data.get("version") != STATS_VERSION or data.get("signature") != [list(entry) for entry in storage_signature()]:
+            return None
+        stats = cls()
+        stats.total = data["total"]
+        stats.completed = data["completed"]
+        stats.by_priority = data["by_priority"]
+        stats.boundary = data["boundary"]
+        stats.overdue = data["overdue"]
+        # JSON object keys are strings; the counters are keyed by ints
+        for name in ("by_category", "open_by_due", "completions_by_day", "completions_by_category"):
+            setattr(stats, name, {int(key): value for key, value in data[name].items()})
+        return stats
+
+
+task_stats = None
+
+
+def get_task_stats(tasks):
+    """
+    Load the persisted statistics, or build them with one pass over the
+    tasks and archive, and keep them updated from then on. Must be called
+    before the session's first mutation so no change is missed.
+    """
+    global task_stats
+    if task_stats is None:
+        task_stats = TaskStats.load() if not pending_changes else None
+        if task_stats is None:
+            task_stats = storage.build_stats(tasks)
+        change_listeners.append(task_stats.on_change)
+        atexit.register(save_task_stats)
+    return task_stats
+
+
+def save_task_stats():
+    # Only persist when memory matches disk, otherwise the signature would lie
+    if task_stats is not None and task_stats.dirty and not pending_changes:
+        task_stats.save()
+
+
+# Trend analytics (--analytics) over active and archived tasks
+ANALYTICS_WEEKS = 12
+ANALYTICS_FORMATS = ("table", "csv", "json")
+ANALYTICS_TABLE_ROWS = 20
+# Lateness in days (completion day - due day): below 0 is early, then on time, 1, 2-3, ...
+LATENESS_EDGES = [0, 1, 2, 4, 8, 15, 31]
+LATENESS_BUCKETS = ["early", "on time", "1 day", "2-3 days", "4-7 days", "8-14 days", "15-30 days", "over 30 days"]
+# Completion day of tasks that are still open, so they stay in the backlog forever
+NEVER = 1 << 40
+
+
+def analytics_columns(tasks, archived):
+    """
+    Due day, completion day, completed flag and category mask of every
+    active and archived task, one compact array per field. The masks are a
+    plain list of ints instead when some task is in category 64 or above.
+    """
+    columns = {"due": array("i"), "done": array("i"), "completed": array("b")}
+    due, done, completed = columns["due"], columns["done"], columns["completed"]
+    with measure("analytics columns"):
+        masks = []
+        for task in tasks:
+            due.append(task.due)
+            done.append(task.done_at // SECONDS_PER_DAY)
+            completed.append(task.completed)
+            masks.append(task.cat_mask)
+        # archived may be a one-shot generator (storage.iter_archive), so it is read in a single pass
+        for row in archived:
+            due.append(date_ordinal(row.get("due_date") or "") or 0)
+            # Only the day matters here, and day strings hit the date cache
+            done.append(date_ordinal((row.get("completion_timestamp") or "")[:10]) or 0)
+            completed.append(bool(row.get("completed")))
+            masks.append(category_mask(row.get("categories") or []))
+        try:
+            columns["cat_mask"] = array("Q", masks)
+        except OverflowError:
+            columns["cat_mask"] = masks
+    return columns
+
+
+def occurrences_before(start, recurring, every, day):
+    """
+    How many occurrences of the series start, start + every units, ... fall
+    before day.
+    """
+    if day <= start:
+        return 0
+    if recurring in DAY_STEPS:
+        return -(-(day - start) // (DAY_STEPS[recurring] * every))
+    step = MONTH_STEPS[recurring] * every
+    first, target = datetime.date.fromordinal(start), datetime.date.fromordinal(day)
+    k = -(-((target.year - first.year) * 12 + target.month - first.month) // step)
+    return k if add_months(start, k * step) >= day else k + 1
+
+
+def adherence_row(task, due_so_far, done):
+    return {"id": task.id, "title": task.title, "recurring": task.recurring, "every": task.rule.every,
+            "due_so_far": due_so_far, "done": done, "missed": due_so_far - done,
+            "adherence": round(done / due_so_far, 3) if due_so_far else None}
+
+
+def lateness_summary(count, mean, median, p90):
+    return {"tasks": count, "mean_days": round(float(mean), 2) if count else None,
+            "median_days": round(float(median), 2) if count else None,
+            "p90_days": round(float(p90), 2) if count else None}
+
+
+def analytics_python(columns, recurring, today):
+    """
+    The analytics with plain loops; used without NumPy and as the
+    benchmark baseline for analytics_numpy, whose results it matches.
+    """
+    import statistics
+    first_week = today - today % 7 - 7 * (ANALYTICS_WEEKS - 1)
+    window_end = first_week + 7 * ANALYTICS_WEEKS
+    due_counts, done_counts = {}, {}
+    late = []
+    starts, stops = [], []
+    for due, done, completed, mask in zip(columns["due"], columns["done"], columns["completed"], columns["cat_mask"]):
+        if not due:
+            continue
+        if first_week <= due < window_end:
+            week = (due - first_week) // 7
+            while mask:
+                low = mask & -mask
+                key = (low.bit_length() - 1, week)
+                due_counts[key] = due_counts.get(key, 0) + 1
+                done_counts[key] = done_counts.get(key, 0) + completed
+                mask ^= low
+        if completed and done:
+            late.append(done - due)
+        stop = done if completed else NEVER
+        if due + 1 < stop:
+            starts.append(due + 1)
+            stops.append(stop)
+
+    completion = [{"category": cat_id, "week": first_week + 7 * week, "due": n, "completed": done_counts[cat_id, week],
+                   "rate": round(done_counts[cat_id, week] / n, 3)}
+                  for (cat_id, week), n in sorted(due_counts.items())]
+    buckets = [0] * len(LATENESS_BUCKETS)
+    for days in late:
+        buckets[bisect.bisect_right(LATENESS_EDGES, days)] += 1
+    if late:
+        p90 = statistics.quantiles(late, n=10, method="inclusive")[-1] if len(late) > 1 else late[0]
+        summary = lateness_summary(len(late), sum(late) / len(late), statistics.median(late), p90)
+    else:
+        summary = lateness_summary(0, 0, 0, 0)
+    starts.sort()
+    stops.sort()
+    backlog = []
+    for week in range(ANALYTICS_WEEKS):
+        end = min(first_week + 7 * week + 6, today)
+        backlog.append({"week_end": end, "overdue": bisect.bisect_right(starts, end) - bisect.bisect_right(stops, end)})
+
+    adherence = []
+    for task in recurring:
+        start = task.rule.start or task.due
+        limit = min(today, task.rule.until + 1) if task.rule.until else today
+        due_so_far = occurrences_before(start, task.recurring, task.rule.every, limit)
+        if task.completed:
+            done = due_so_far
+        else:
+            done = occurrences_before(start, task.recurring, task.rule.every, min(task.due, limit))
+            done += sum(1 for day in task.rule.done_after(task.due) if day < limit)
+        adherence.append(adherence_row(task, due_so_far, done))
+    return {
+        "completion_rate": completion,
+        "lateness": [{"bucket": name, "tasks": n} for name, n in zip(LATENESS_BUCKETS, buckets)],
+        "lateness_summary": [summary],
+        "backlog": backlog,
+        "recurring_adherence": adherence,
+    }
+
+
+def numpy_add_months(ordinals, months):
+    """
+    add_months for NumPy arrays of day ordinals and month counts.
+    """
+    import numpy as np
+    days = (ordinals - NUMPY_EPOCH).astype("M8[D]")
+    first = days.astype("M8[M]")
+    day_of_month = (days - first.astype("M8[D]")).astype(np.int64)
+    target = first + months.astype("m8[M]")
+    length = ((target + 1).astype("M8[D]") - target.astype("M8[D]")).astype(np.int64)
+    return (target.astype("M8[D]") - np.datetime64(0, "D")).astype(np.int64) + np.minimum(day_of_month, length - 1) + NUMPY_EPOCH
+
+
+def numpy_occurrences_before(starts, day_steps, month_steps, days):
+    """
+    occurrences_before for arrays: day_steps is set for daily/weekly series,
+    month_steps for monthly/yearly ones.
+    """
+    import numpy as np
+    by_days = -(-(days - starts) // np.maximum(day_steps, 1))
+    month_gap = (((days - NUMPY_EPOCH).astype("M8[D]").astype("M8[M]")
+                  - (starts - NUMPY_EPOCH).astype("M8[D]").astype("M8[M]")).astype(np.int64))
+    step = np.maximum(month_steps, 1)
+    k = -(-month_gap // step)
+    by_months = np.where(numpy_add_months(starts, k * step) >= days, k, k + 1)
+    return np.where(days <= starts, 0, np.where(day_steps > 0, by_days, by_months))
+
+
+def analytics_numpy(columns, recurring, today):
+    """
+    The analytics as column operations: categories are exploded into
+    (row, category) pairs and counted per category and week with bincount,
+    lateness is bucketed with searchsorted, and the backlog at each week
+    end is the number of overdue intervals (due, completion) containing it.
+    """
+    import numpy as np
+    due = np.frombuffer(columns["due"], np.int32).astype(np.int64)
+    done = np.frombuffer(columns["done"], np.int32).astype(np.int64)
+    completed = np.frombuffer(columns["completed"], np.int8).astype(bool)
+    if isinstance(columns["cat_mask"], array):
+        masks, shift = np.frombuffer(columns["cat_mask"], np.uint64), np.uint64
+    else:
+        # Masks wider than 64 bits stay Python ints in an object array
+        masks, shift = np.array(columns["cat_mask"], dtype=object), int
+    first_week = today - today % 7 - 7 * (ANALYTICS_WEEKS - 1)
+
+    rows = np.flatnonzero((due >= first_week) & (due < first_week + 7 * ANALYTICS_WEEKS) & (masks != 0))
+    row_masks = masks[rows]
+    used = int(np.bitwise_or.reduce(row_masks)) if len(rows) else 0
+    pairs = [(rows[(row_masks >> shift(cat_id)) & shift(1) == 1], cat_id)
+             for cat_id in range(used.bit_length()) if used >> cat_id & 1]
+    exploded = np.concatenate([hit for hit, _ in pairs]) if pairs else np.zeros(0, np.int64)
+    cat_ids = np.concatenate([np.full(len(hit), cat_id) for hit, cat_id in pairs]) if pairs else np.zeros(0, np.int64)
+    keys = cat_ids * ANALYTICS_WEEKS + (due[exploded] - first_week) // 7
+    size = 64 * ANALYTICS_WEEKS
+    due_counts = np.bincount(keys, minlength=size)
+    done_counts = np.bincount(keys, weights=completed[exploded], minlength=size).astype(np.int64)
+    completion = [{"category": int(key // ANALYTICS_WEEKS), "week": first_week + 7 * int(key % ANALYTICS_WEEKS),
+                   "due": int(due_counts[key]), "completed": int(done_counts[key]),
+                   "rate": round(int(done_counts[key]) / int(due_counts[key]), 3)}
+                  for key in np.flatnonzero(due_counts)]
+
+    finished = completed & (due > 0) & (done > 0)
+    late = done[finished] - due[finished]
+    buckets = np.bincount(np.searchsorted(LATENESS_EDGES, late, side="right"), minlength=len(LATENESS_BUCKETS))
+    if len(late):
+        summary = lateness_summary(len(late), late.mean(), np.median(late), np.percentile(late, 90))
+    else:
+        summary = lateness_summary(0, 0, 0, 0)
+
+    stops = np.where(completed, done, NEVER)
+    overdue = (due > 0) & (due + 1 < stops)
+    starts = np.sort(due[overdue] + 1)
+    stops = np.sort(stops[overdue])
+    ends = np.minimum(first_week + 7 * np.arange(ANALYTICS_WEEKS) + 6, today)
+    counts = np.searchsorted(starts, ends, side="right") - np.searchsorted(stops, ends, side="right")
+    backlog = [{"week_end": int(end), "overdue": int(n)} for end, n in zip(ends, counts)]
+
+    adherence = []
+    if recurring:
+        n = len(recurring)
+        starts = np.fromiter((task.rule.start or task.due for task in recurring), np.int64, n)
+        every = np.fromiter((task.rule.every for task in recurring), np.int64, n)
+        day_steps = np.fromiter((DAY_STEPS.get(task.recurring, 0) for task in recurring), np.int64, n) * every
+        month_steps = np.fromiter((MONTH_STEPS.get(task.recurring, 0) for task in recurring), np.int64, n) * every
+        until = np.fromiter((task.rule.until for task in recurring), np.int64, n)
+        dues = np.fromiter((task.due for task in recurring), np.int64, n)
+        finished = np.fromiter((task.completed for task in recurring), bool, n)
+        limits = np.where(until > 0, np.minimum(today, until + 1), today)
+        due_so_far = numpy_occurrences_before(starts, day_steps, month_steps, limits)
+        done = numpy_occurrences_before(starts, day_steps, month_steps, np.minimum(dues, limits))
+        early = np.fromiter((sum(1 for day in task.rule.done_after(task.due) if day < limit)
+                             for task, limit in zip(recurring, limits.tolist())), np.int64, n)
+        done = np.where(finished, due_so_far, done + early)
+        adherence = [adherence_row(task, a, b) for task, a, b in zip(recurring, due_so_far.tolist(), done.tolist())]
+    return {
+        "completion_rate": completion,
+        "lateness": [{"bucket": name, "tasks": int(n)} for name, n in zip(LATENESS_BUCKETS, buckets)],
+        "lateness_summary": [summary],
+        "backlog": backlog,
+        "recurring_adherence": adherence,
+    }
+
+
+def compute_analytics(tasks, archived, today=None):
+    """
+    Every analytics table for the active tasks plus the archive rows,
+    vectorized when NumPy is installed. Days are ordinals and categories
+    IDs; show_analytics formats them.
+    """
+    today = today or today_ordinal()
+    columns = analytics_columns(tasks, archived)
+    recurring = [task for task in tasks if task.rule and (task.rule.start or task.due)]
+    with measure("analytics"):
+        try:
+            import numpy
+        except ImportError:
+            return analytics_python(columns, recurring, today)
+        return analytics_numpy(columns, recurring, today)
+
+
+def show_analytics(tasks, fmt="table"):
+    if fmt not in ANALYTICS_FORMATS:
+        print(RED + f"Error: Unknown analytics format '{fmt}'. Use table, csv or json." + RESET)
+        return
+    metrics = compute_analytics(tasks, storage.iter_archive())
+    for row in metrics["completion_rate"]:
+        row["category"] = categories.name(row["category"])
+        row["week"] = date_string(row["week"])
+    for row in metrics["backlog"]:
+        row["week_end"] = date_string(row["week_end"])
+
+    if fmt == "json":
+        sys.stdout.write(json.dumps(metrics, indent=2) + "\n")
+    elif fmt == "csv":
+        import csv
+        # One table per metric, each with its own header, separated by a blank line
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        for name, rows in metrics.items():
+            if rows:
+                writer.writerow(["metric"] + list(rows[0]))
+                writer.writerows([name] + list(row.values()) for row in rows)
+                sys.stdout.write("\n")
+    else:
+        # Completion rates as a category x week grid
+        weeks = sorted({row["week"] for row in metrics["completion_rate"]})
+        grid = {}
+        for row in metrics["completion_rate"]:
+            grid.setdefault(row["category"], {})[row["week"]] = f"{row['rate']:.0%}"
+        print(f"Completion rate by category, per week of due date (last {ANALYTICS_WEEKS} weeks):")
+        print("  " + " " * 12 + "".join(f"{week[5:]:>7}" for week in weeks))
+        for name, rates in grid.items():
+            print(f"  {name:<12}" + "".join(f"{rates.get(week, '-'):>7}" for week in weeks))
+        summary = metrics["lateness_summary"][0]
+        print(f"\nLateness of {summary['tasks']} completed tasks with a due date "
+              f"(mean {summary['mean_days']}, median {summary['median_days']}, p90 {summary['p90_days']} days):")
+        for row in metrics["lateness"]:
+            print(f"  {row['bucket']:<14} {row['tasks']}")
+        print("\nOverdue backlog at the end of each week:")
+        for row in metrics["backlog"]:
+            print(f"  {row['week_end']}: {row['overdue']}")
+        if metrics["recurring_adherence"]:
+            # The table shows the least kept series; csv and json have all of them
+            rows = sorted(metrics["recurring_adherence"], key=lambda row: (row["adherence"] is None, row["adherence"]))
+            print("\nRecurring task adherence (occurrences done of those due before today), lowest first:")
+            for row in rows[:ANALYTICS_TABLE_ROWS]:
+                rate = f"{row['adherence']:.0%}" if row["adherence"] is not None else "-"
+                print(f"  {row['id']}. {row['title']} ({row['recurring']}): {row['done']}/{row['due_so_far']} ({rate}), "
+                      f"{row['missed']} missed")
+
+
+def remind_tasks(tasks):
+    # Show tasks due soon based on config
+    days_ahead = config.get("reminder_days_ahead", 1)
+    today = today_ordinal()
+    soon = storage.due_soon_tasks(tasks, days_ahead) + recurring_occurrences(tasks, today, today + days_ahead)
+    if soon:
+        print("\nReminder: The following tasks are due soon:")
+        for t in soon:
+            print(f"- {t.title} (Due: {t.due_date})")
+
+def show_overdue_alerts(tasks):
+    overdue_tasks = storage.overdue_tasks(tasks)
+    if overdue_tasks:
+        print(RED + "\nWARNING: You have overdue tasks!" + RESET)
+        for t in overdue_tasks:
+            print(f"- {t.title} (Due: {t.due_date})")
+
+
+# Scheduler mode (--scheduler): reminders fire at their instant instead of only at startup.
+# Heap keys pack (instant, task ID, kind) into one int so a million reminders are a list of ints.
+REMINDER_SINKS = ("stdout", "log", "command")
+REMINDER_LOG_FILE = "todo_reminders.log"
+REMINDER_COMMAND_TIMEOUT = 10
+REMIND, OVERDUE = 0, 1
+SCHEDULE_ID_BITS = 32
+SCHEDULE_KEY_SHIFT = SCHEDULE_ID_BITS + 1
+SCHEDULE_ID_MASK = (1 << SCHEDULE_ID_BITS) - 1
+# Longest sleep between checks, so clock changes and suspends are caught up with
+SCHEDULER_MAX_SLEEP = 60.0
+# How often standalone mode checks whether another process saved
+SCHEDULER_POLL_SECONDS = 5.0
+
+
+def reminder_time_seconds():
+    value = config.get("reminder_time", "09:00")
+    try:
+        hours, minutes = map(int, value.split(":"))
+        if 0 <= hours < 24 and 0 <= minutes < 60:
+            return hours * 3600 + minutes * 60
+    except (AttributeError, ValueError):
+        pass
+    print(YELLOW + f"Warning: Invalid reminder_time '{value}', using 09:00." + RESET)
+    return 9 * 3600
+
+
+class ReminderScheduler:
+    """
+    Min-heap of the next reminder instant of every pending task with a due
+    date: reminder_days_ahead days before it is due at reminder_time, then
+    overdue at the midnight after the due day. Each task has at most one
+    live heap entry. Changes push the task's new instant (O(log n)) and the
+    entry it replaces is left behind; popped entries are checked against
+    the task, so stale ones are dropped without ever rescanning.
+    """
+
+    def __init__(self, tasks, sinks=("stdout",)):
+        self.sinks = sinks
+        self.days_ahead = config.get("reminder_days_ahead", 1)
+        self.remind_at = reminder_time_seconds()
+        self.wakeup = None
+        self.fired = 0
+        self.build(tasks)
+        # Where sync() picks up the journal; only trusted if nothing was saved since tasks were loaded
+        self.journal = journal_position()
+        if storage_signature() != loaded_signature:
+            self.journal = None
+
+    def build(self, tasks, now=None):
+        now = now_timestamp() if now is None else now
+        self.tasks = {task.id: task for task in tasks}
+        keys = [self.next_key(task, now) for task in tasks]
+        self.heap = [key for key in keys if key is not None]
+        heapq.heapify(self.heap)
+        self.last_key = None
+
+    def instant(self, task, kind):
+        if kind == REMIND:
+            return (task.due - self.days_ahead) * SECONDS_PER_DAY + self.remind_at
+        return (task.due + 1) * SECONDS_PER_DAY
+
+    def next_key(self, task, after):
+        """
+        Heap key of the task's first instant later than after, or None.
+        """
+        if task.completed or not task.due:
+            return None
+        for kind in (REMIND, OVERDUE):
+            when = self.instant(task, kind)
+            if when > after:
+                return when << SCHEDULE_KEY_SHIFT | task.id << 1 | kind
+        return None
+
+    def on_change(self, op, task, before=None):
+        if op in REMOVAL_OPS:
+            self.tasks.pop(task.id, None)
+            return
+        self.tasks[task.id] = task
+        now = now_timestamp()
+        key = self.next_key(task, now)
+        if key is None or before is not None and self.next_key(before, now) == key:
+            return  # Nothing to fire, or the entry pushed for the task before still holds
+        heapq.heappush(self.heap, key)
+        if self.wakeup is not None and key == self.heap[0]:
+            self.wakeup.set()  # Earlier than what the run loop is sleeping until
+        if len(self.heap) > 2 * len(self.tasks) + 1024:
+            self.build(list(self.tasks.values()))
+
+    def apply_changes(self, changed, removed):
+        """
+        Feed another writer's changes (as version_changes returns them)
+        through on_change.
+        """
+        for task_id in removed:
+            task = self.tasks.get(task_id)
+            if task is not None:
+                self.on_change("remove", task)
+        for task in changed:
+            self.on_change("update", task, self.tasks.get(task.id))
+
+    def sync(self):
+        """
+        Apply what other processes saved since the last sync: the entries
+        appended to the journal when it only grew, otherwise the tasks whose
+        version moved (SQLite compares versions before decoding any row).
+        Call with the storage lock held.
+        """
+        tail = read_journal_tail(self.journal)
+        if tail is None:
+            self.journal = journal_position()
+            storage.reset()
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.apply_changes(*storage.changed_tasks(self.tasks))
+            return
+        entries, self.journal = tail
+        for entry in entries:
+            if entry["op"] == "remove":
+                self.apply_changes((), (entry["id"],))
+            else:
+                self.apply_changes((Task.from_dict(entry["task"]),), ())
+
+    def next_instant(self):
+        return self.heap[0] >> SCHEDULE_KEY_SHIFT if self.heap else None
+
+    def fire_due(self, now):
+        """
+        Pop and notify every entry due by now, scheduling each task's next
+        instant after it. Returns the number of notifications sent.
+        """
+        fired = 0
+        heap = self.heap
+        while heap and heap[0] >> SCHEDULE_KEY_SHIFT <= now:
+            key = heapq.heappop(heap)
+            if key == self.last_key:
+                continue  # A task changed back and forth can push the same key twice
+            self.last_key = key
+            when, task_id, kind = key >> SCHEDULE_KEY_SHIFT, key >> 1 & SCHEDULE_ID_MASK, key & 1
+            task = self.tasks.get(task_id)
+            if task is None or task.completed or not task.due or self.instant(task, kind) != when:
+                continue  # Removed, completed or rescheduled since this entry was pushed
+            self.notify(kind, task)
+            fired += 1
+            following = self.next_key(task, when)
+            if following is not None:
+                heapq.heappush(heap, following)
+        self.fired += fired
+        return fired
+
+    def notify(self, kind, task):
+        if kind == REMIND:
+            color, message = YELLOW, f"Reminder: '{task.title}' is due {task.due_date}."
+        else:
+            color, message = RED, f"Overdue: '{task.title}' was due {task.due_date}."
+        stamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if "stdout" in self.sinks:
+            print(color + f"[{stamp}] {message}" + RESET, flush=True)
+        if "log" in self.sinks:
+            with open(config.get("reminder_log", REMINDER_LOG_FILE), 'a') as f:
+                f.write(f"{stamp} {message}\n")
+        if "command" in self.sinks:
+            import shlex
+            import subprocess
+            env = dict(os.environ, TODO_EVENT="reminder" if kind == REMIND else "overdue", TODO_TASK_ID=str(task.id),
+                       TODO_TASK_TITLE=task.title, TODO_TASK_DUE=task.due_date)
+            try:
+                subprocess.run(shlex.split(config["reminder_command"]) + [message], env=env,
+                               timeout=REMINDER_COMMAND_TIMEOUT, check=False)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                print(YELLOW + f"Warning: reminder_command failed: {e}" + RESET)
+
+    async def run(self, watch=False):
+        """
+        Sleep until the next instant (or until a change brings one forward),
+        fire what is due, repeat. With watch, also sync() when another
+        process saves, for when no server routes changes through us.
+        """
+        import asyncio
+        global loaded_signature
+        self.wakeup = asyncio.Event()
+        while True:
+            now = now_timestamp()
+            self.fire_due(now)
+            upcoming = self.next_instant()
+            delay = SCHEDULER_MAX_SLEEP if upcoming is None else min(max(upcoming - now, 0), SCHEDULER_MAX_SLEEP)
+            if watch:
+                delay = min(delay, SCHEDULER_POLL_SECONDS)
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            if watch and storage_signature() != loaded_signature:
+                with storage_lock(shared=True):
+                    loaded_signature = storage_signature()
+                    self.sync()
+
+
+def reminder_sinks(value):
+    """
+    Parse --scheduler's comma separated sinks, printing an error and
+    returning None if one is unknown or not configured.
+    """
+    sinks = [sink.strip() for sink in value.split(",") if sink.strip()]
+    for sink in sinks:
+        if sink not in REMINDER_SINKS:
+            print(RED + f"Error: Unknown reminder sink '{sink}'. Use {', '.join(REMINDER_SINKS)}." + RESET)
+            return None
+    if "command" in sinks and not config.get("reminder_command"):
+        print(RED + "Error: Set reminder_command in config.json to use the command sink." + RESET)
+        return None
+    return sinks or ["stdout"]
+
 
-        # Display categories and allow selection
-        display_categories(categories)
-        cat_input = input("Enter category IDs (comma separated) or leave blank: ").strip()
-        selected_categories = [int(cat_id.strip()) for cat_id in cat_input.split(",") if cat_id.strip().isdigit()]
+def run_scheduler(tasks, sinks):
+    import asyncio
+    scheduler = ReminderScheduler(tasks, sinks)
+    print(GREEN + f"Scheduler running with {len(scheduler.heap)} pending reminder(s). Press Ctrl+C to stop." + RESET)
+    try:
+        asyncio.run(scheduler.run(watch=True))
+    except KeyboardInterrupt:
+        print(f"\nScheduler stopped after {scheduler.fired} notification(s).")
 
-        # Validate category IDs
-        valid_category_ids = [category[0] for category in categories[1:]]
-        selected_categories = [cat_id for cat_id in selected_categories if cat_id in valid_category_ids]
-
-        new_task = {
-            "title": title,
-            "completed": False,
-            "due_date": due_date,
-            "priority": priority or "Medium",  # Default to Medium
-            "recurring": recurring or None,  # Default to None
-            "categories": selected_categories,
-            "completion_timestamp": None
-        }
-        tasks.append(new_task)
-        print(GREEN + f"Task '{title}' added successfully." + RESET)
-        return tasks
 
+def category_mask(category_ids):
+    mask = 0
+    for cat_id in category_ids:
+        mask |= 1 << cat_id
+    return mask
 
-def remove_task(tasks):
-    display_tasks(tasks)
-    choice = input("\nEnter the task number(s) to remove (e.g. '1' or '1,2,3'): ").strip()
-    if not choice:
-        return tasks
-    indices = [int(x)-1 for x in choice.split(",") if x.strip().isdigit()]
-    indices = sorted(indices, reverse=True)
-    for idx in indices:
-        if 0 <= idx < len(tasks):
-            removed_task = tasks.pop(idx)
-            print(f"Task '{removed_task['title']}' removed.")
-        else:
-            print(f"Invalid task number: {idx+1}")
-    return tasks
-def is_valid_date(date_str):
+
+def parse_timestamp(timestamp):
     """
-    Validate that the provided date is not before the START_DATE (01-01-2025).
+    Turn a "YYYY-MM-DD HH:MM:SS" completion timestamp into seconds counted
+    from day ordinal 0, or 0 if it is missing or malformed.
     """
+    if not timestamp:
+        return 0
+    day = date_ordinal(timestamp[:10])
     try:
-        date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-        if date < START_DATE:
-            return False
-        return True
+        hours, minutes, seconds = (int(part) for part in timestamp[11:19].split(":"))
     except ValueError:
-        return False
+        hours = minutes = seconds = 0
+    if day is None:
+        return 0
+    return day * SECONDS_PER_DAY + hours * 3600 + minutes * 60 + seconds
 
-def edit_task(tasks):
-    display_tasks(tasks)
-    choice = input("\nEnter the task number to edit: ").strip()
-    if not choice.isdigit() or int(choice) - 1 not in range(len(tasks)):
-        print(RED + "Invalid task number." + RESET)
-        return tasks
 
-    idx = int(choice) - 1
-    task = tasks[idx]
+class Task:
+    """
+    A single to-do item. Dates are day ordinals (0 for none), priority and
+    recurrence are indexes into PRIORITY_NAMES/RECURRING_NAMES and categories
+    are a bitmask of category IDs. version counts the saved changes to the
+    task. to_dict/from_dict convert to the JSON layout. Stored due dates and
+    priorities that don't parse are kept verbatim in invalid so a save never
+    overwrites them.
+    """
+    __slots__ = ("id", "title", "completed", "due", "prio", "recur", "cat_mask", "done_at", "rule", "version",
+                 "invalid")
 
-    print(f"Editing task '{task['title']}'")
-    new_title = input("Enter updated title (leave blank to keep current): ").strip()
-    if new_title:
-        if len(new_title) > 60:
-            print(RED + "Error: Task description exceeds 60 characters. Update canceled." + RESET)
-            return tasks
-        task["title"] = new_title
+    def __init__(self, title, completed=False, due=0, prio=PRIORITY_MEDIUM, recur=0, cat_mask=0, done_at=0, id=0,
+                 rule=None, version=0, invalid=None):
+        self.id = id
+        self.invalid = invalid
+        self.version = version
+        self.title = title
+        self.completed = completed
+        self.due = due
+        self.prio = prio
+        self.recur = recur
+        self.cat_mask = cat_mask
+        self.done_at = done_at
+        # Recurring tasks are one task with a rule; due is the next pending occurrence
+        self.rule = rule if rule is not None or not recur else RecurrenceRule()
 
-    new_due = input("Enter updated due date (YYYY-MM-DD) or blank to keep current: ").strip()
-    if new_due:
-        if not is_valid_date(new_due):
-            print(RED + f"Error: Date cannot be before {START_DATE.strftime('%Y-%m-%d')}. Update canceled." + RESET)
-            return tasks
-        task["due_date"] = new_due
+    @classmethod
+    def from_dict(cls, data):
+        task = cls(data["title"], completed=bool(data.get("completed")), id=data.get("id") or 0,
+                   version=data.get("version") or 0)
+        due_date = data.get("due_date")
+        task.due_date = due_date
+        if due_date and not task.due and (task.id, due_date) not in warned_due_dates:
+            # Loads repeat on every merge and reload; say it once, off stdout so piped output stays clean
+            warned_due_dates.add((task.id, due_date))
+            print(YELLOW + f"Warning: Task '{task.title}' has an invalid due date: {due_date}" + RESET, file=sys.stderr)
+        task.priority = data.get("priority") or "Medium"
+        task.recurring = data.get("recurring")
+        if task.rule:
+            task.rule = RecurrenceRule.from_dict(data)
+        task.categories = data.get("categories") or []
+        task.done_at = parse_timestamp(data.get("completion_timestamp"))
+        return task
 
-    new_priority = input("Enter updated priority (High/Medium/Low) or blank to keep current: ").strip()
-    if new_priority:
-        task["priority"] = new_priority
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "title": self.title,
+            "completed": self.completed,
+            "due_date": self.due_date,
+            "priority": self.priority,
+            "recurring": self.recurring,
+            "categories": self.categories,
+            "completion_timestamp": self.completion_timestamp,
+            "version": self.version,
+        }
+        if self.rule:
+            data.update(self.rule.to_dict())
+        return data
 
-    print(GREEN + f"Task '{task['title']}' updated successfully." + RESET)
-    return tasks
+    @property
+    def due_date(self):
+        if self.due:
+            return date_string(self.due)
+        return self.invalid.get("due_date") if self.invalid else None
 
+    @due_date.setter
+    def due_date(self, value):
+        # An unparseable date counts as no due date but is written back unchanged
+        self.due = (date_ordinal(value) or 0) if value else 0
+        self.set_invalid("due_date", value if value and not self.due else None)
 
-def toggle_task_status(tasks):
-    display_tasks(tasks)  # Display all tasks for user to choose from
-    choice = input("\nEnter the task number(s) to toggle: ").strip()
-    if not choice:
-        return tasks
+    @property
+    def priority(self):
+        if self.invalid and "priority" in self.invalid:
+            return self.invalid["priority"]
+        return PRIORITY_NAMES[self.prio]
 
-    indices = [int(x) - 1 for x in choice.split(",") if x.strip().isdigit()]
+    @priority.setter
+    def priority(self, value):
+        self.prio = PRIORITY_LEVELS.get(value, PRIORITY_MEDIUM)
+        self.set_invalid("priority", value if value not in PRIORITY_LEVELS else None)
 
-    for idx in indices:
-        if 0 <= idx < len(tasks):
-            task = tasks[idx]
-            if task["completed"]:
-                # Mark as incomplete and remove timestamp
-                task["completed"] = False
-                task["completion_timestamp"] = None
-                print(f"Task '{task['title']}' marked as incomplete.")
-            else:
-                # Mark as complete and set timestamp
-                task["completed"] = True
-                task["completion_timestamp"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                print(f"Task '{task['title']}' marked as complete. Completion time: {task['completion_timestamp']}")
-                
-                # Add next occurrence for recurring tasks
-                if task.get("recurring"):
-                    add_next_occurrence(tasks, task)
-        else:
-            print(f"Invalid task number: {idx+1}")
-    return tasks
+    def set_invalid(self, field, value):
+        if value is not None:
+            self.invalid = dict(self.invalid or (), **{field: value})
+        elif self.invalid and field in self.invalid:
+            self.invalid = {key: kept for key, kept in self.invalid.items() if key != field} or None
 
-def add_next_occurrence(tasks, completed_task):
-    if not completed_task.get("due_date"):
-        print("Cannot add next occurrence without a due date.")
-        return
+    @property
+    def recurring(self):
+        return RECURRING_NAMES[self.recur]
 
-    # Calculate the next due date
-    current_due_date = datetime.datetime.strptime(completed_task["due_date"], "%Y-%m-%d").date()
-    interval = completed_task.get("recurring")
-
-    if interval == "daily":
-        next_due_date = current_due_date + datetime.timedelta(days=1)
-    elif interval == "weekly":
-        next_due_date = current_due_date + datetime.timedelta(weeks=1)
-    elif interval == "monthly":
-        next_due_date = current_due_date + datetime.timedelta(days=30)  # Approximate 30-day months
-    elif interval == "yearly":
-        next_due_date = current_due_date + datetime.timedelta(days=365)
-    else:
-        print("Invalid recurring interval.")
-        return
+    @recurring.setter
+    def recurring(self, value):
+        self.recur = RECURRING_LEVELS.get(value or None, 0)
+        if not self.recur:
+            self.rule = None
+        elif self.rule is None:
+            self.rule = RecurrenceRule()
 
-    # Add the next occurrence as a new task
-    new_task = {
-        "title": completed_task["title"],
-        "completed": False,
-        "due_date": next_due_date.strftime("%Y-%m-%d"),
-        "priority": completed_task.get("priority", "Medium"),
-        "recurring": interval,
-        "categories": completed_task.get("categories", []),
-        "completion_timestamp": None
-    }
-    tasks.append(new_task)
-    print(f"New recurring occurrence added for '{new_task['title']}' due on {new_task['due_date']}.")
+    @property
+    def categories(self):
+        mask = self.cat_mask
+        return [cat_id for cat_id in range(mask.bit_length()) if mask >> cat_id & 1]
 
-def archive_completed_tasks(tasks):
-    archived = load_archive()
-    incompleted = []
-    for t in tasks:
-        if t["completed"]:
-            archived.append(t)
-        else:
-            incompleted.append(t)
-    save_archive(archived)
-    print("Completed tasks archived.")
-    return incompleted
+    @categories.setter
+    def categories(self, value):
+        self.cat_mask = category_mask(value)
 
-def display_completed_tasks(tasks):
-    print("\nCompleted Tasks:")
-    completed = [t for t in tasks if t["completed"]]
-    if not completed:
-        print("No completed tasks found.")
-    else:
-        for i, task in enumerate(completed, 1):
-            c = GREEN
-            title = task["title"]
-            timestamp = f" (Completed On: {task.get('completion_timestamp', 'N/A')})"
-            print(f"{c}{i}. {title}{timestamp}{RESET}")
+    @property
+    def completion_timestamp(self):
+        if not self.done_at:
+            return None
+        day, seconds = divmod(self.done_at, SECONDS_PER_DAY)
+        return (datetime.datetime.fromordinal(day) + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
 
-def search_tasks(tasks):
-    """
-    Search for tasks by title.
-    """
-    query = input("Enter search query: ").strip().lower()
-    if not query:
-        print("Search query cannot be empty.")
-        return
+    def copy(self):
+        return Task(self.title, completed=self.completed, due=self.due, prio=self.prio, recur=self.recur,
+                    cat_mask=self.cat_mask, done_at=self.done_at, id=self.id,
+                    rule=self.rule.copy() if self.rule else None, version=self.version, invalid=self.invalid)
 
-    # Filter tasks that contain the query in their title
-    matching_tasks = [task for task in tasks if query in task["title"].lower()]
+    @property
+    def status(self):
+        return "Completed" if self.completed else "Pending"
 
-    if not matching_tasks:
-        print(RED + "No tasks match your search query." + RESET)
-    else:
-        print(GREEN + "Search Results:" + RESET)
-        display_tasks(matching_tasks, show_all=True)  # Pass filtered tasks
+    def mark_complete(self):
+        self.completed = True
+        self.done_at = now_timestamp()
+
+    def __str__(self):
+        return f"{self.title} - {self.status}"
 
 
-def display_categories(categories):
-    print("\nCategories:")
-    for category in categories[1:]:  # Skip the header row
-        print(f"ID: {category[0]} | Name: {category[1]} | Description: {category[2]}")
-def add_category(categories):
-    next_id = max(category[0] for category in categories[1:]) + 1  # Generate the next ID
-    name = input("Enter category name: ").strip()
-    if not name:
-        print("Category name cannot be empty.")
-        return categories
-    description = input("Enter category description: ").strip()
-    categories.append([next_id, name, description])
-    print(f"Category '{name}' added successfully with ID {next_id}.")
-    return categories
+def now_timestamp():
+    now = datetime.datetime.now()
+    return now.toordinal() * SECONDS_PER_DAY + now.hour * 3600 + now.minute * 60 + now.second
 
-def filter_tasks_by_multiple_categories(tasks, categories):
+
+# The task dict keys a RecurrenceRule is stored under
+RULE_FIELDS = ("every", "until", "start", "exceptions")
+
+
+class RecurrenceRule:
     """
-    Filter tasks by multiple categories.
+    How a recurring task repeats: every N days/weeks/months/years (the unit
+    is the task's recurring interval) from start until an optional end
+    date. exceptions holds the day of every completed occurrence, sorted:
+    those before the task's due date are its completion history, later
+    ones were completed early and are skipped. start 0 means "the task's
+    due date".
     """
-    display_categories(categories)  # Show all categories
-    cat_ids_input = input("Enter category IDs (comma separated) to filter tasks: ").strip()
+    __slots__ = ("start", "every", "until", "exceptions")
 
-    if not cat_ids_input:
-        print("No categories selected. Returning to main menu.")
-        return
+    def __init__(self, start=0, every=1, until=0, exceptions=()):
+        self.start = start
+        self.every = every
+        self.until = until
+        self.exceptions = exceptions
 
-    # Parse and validate category IDs
-    try:
-        selected_ids = [int(cat_id.strip()) for cat_id in cat_ids_input.split(",") if cat_id.strip().isdigit()]
-    except ValueError:
-        print("Invalid input. Please enter numeric category IDs only.")
-        return
+    @classmethod
+    def from_dict(cls, data):
+        return cls(start=date_ordinal(data.get("start") or "") or 0, every=int(data.get("every") or 1),
+                   until=date_ordinal(data.get("until") or "") or 0,
+                   exceptions=tuple(sorted(filter(None, map(date_ordinal, data.get("exceptions") or [])))))
 
-    # Filter tasks matching any of the selected category IDs
-    filtered_tasks = [
-        task for task in tasks if any(cat_id in task.get("categories", []) for cat_id in selected_ids)
-    ]
+    def to_dict(self):
+        return {
+            "every": self.every,
+            "until": date_string(self.until) if self.until else None,
+            "start": date_string(self.start) if self.start else None,
+            "exceptions": [date_string(day) for day in self.exceptions],
+        }
 
-    if not filtered_tasks:
-        print(RED + "No tasks found for the selected categories." + RESET)
-    else:
-        print(GREEN + "Filtered tasks:" + RESET)
-        display_tasks(filtered_tasks, show_all=True)  # Removed `categories` argument
+    def copy(self):
+        return RecurrenceRule(self.start, self.every, self.until, self.exceptions)
 
+    def done_on(self, day):
+        # exceptions is sorted, so a long completion history costs a bisect, not a scan
+        i = bisect.bisect_left(self.exceptions, day)
+        return i < len(self.exceptions) and self.exceptions[i] == day
 
-def view_tasks_by_day(tasks):
-    """
-    Display tasks for a specific day.
-    """
-    date_str = input("Enter the date (YYYY-MM-DD) to view tasks for that day: ").strip()
-    try:
-        selected_date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        print(RED + "Error: Invalid date format. Please enter a date in YYYY-MM-DD format." + RESET)
-        return
-    # Filter tasks for the selected date
-    tasks_for_day = [task for task in tasks if task.get("due_date") == date_str]
+    def done_after(self, day):
+        return self.exceptions[bisect.bisect_right(self.exceptions, day):]
+
+    def record(self, day, done=True):
+        """
+        Add (or with done=False remove) a completed occurrence.
+        """
+        if done and not self.done_on(day):
+            i = bisect.bisect_left(self.exceptions, day)
+            self.exceptions = self.exceptions[:i] + (day,) + self.exceptions[i:]
+        elif not done:
+            self.exceptions = tuple(d for d in self.exceptions if d != day)
 
-    if not tasks_for_day:
-        print(GREEN + f"No tasks scheduled for {selected_date}." + RESET)
-    else:
-        print(BLUE + f"Tasks scheduled for {selected_date}:" + RESET)
-        display_tasks(tasks_for_day, show_all=True)
 
+class TaskTable:
+    """
+    Column-oriented copy of a task list for bulk scans: one compact array per
+    field instead of one object per task. as_numpy() exposes the same columns
+    as NumPy arrays without copying when NumPy is installed. cat_mask turns
+    into a plain list of ints once a task is in category 64 or above.
+    """
 
+    def __init__(self):
+        self.ids = array("q")
+        self.completed = array("b")
+        self.due = array("i")
+        self.prio = array("b")
+        self.recur = array("b")
+        self.cat_mask = array("Q")
+        self.done_at = array("q")
+        self.titles = []
+        # Recurrence rules by row; only recurring tasks have one
+        self.rules = {}
 
-def toggle_view_incomplete(tasks):
-    display_tasks(tasks, show_all=False)
+    @classmethod
+    def from_tasks(cls, tasks):
+        table = cls()
+        for task in tasks:
+            table.append(task)
+        return table
 
-def export_tasks_to_csv(tasks, filename="tasks_export.csv"):
-    with open(filename, 'w', newline='') as csvfile:
-        fieldnames = ["title", "completed", "due_date", "priority", "recurring", "categories", "completion_timestamp"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for t in tasks:
-            writer.writerow(t)
-    print(f"Tasks exported to {filename}")
+    def append(self, task):
+        self.ids.append(task.id)
+        self.completed.append(task.completed)
+        self.due.append(task.due)
+        self.prio.append(task.prio)
+        self.recur.append(task.recur)
+        try:
+            self.cat_mask.append(task.cat_mask)
+        except OverflowError:
+            # Wider than the u64 column; Python ints hold any mask
+            self.cat_mask = list(self.cat_mask)
+            self.cat_mask.append(task.cat_mask)
+        self.done_at.append(task.done_at)
+        if task.rule:
+            self.rules[len(self.titles)] = task.rule
+        self.titles.append(task.title)
 
-def export_tasks_to_json(tasks, filename="tasks_export.json"):
-    with open(filename, 'w') as f:
-        json.dump(tasks, f, indent=2)
-    print(f"Tasks exported to {filename}")
+    def __len__(self):
+        return len(self.ids)
 
-def show_report(tasks):
-    total = len(tasks)
-    completed = sum(t["completed"] for t in tasks)
-    overdue = sum(is_overdue(t) for t in tasks if not t["completed"])
-    print("Task Report:")
-    print(f"Total tasks: {total}")
-    print(f"Completed tasks: {completed}")
-    print(f"Overdue tasks: {overdue}")
+    def task(self, i):
+        return Task(self.titles[i], completed=bool(self.completed[i]), due=self.due[i], prio=self.prio[i],
+                    recur=self.recur[i], cat_mask=self.cat_mask[i], done_at=self.done_at[i], id=self.ids[i],
+                    rule=self.rules.get(i))
 
-def remind_tasks(tasks):
-    # Show tasks due soon based on config
-    days_ahead = config.get("reminder_days_ahead", 1)
-    soon = [t for t in tasks if not t["completed"] and is_due_soon(t, days_ahead)]
-    if soon:
-        print("\nReminder: The following tasks are due soon:")
-        for t in soon:
-            print(f"- {t['title']} (Due: {t['due_date']})")
+    def to_tasks(self):
+        return [self.task(i) for i in range(len(self))]
 
-def show_overdue_alerts(tasks):
-    overdue_tasks = [t for t in tasks if is_overdue(t) and not t["completed"]]
-    if overdue_tasks:
-        print(RED + "\nWARNING: You have overdue tasks!" + RESET)
-        for t in overdue_tasks:
-            print(f"- {t['title']} (Due: {t['due_date']})")
+    def count_completed(self):
+        return sum(self.completed)
 
-class Task:
-    def __init__(self, title):
-        self.title = title
-        self.status = "Pending"
+    def overdue_indices(self, today=None):
+        today = today or today_ordinal()
+        return [i for i, (done, due) in enumerate(zip(self.completed, self.due)) if not done and 0 < due < today]
 
-    def mark_complete(self):
-        self.status = "Completed"
+    def category_indices(self, category_ids):
+        mask = category_mask(category_ids)
+        return [i for i, task_mask in enumerate(self.cat_mask) if task_mask & mask]
 
-    def __str__(self):
-        return f"{self.title} - {self.status}"
+    def as_numpy(self):
+        import numpy as np
+        return {
+            "ids": np.frombuffer(self.ids, dtype=np.int64),
+            "completed": np.frombuffer(self.completed, dtype=np.int8),
+            "due": np.frombuffer(self.due, dtype=np.int32),
+            "prio": np.frombuffer(self.prio, dtype=np.int8),
+            "recur": np.frombuffer(self.recur, dtype=np.int8),
+            "cat_mask": (np.frombuffer(self.cat_mask, dtype=np.uint64) if isinstance(self.cat_mask, array)
+                         else np.array(self.cat_mask, dtype=object)),
+            "done_at": np.frombuffer(self.done_at, dtype=np.int64),
+        }
 
 
 class TodoList:
@@ -512,30 +4973,347 @@ class TodoList:
             print(task)
 
 
-# Example usage
-todo_list = TodoList()
-todo_list.add_task("Buy groceries")
-todo_list.add_task("Study Python")
+# How often the server writes out the changes it has accumulated
+SERVE_FLUSH_SECONDS = 1.0
+# Browser origins allowed to POST over HTTP; clients that send no Origin (curl, scripts) are local anyway
+SERVE_ORIGINS = ("http://127.0.0.1:{port}", "http://localhost:{port}")
+# CLI options a running server can answer; anything else runs locally
+SERVER_OPTIONS = {"add", "due", "priority", "recurring", "every", "until", "category", "list", "limit", "offset", "sort",
+                  "search", "report", "toggle"}
+
+
+class TaskServer:
+    """
+    Keeps the task list and its indexes in memory and answers JSON requests,
+    one object per line on a Unix socket (or one per POST over localhost
+    HTTP). Changes are written out in batches every SERVE_FLUSH_SECONDS.
+    With a ReminderScheduler attached, its heap follows every change made
+    through the server.
+    """
+
+    def __init__(self, tasks, scheduler=None):
+        self.tasks = tasks
+        self.by_id = {task.id: task for task in tasks}
+        # Completed tasks loaded at startup still need archiving; later completions are pending changes
+        self.unarchived = any(task.completed for task in tasks)
+        self.scheduler = scheduler
+        if scheduler is not None:
+            change_listeners.append(scheduler.on_change)
+        self.commands = {
+            "add": self.add,
+            "list": self.list,
+            "toggle": self.toggle,
+            "search": self.search,
+            "report": self.report,
+        }
+
+    def handle(self, request):
+        """
+        Run one request and return its response. Whatever the command prints
+        is returned as "output" so clients can show it unchanged.
+        """
+        if not isinstance(request, dict) or request.get("command") not in self.commands:
+            return {"ok": False, "error": f"Unknown command. Use one of: {', '.join(self.commands)}"}
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            response = self.commands[request["command"]](request)
+        response.setdefault("ok", True)
+        response["output"] = output.getvalue()
+        return response
+
+    def add(self, request):
+        task, error = import_row_task(request)
+        if error:
+            return {"ok": False, "error": error}
+        assign_task_id(task)
+        self.tasks.append(task)
+        self.by_id[task.id] = task
+        record_change("add", task)
+        print(GREEN + f"Task '{task.title}' added successfully." + RESET)
+        return {"task": task.to_dict()}
+
+    def list(self, request):
+        page = (self.tasks, True, request.get("sort"), request.get("offset") or 0, request.get("limit"))
+        display_tasks(*page)
+        return {"tasks": [task.to_dict() for task in select_page(*page)[0]]}
+
+    def toggle(self, request):
+        task = self.by_id.get(request.get("id"))
+        if task is None:
+            return {"ok": False, "error": f"No task with ID {request.get('id')}"}
+        toggle_task(self.tasks, task)
+        return {"task": task.to_dict()}
+
+    def search(self, request):
+        found = find_tasks(self.tasks, request.get("query") or "")
+        if found:
+            display_tasks(found, show_all=True, sort_by=request.get("sort"))
+        else:
+            print(RED + "No tasks match your search query." + RESET)
+        return {"tasks": [task.to_dict() for task in found]}
+
+    def report(self, request):
+        show_report(self.tasks)
+        stats = get_task_stats(self.tasks)
+        return {"total": stats.total, "completed": stats.completed, "overdue": stats.overdue_count(today_ordinal())}
+
+    def flush(self):
+        """
+        Archive completed tasks and write every pending change in one save,
+        as a fresh CLI run would.
+        """
+        if not self.unarchived and not pending_changes:
+            return
+        self.unarchived = False
+        with storage_lock():
+            merged = storage_signature() != loaded_signature
+            with contextlib.redirect_stdout(io.StringIO()):
+                remaining = archive_completed_tasks(self.tasks)
+            # Update in place so handlers holding the list see the change
+            self.tasks[:] = remaining
+            save_tasks(self.tasks)
+        # Archiving, or a merge with another writer's changes, replaced tasks
+        self.by_id = {task.id: task for task in self.tasks}
+        if merged and self.scheduler is not None:
+            # Another writer's changes did not come through our listeners
+            self.scheduler.apply_changes(*version_changes(self.scheduler.tasks, self.tasks))
+
+    async def flush_periodically(self):
+        import asyncio
+        while True:
+            await asyncio.sleep(SERVE_FLUSH_SECONDS)
+            self.flush()
+
+    async def serve_socket(self, reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                response = self.handle(json.loads(line))
+            except ValueError as error:
+                response = {"ok": False, "error": f"Invalid JSON: {error}"}
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+        writer.close()
+
+    async def serve_http(self, reader, writer):
+        import asyncio
+        request_line = await reader.readline()
+        headers = {}
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        content_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+        origin = headers.get("origin")
+        port = writer.get_extra_info("sockname")[1]
+        if not request_line.startswith(b"POST "):
+            status, response = "405 Method Not Allowed", {"ok": False, "error": "POST a JSON request"}
+        elif length < 0:
+            status, response = "400 Bad Request", {"ok": False, "error": "Invalid Content-Length"}
+        elif content_type != "application/json":
+            # Browsers send text/plain or form posts cross-site without asking; JSON needs a preflight
+            status, response = "415 Unsupported Media Type", {"ok": False, "error": "Send Content-Type: application/json"}
+        elif origin is not None and origin not in [allowed.format(port=port) for allowed in SERVE_ORIGINS]:
+            status, response = "403 Forbidden", {"ok": False, "error": f"Requests from {origin} are not allowed"}
+        else:
+            try:
+                body = await reader.readexactly(length)
+                status, response = "200 OK", self.handle(json.loads(body))
+            except asyncio.IncompleteReadError:
+                status, response = "400 Bad Request", {"ok": False, "error": "Request body is shorter than Content-Length"}
+            except ValueError as error:
+                status, response = "400 Bad Request", {"ok": False, "error": f"Invalid JSON: {error}"}
+        payload = json.dumps(response).encode()
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+        await writer.drain()
+        writer.close()
+
+    async def run(self, port=None):
+        import asyncio
+        import signal
+        import socket
+        if os.path.exists(SOCKET_FILE):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                    client.connect(SOCKET_FILE)
+                print(RED + "Error: A server is already running in this directory." + RESET)
+                return
+            except OSError:
+                os.remove(SOCKET_FILE)  # Left behind by a server that did not shut down cleanly
+        servers = [await asyncio.start_unix_server(self.serve_socket, path=SOCKET_FILE)]
+        if port:
+            servers.append(await asyncio.start_server(self.serve_http, "127.0.0.1", port))
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        background = [asyncio.create_task(self.flush_periodically())]
+        if self.scheduler is not None:
+            background.append(asyncio.create_task(self.scheduler.run()))
+        print(GREEN + f"Serving on {SOCKET_FILE}" + (f" and http://127.0.0.1:{port}" if port else "")
+              + ". Press Ctrl+C to stop." + RESET)
+        try:
+            await stop.wait()
+        finally:
+            for job in background:
+                job.cancel()
+            for server in servers:
+                server.close()
+                await server.wait_closed()
+            self.flush()
+            os.remove(SOCKET_FILE)
+
+
+def serve(tasks, port=None, sinks=None):
+    import asyncio
+    scheduler = ReminderScheduler(tasks, sinks) if sinks else None
+    asyncio.run(TaskServer(tasks, scheduler).run(port))
+
+
+def server_requests(args):
+    """
+    Turn the command-line options into server requests, or return None when
+    they include something only a local run can do.
+    """
+    given = given_options(args)
+    if not given or not given <= SERVER_OPTIONS or ((given & {"due", "priority", "recurring", "every", "until", "category"}) and not args.add):
+        return None
+    requests = []
+    if args.add:
+        requests.append({"command": "add", "title": args.add, "due_date": args.due, "priority": args.priority,
+                         "recurring": args.recurring, "every": args.every, "until": args.until,
+                         "categories": args.category})
+    if args.toggle is not None:
+        requests.append({"command": "toggle", "id": args.toggle})
+    if args.list:
+        requests.append({"command": "list", "limit": args.limit, "offset": args.offset, "sort": args.sort})
+    if args.search:
+        requests.append({"command": "search", "query": args.search, "sort": args.sort})
+    if args.report:
+        requests.append({"command": "report"})
+    return requests
+
+
+def forward_to_server(args):
+    """
+    When a server is running, send it this invocation's command instead of
+    loading the task list here. Returns False if the command has to run
+    locally.
+    """
+    if not os.path.exists(SOCKET_FILE):
+        return False
+    import socket
+    requests = server_requests(args)
+    if not requests:
+        print(YELLOW + "Warning: A server is running; changes made here may be overwritten by it." + RESET)
+        return False
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(SOCKET_FILE)
+    except OSError:
+        return False  # Left behind by a server that is no longer running
+    with client, client.makefile('rwb') as stream:
+        for request in requests:
+            stream.write(json.dumps(request).encode() + b"\n")
+            stream.flush()
+            response = json.loads(stream.readline())
+            print(response.get("output", ""), end="")
+            if not response.get("ok"):
+                print(RED + f"Error: {response.get('error')}" + RESET)
+    return True
+
+
+def start_profiling(modes):
+    """
+    Turn on the instrumentation for this run and report it at exit in each
+    of the requested modes (see PROFILE_MODES).
+    """
+    global profiling
+    unknown = [mode for mode in modes if mode not in PROFILE_MODES]
+    if unknown:
+        print(YELLOW + f"Warning: Unknown profile mode(s) ignored: {', '.join(unknown)}" + RESET)
+    profiling = True
+    profiler = None
+    if "cprofile" in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    atexit.register(report_metrics, modes, profiler, time.perf_counter())
+
 
-print("Tasks:")
-todo_list.show_tasks()
+def report_metrics(modes, profiler, started):
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(PSTATS_FILE)
+    record = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "command": " ".join(sys.argv[1:]) or "interactive",
+        "total_ms": round((time.perf_counter() - started) * 1000, 3),
+        "timings_ms": {name: round(seconds * 1000, 3) for name, seconds in metric_timings.items()},
+        "counters": dict(metric_counters),
+    }
+    if "summary" in modes:
+        # stderr, so profiling a command does not change what it prints
+        lines = [f"Profile of '{record['command']}': {record['total_ms']:.1f} ms total"]
+        lines += [f"  {name:<14} {ms:>10.1f} ms" for name, ms in sorted(record["timings_ms"].items(), key=lambda kv: -kv[1])]
+        lines += [f"  {name:<14} {value:>10}" for name, value in sorted(record["counters"].items())]
+        if profiler is not None:
+            lines.append(f"  cProfile data written to {PSTATS_FILE}")
+        print("\n".join(lines), file=sys.stderr)
+    if "json" in modes:
+        with open(METRICS_FILE, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+    if "prom" in modes:
+        write_prometheus_metrics(record)
 
-todo_list.tasks[0].mark_complete()  # Mark first task as completed
 
-print("\nUpdated Tasks:")
-todo_list.show_tasks()
+def write_prometheus_metrics(record, filename=PROM_FILE):
+    """
+    Write the run's metrics in Prometheus text format for a node-exporter
+    textfile collector. The file is replaced atomically so a scrape never
+    sees half of it.
+    """
+    lines = [
+        "# HELP todo_operation_seconds Wall time spent per operation in the last command.",
+        "# TYPE todo_operation_seconds gauge",
+    ]
+    lines += [f'todo_operation_seconds{{operation="{name}"}} {ms / 1000:.6f}' for name, ms in record["timings_ms"].items()]
+    lines += [
+        "# HELP todo_command_seconds Wall time of the last command.",
+        "# TYPE todo_command_seconds gauge",
+        f"todo_command_seconds {record['total_ms'] / 1000:.6f}",
+    ]
+    for name, value in sorted(record["counters"].items()):
+        lines += [f"# TYPE todo_{name} gauge", f"todo_{name} {value}"]
+    with open(filename + ".tmp", 'w') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(filename + ".tmp", filename)
 
-todo_list.remove_task("Study Python")
 
-print("\nFinal Tasks:")
-todo_list.show_tasks()
+def profile_modes(args):
+    # --profile wins over the environment variable; both take comma separated modes
+    value = args.profile if args is not None and args.profile else os.environ.get(PROFILE_ENV, "")
+    return [mode.strip() for mode in value.split(",") if mode.strip()]
 
 
 def print_help():
     print("Usage:")
     print("  python todo.py [--help] [--add 'Task Title'] [--due 'YYYY-MM-DD'] [--priority PRIORITY]")
     print("                 [--recurring INTERVAL] [--category CATEGORY] [--list] [--search QUERY]")
-    print("                 [--filter CATEGORY] [--sort SORT_BY] [--report] [--export CSV|JSON]")
+    print("                 [--filter CATEGORY] [--where QUERY [--explain]] [--sort SORT_BY]")
+    print("                 [--due-between A B] [--overdue]")
+    print("                 [--report] [--analytics [FORMAT]] [--export CSV|JSON|NDJSON] [--import FILE]")
+    print("                 [--toggle ID] [--convert SOURCE TARGET] [--backups] [--restore GEN]")
+    print("                 [--serve [--port N]] [--scheduler [SINKS]]")
     print("\nOptions:")
     print("  --help               i'm here to help you through the program")
     print("  --add 'Task Title'   Add a task with the given title")
@@ -543,58 +5321,247 @@ def print_help():
     print("  --priority PRIORITY  Set priority (High, Medium, Low) for the added task")
     print("  --recurring INTERVAL Set recurring interval (daily/weekly/monthly/yearly)")
     print("                       Leave blank or omit for one-time tasks.")
-    print("  --category CAT       Add category to the task")
+    print("  --every N            Repeat every N days/weeks/months/years (default 1)")
+    print("  --until YYYY-MM-DD   Last date a recurring task repeats on")
+    print("  --category CAT       Add category (name or ID) to the task; repeat for several")
     print("  --list               List tasks")
+    print("  --limit N            Show at most N tasks (--list, --search, --filter, --where, --overdue)")
+    print("  --offset N           Skip the first N tasks, for paging with --limit")
     print("  --search QUERY       Search tasks by title")
-    print("  --filter CAT         Filter tasks by category")
+    print("  --filter CATS        Filter tasks by categories (comma separated names or IDs,")
+    print("                       +CAT to require a category, -CAT to exclude one)")
+    print("  --where QUERY        List tasks matching a query: field op value terms joined with")
+    print("                       and/or/not and parentheses. Fields: title (= != ~ contains),")
+    print("                       priority, due (YYYY-MM-DD, today, none), status (pending/completed),")
+    print("                       recurring, cat (= != in), id. Ops: = != < <= > >= ~ in (A,B). E.g.")
+    print("                       'priority=High and due<2025-03-01 and cat in (Work,Learning)'")
+    print("  --explain            With --where, show the chosen index or scan and the rows scanned")
     print("  --sort FIELD         Sort tasks by 'due_date', 'priority', or 'category'")
+    print("  --due-between A B    List incomplete tasks due between two dates (YYYY-MM-DD)")
+    print("  --overdue            List overdue tasks")
     print("  --report             Show task statistics")
-    print("  --export FORMAT      Export tasks to CSV or JSON")
+    print("  --analytics[=FORMAT] Trends over active and archived tasks: completion rate per category")
+    print("                       and week, lateness, overdue backlog and recurring adherence.")
+    print("                       FORMAT is table (default), csv or json")
+    print("  --profile[=MODES]    Time the command's hot paths. MODES (comma separated): summary")
+    print("                       (default, on stderr), json (append to todo_metrics.jsonl), prom")
+    print("                       (todo_metrics.prom for node-exporter), cprofile (todo_profile.pstats).")
+    print("                       The TODO_PROFILE environment variable takes the same modes.")
+    print("  --alerts             Also show overdue alerts and reminders; read-only commands")
+    print("                       (--list, --search, --filter, --report, ...) skip them otherwise")
+    print("  --export FORMAT      Export tasks to CSV, JSON or NDJSON")
+    print("  --export-to PATH     Export file (default tasks_export.<format>); .gz/.zst compresses")
+    print("  --since YYYY-MM-DD   Only export tasks due on or after this date")
+    print("  --fields F1,F2       Only export these fields, in this order")
+    print("  --include-archive    Export archived tasks as well")
+    print("  --import FILE        Add every task in a CSV, JSON or NDJSON file (.gz/.zst too);")
+    print("                       use - to read NDJSON lines from standard input")
+    print("  --toggle ID          Mark the task with this ID complete/incomplete")
+    print("  --backups            List backup generations of the JSON snapshot (newest first)")
+    print("  --restore GEN        Restore the task list from backup generation GEN")
+    print("  --serve              Keep tasks in memory and answer requests on todo_list.sock;")
+    print("                       while it runs, --add/--list/--search/--report/--toggle use it")
+    print("  --port N             With --serve, also accept JSON POSTs on http://127.0.0.1:N")
+    print("  --scheduler[=SINKS]  Keep running and notify when tasks become due soon (reminder_days_ahead")
+    print("                       days before, at reminder_time) and when they become overdue. SINKS")
+    print("                       (comma separated): stdout (default), log (todo_reminders.log or")
+    print("                       reminder_log), command (runs config reminder_command with the message).")
+    print("                       With --serve, changes made through the server update it directly.")
+    print("  --workers N          Processes for sharded storage queries (default: one per CPU)")
+    print("  --convert SRC DST    Convert a task file between JSON (.json), NDJSON (.ndjson) and the")
+    print("                       binary snapshot format (.bin), and compare their sizes and load times")
     print("\nWithout arguments, interactive mode is used.")
 
-def parse_args(tasks):
+def build_arg_parser():
+    import argparse
     parser = argparse.ArgumentParser(add_help=False)  # Disable default help to use custom
     parser.add_argument("--help", action="store_true")
     parser.add_argument("--add", type=str, default=None)
     parser.add_argument("--due", type=str, default=None)
     parser.add_argument("--priority", type=str, default=None)
     parser.add_argument("--recurring", type=str, default=None)
+    parser.add_argument("--every", type=int, default=None)
+    parser.add_argument("--until", type=str, default=None)
     parser.add_argument("--category", action='append', default=[])
     parser.add_argument("--list", action="store_true")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--offset", type=int, default=0)
     parser.add_argument("--search", type=str, default=None)
     parser.add_argument("--filter", type=str, default=None)
+    parser.add_argument("--where", type=str, default=None)
+    parser.add_argument("--explain", action="store_true")
     parser.add_argument("--sort", type=str, default=None)
+    parser.add_argument("--due-between", nargs=2, default=None)
+    parser.add_argument("--overdue", action="store_true")
     parser.add_argument("--report", action="store_true")
     parser.add_argument("--export", type=str, default=None)
+    parser.add_argument("--export-to", type=str, default=None)
+    parser.add_argument("--since", type=str, default=None)
+    parser.add_argument("--fields", type=str, default=None)
+    parser.add_argument("--include-archive", action="store_true")
+    parser.add_argument("--import", dest="import_file", type=str, default=None)
+    parser.add_argument("--toggle", type=int, default=None)
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--scheduler", nargs="?", const="stdout", default=None)
+    parser.add_argument("--alerts", action="store_true")
+    parser.add_argument("--profile", nargs="?", const="summary", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--analytics", nargs="?", const="table", default=None)
+    parser.add_argument("--convert", nargs=2, metavar=("SOURCE", "TARGET"), default=None)
+    parser.add_argument("--backups", action="store_true")
+    parser.add_argument("--restore", type=int, default=None, metavar="GEN")
+    return parser
 
-    args = parser.parse_args()
 
-    if args.help:
-        print_help()
-        sys.exit(0)
+# Options the lazy path can serve from the NDJSON index or binary snapshot without loading every task
+LAZY_OPTIONS = {"list", "limit", "offset", "report", "alerts", "workers"}
+# Sharded storage also answers sorted lists, searches and category filters from the shards
+SHARDED_LAZY_OPTIONS = LAZY_OPTIONS | {"sort", "search", "filter"}
+# SQLite answers category filters from its task_categories index
+SQLITE_LAZY_OPTIONS = LAZY_OPTIONS | {"filter"}
+# Commands that only read; they skip the startup alerts and archiving unless --alerts is given
+READ_ONLY_OPTIONS = {"list", "limit", "offset", "sort", "report", "search", "filter", "where", "explain",
+                     "due_between", "overdue", "alerts", "workers", "analytics"}
+
+
+def given_options(args):
+    # --profile only observes the command, so it never changes how it is run
+    return {name for name, value in vars(args).items() if value not in (None, False, []) and name != "profile"}
+
+
+def is_read_only(args):
+    given = given_options(args)
+    return bool(given) and given <= READ_ONLY_OPTIONS
+
+
+def run_lazy_command(args):
+    """
+    Serve --list [--limit N] and --report straight from a lazily read task
+    file or the SQLite database, with SQLite also --filter and with sharded
+    storage also --sort, --search and --filter from the shards. Returns
+    False when the command needs the full task list instead.
+    """
+    sharded = isinstance(storage, ShardedStorage)
+    if sharded:
+        lazy_options = SHARDED_LAZY_OPTIONS
+    elif isinstance(storage, SqliteStorage):
+        lazy_options = SQLITE_LAZY_OPTIONS
+    elif isinstance(storage, NdjsonStorage):
+        lazy_options = LAZY_OPTIONS
+    else:
+        return False
+    given = given_options(args)
+    if not given or not given <= lazy_options:
+        return False
+    if not (args.list or args.report or args.search or args.filter):
+        return False
+
+    if args.alerts:
+        show_overdue_alerts(None)
+        remind_tasks(None)
+    if args.list and sharded:
+        print_page(*storage.page(args.sort, args.offset, args.limit), args.offset, args.limit)
+    elif args.list:
+        stop = None if args.limit is None else args.offset + args.limit
+        display_tasks(list(storage.iter_tasks(args.offset, stop)), show_all=True)
+    if args.search:
+        found = storage.search(args.search)
+        if not found:
+            print(RED + "No tasks match your search query." + RESET)
+        else:
+            display_tasks(found, show_all=True, sort_by=args.sort, offset=args.offset, limit=args.limit)
+    if args.filter:
+        found = storage.select_categories(*parse_category_filter(categories, args.filter))
+        if not found:
+            print(RED + "No tasks found for the selected categories." + RESET)
+        else:
+            display_tasks(found, show_all=True, sort_by=args.sort, offset=args.offset, limit=args.limit)
+    if args.report:
+        show_report(None)
+    return True
+
 
+def parse_args(tasks, args):
     if args.add:
+        category_ids = []
+        for name in args.category:
+            cat_id = categories.lookup(name)
+            if cat_id is None:
+                print(YELLOW + f"Warning: Unknown category '{name}' ignored." + RESET)
+            else:
+                category_ids.append(cat_id)
         tasks = add_task(tasks, title=args.add, due_date=args.due, priority=args.priority,
-                         recurring=args.recurring, categories=args.category)
+                         recurring=args.recurring, categories=categories, category_ids=category_ids,
+                         every=args.every or 1, until=args.until or "")
         save_tasks(tasks)
 
+    if args.import_file:
+        import_tasks(tasks, args.import_file)
+
+    if args.toggle is not None:
+        task = next((t for t in tasks if t.id == args.toggle), None)
+        if task is None:
+            print(RED + f"Error: No task with ID {args.toggle}." + RESET)
+        else:
+            toggle_task(tasks, task)
+            save_tasks(tasks)
+
+    sinks = None
+    if args.scheduler:
+        sinks = reminder_sinks(args.scheduler)
+        if sinks is None:
+            sys.exit(1)
+    if args.serve:
+        serve(tasks, args.port, sinks)
+    elif sinks:
+        run_scheduler(tasks, sinks)
+
     if args.list:
-        display_tasks(tasks, show_all=True, sort_by=args.sort)
+        display_tasks(tasks, show_all=True, sort_by=args.sort, offset=args.offset, limit=args.limit)
 
     if args.search:
-        display_tasks(tasks, show_all=True, search_query=args.search, sort_by=args.sort)
+        matching_tasks = find_tasks(tasks, args.search)
+        if not matching_tasks:
+            print(RED + "No tasks match your search query." + RESET)
+        else:
+            display_tasks(matching_tasks, show_all=True, sort_by=args.sort, offset=args.offset, limit=args.limit)
 
     if args.filter:
-        display_tasks(tasks, show_all=True, filter_category=args.filter, sort_by=args.sort)
+        filtered_tasks = get_category_index(tasks).select(*parse_category_filter(categories, args.filter))
+        if not filtered_tasks:
+            print(RED + "No tasks found for the selected categories." + RESET)
+        else:
+            display_tasks(filtered_tasks, show_all=True, sort_by=args.sort, offset=args.offset, limit=args.limit)
+
+    if args.where:
+        show_query(tasks, args.where, sort_by=args.sort, offset=args.offset, limit=args.limit, explain=args.explain)
+    elif args.explain:
+        print(RED + "Error: --explain needs a --where query." + RESET)
+
+    if args.due_between:
+        show_tasks_due_between(tasks, *args.due_between)
+
+    if args.overdue:
+        overdue_tasks = storage.overdue_tasks(tasks)
+        if not overdue_tasks:
+            print(GREEN + "No overdue tasks." + RESET)
+        else:
+            display_tasks(overdue_tasks, show_all=True, sort_by=args.sort, offset=args.offset, limit=args.limit)
 
     if args.report:
         show_report(tasks)
 
+    if args.analytics:
+        show_analytics(tasks, args.analytics.lower())
+
     if args.export:
-        if args.export.lower() == "csv":
-            export_tasks_to_csv(tasks)
-        elif args.export.lower() == "json":
-            export_tasks_to_json(tasks)
+        if args.since and parse_date(args.since) is None:
+            print(RED + "Error: Invalid --since date. Please use YYYY-MM-DD format." + RESET)
+        else:
+            fields = [field.strip() for field in args.fields.split(",")] if args.fields else None
+            export_tasks(tasks, args.export, filename=args.export_to, since=args.since, fields=fields,
+                         include_archive=args.include_archive)
 
     if len(sys.argv) > 1:
         sys.exit(0)
@@ -603,24 +5570,50 @@ def parse_args(tasks):
 
 
 def main():
-    tasks = load_tasks()
-    show_overdue_alerts(tasks)
-    remind_tasks(tasks)
-    tasks = archive_completed_tasks(tasks)
+    args = build_arg_parser().parse_args() if len(sys.argv) > 1 else None
+    if args and args.help:
+        print_help()
+        return
+    open_storage()
+    modes = profile_modes(args)
+    if modes:
+        start_profiling(modes)
+    if args and args.workers:
+        config["workers"] = args.workers
+    if args and args.convert:
+        convert_tasks(*args.convert)
+        return
+    if args and args.backups:
+        show_backups()
+        return
+    if args and args.restore is not None:
+        restore_backup(args.restore)
+        return
 
-    # Ensure categories are initialized
+    # Load the saved categories (defaults until one has been added)
     global categories
-    categories = [
-        ["Category ID", "Category Name", "Description"],
-        [1, "Work", "Tasks related to your job or career"],
-        [2, "Personal", "Personal tasks and errands"],
-        [3, "Fitness", "Workouts, health, and fitness-related tasks"],
-        [4, "Shopping", "Grocery lists, online purchases, etc."],
-        [5, "Learning", "Educational tasks like courses or reading"],
-    ]
+    categories = CategoryRegistry(storage.load_categories())
 
-    if len(sys.argv) > 1:
-        tasks = parse_args(tasks)
+    if args and (forward_to_server(args) or run_lazy_command(args)):
+        return
+
+    tasks = load_tasks()
+    read_only = args is not None and is_read_only(args)
+    if not read_only:
+        get_task_stats(tasks)
+    if not read_only or args.alerts:
+        show_overdue_alerts(tasks)
+        remind_tasks(tasks)
+    if not read_only:
+        with storage_lock():
+            remaining = archive_completed_tasks(tasks)
+            if pending_changes:
+                # Persist the removal right away so the same tasks are not archived again next time
+                save_tasks(remaining)
+        tasks = remaining
+
+    if args:
+        tasks = parse_args(tasks, args)
         return
 
     while True:
@@ -693,14 +5686,21 @@ def main():
             elif choice == "11":
                 show_report(tasks)
             elif choice == "12":
-                fmt = input("Enter format (csv/json): ").strip().lower()
+                fmt = input("Enter format (csv/json/ndjson): ").strip().lower()
                 if fmt == "csv":
                     export_tasks_to_csv(tasks)
+                elif fmt == "ndjson":
+                    export_tasks_to_ndjson(tasks)
                 else:
                     export_tasks_to_json(tasks)
             elif choice == "13":
-                tasks = archive_completed_tasks(tasks)
-                save_tasks(tasks)
+                with storage_lock():
+                    before = len(tasks)
+                    remaining = archive_completed_tasks(tasks)
+                    if len(remaining) == before:
+                        print("No completed tasks to archive.")
+                    tasks = remaining
+                    save_tasks(tasks)
             elif choice == "14":
                 display_completed_tasks(tasks)
             elif choice == "15":